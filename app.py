@@ -1,14 +1,26 @@
 import streamlit as st
 import pandas as pd
 import numpy as np
-from components.sidebar import render_sidebar
+import os
+from components.sidebar import render_metric_selector, render_sidebar
 from components.dashboard import render_dashboard
 from components.data_upload import render_data_upload
-from components.preloaded_data import render_preloaded_data_option
+from components.preloaded_data import (
+    render_preloaded_data_option, start_preloaded_warmup, start_preloaded_watcher
+)
+from components.municipal_data import render_municipal_data_option
 from components.header import render_header
+from components.progress import create_progress_callback, format_stage_timings
 from utils.data_processor import DataProcessor
 from utils.statistical_analysis import StatisticalAnalysis
 from utils.visualizations import Visualizations
+from utils.upload_cache import UploadCache
+from utils.pipeline import StageCache
+from utils.dataset_registry import get_dataset_registry
+from utils.memory import enable_copy_on_write
+
+# Working frames are lazy copies; pandas 2.x needs copy-on-write switched on for that
+enable_copy_on_write()
 
 # Page configuration
 st.set_page_config(
@@ -18,14 +30,36 @@ st.set_page_config(
     initial_sidebar_state="expanded"
 )
 
-# Initialize session state
-if 'data_processor' not in st.session_state:
-    st.session_state.data_processor = None
-if 'processed_data' not in st.session_state:
-    st.session_state.processed_data = None
+# Start processing the sample files in the background on the first run of the server,
+# so "Usar Dados Disponíveis" finds them ready
+start_preloaded_warmup()
+# ...and rebuild them in the background whenever they change on disk
+start_preloaded_watcher()
+
+# Initialize session state. Sessions only keep a handle: the processed data itself
+# lives once per server in the dataset registry
+if 'dataset_handle' not in st.session_state:
+    st.session_state.dataset_handle = None
 if 'analysis_complete' not in st.session_state:
     st.session_state.analysis_complete = False
 
+# Engine of the filters and aggregates: 'pandas' (in memory), or an embedded SQL backend whose
+# copy of the processed data replaces the pandas frame
+QUERY_BACKEND = os.environ.get('QUERY_BACKEND', 'pandas')
+
+@st.cache_resource
+def get_upload_cache():
+    """Processed uploads shared by every session, bounded by UPLOAD_CACHE_MAX_MB"""
+    max_mb = int(os.environ.get('UPLOAD_CACHE_MAX_MB', 256))
+    # A processor is measured with the indexes, views and SQL copy it builds while in use
+    return UploadCache(max_bytes=max_mb * 1024 * 1024, sizer=DataProcessor.nbytes)
+
+@st.cache_resource
+def get_stage_cache():
+    """Pipeline stage outputs shared by every session, so replacing one upload re-runs only its stages"""
+    max_mb = int(os.environ.get('STAGE_CACHE_MAX_MB', 256))
+    return StageCache(max_bytes=max_mb * 1024 * 1024)
+
 def main():
     # University header with logo and student info
     render_header()
@@ -38,8 +72,8 @@ def main():
     if not st.session_state.analysis_complete:
         st.header("📊 Upload dos Dados")
         
-        # Check for preloaded data option first
-        preloaded_success = render_preloaded_data_option()
+        # Check for the per-municipality dataset and the preloaded data options first
+        preloaded_success = render_municipal_data_option() or render_preloaded_data_option()
         
         if not preloaded_success and not st.session_state.analysis_complete:
             st.markdown("---")
@@ -49,15 +83,39 @@ def main():
             if uploaded_files and all(uploaded_files.values()):
                 try:
                     with st.spinner("Processando dados..."):
-                        # Initialize data processor
-                        st.session_state.data_processor = DataProcessor()
-                        
-                        # Process the uploaded files
-                        st.session_state.processed_data = st.session_state.data_processor.process_files(
+                        # Identical uploads (same bytes) reuse the result of an earlier session
+                        upload_cache = get_upload_cache()
+                        cache_key = upload_cache.key_for([
                             uploaded_files['escolas'],
                             uploaded_files['ideb_iniciais'],
                             uploaded_files['ideb_finais']
-                        )
+                        ])
+                        handle = 'upload:' + ':'.join(cache_key)
+                        registry = get_dataset_registry()
+                        processor = registry.get(handle)
+                        if processor is not None:
+                            # Still published by another session: a reuse, counted like a cache hit
+                            upload_cache.record_hit(cache_key)
+                        else:
+                            processor = upload_cache.get(cache_key)
+                        
+                        if processor is None:
+                            # Initialize data processor
+                            processor = DataProcessor(
+                                streaming=True, parallel=True, categoricals=True,
+                                stage_cache=get_stage_cache(),
+                                progress=create_progress_callback()
+                            )
+                            
+                            # Process the uploaded files
+                            processor.process_files(
+                                uploaded_files['escolas'],
+                                uploaded_files['ideb_iniciais'],
+                                uploaded_files['ideb_finais']
+                            )
+                            upload_cache.put(cache_key, processor)
+                        
+                        st.session_state.dataset_handle = registry.publish(handle, processor)
                         
                         st.session_state.analysis_complete = True
                         st.success("✅ Dados processados com sucesso!")
@@ -68,32 +126,114 @@ def main():
                     st.session_state.analysis_complete = False
     
     # Main analysis section
-    if st.session_state.analysis_complete and st.session_state.processed_data is not None:
+    processor = None
+    if st.session_state.analysis_complete and st.session_state.dataset_handle is not None:
+        registry = get_dataset_registry()
+        # Preloaded files are followed through an alias; tell the user when a rebuilt version was swapped in
+        version = registry.resolve(st.session_state.dataset_handle)
+        processor = registry.get(version)
+        if processor is not None and st.session_state.get('dataset_version') not in (None, version):
+            st.toast("🔄 Os arquivos de dados mudaram: exibindo a versão atualizada.")
+        st.session_state.dataset_version = version
+        
+        if processor is None:
+            # The dataset was evicted from the registry; the files have to be loaded again
+            st.session_state.analysis_complete = False
+            st.session_state.dataset_handle = None
+            st.session_state.dataset_version = None
+            st.warning("⚠️ Os dados desta sessão expiraram. Selecione os dados novamente.")
+            st.rerun()
+    
+    if processor is not None:
         # Button to return to data selection
         col1, col2, col3 = st.columns([1, 2, 1])
         with col2:
             if st.button("🔄 Selecionar Outros Dados", type="secondary", use_container_width=True):
                 st.session_state.analysis_complete = False
-                st.session_state.processed_data = None
-                st.session_state.data_processor = None
+                st.session_state.dataset_handle = None
+                st.session_state.dataset_version = None
                 st.rerun()
         
         st.markdown("---")
         
-        # Sidebar for filters
-        filters = render_sidebar(st.session_state.processed_data)
-        
-        # Apply filters to data
-        filtered_data = st.session_state.data_processor.apply_filters(
-            st.session_state.processed_data, 
-            filters
-        )
+        if QUERY_BACKEND == 'pandas':
+            # IDEB indicator shown in the IDEB columns, served from the metric store
+            indicator = render_metric_selector(processor.metric_store, DataProcessor.DEFAULT_INDICATOR)
+            data = processor.with_metric(processor.processed_data, indicator)
+            
+            # Sidebar for filters
+            filters = render_sidebar(data)
+            
+            # Apply filters to data
+            filtered_data = processor.apply_filters(
+                data, 
+                filters
+            )
+            view = None
+            empty = filtered_data.empty
+        else:
+            # The embedded SQL backend (QUERY_BACKEND=auto, duckdb or sqlite) takes over the processed
+            # data: the processor drops its frame, and the sidebar bounds, the filters, the charts and
+            # the table pages are all queries, so the dataset is resident once and no selection is
+            # ever materialized as a DataFrame
+            backend = processor.query_backend(QUERY_BACKEND, release=True)
+            indicator = render_metric_selector(
+                backend if backend.registry is not None else None, DataProcessor.DEFAULT_INDICATOR
+            )
+            filters = render_sidebar(None, backend, indicator)
+            view = backend.view(filters, indicator)
+            filtered_data = data = None
+            empty = view.count() == 0
         
-        if filtered_data.empty:
+        if empty:
             st.warning("⚠️ Nenhuma escola encontrada com os filtros selecionados.")
         else:
             # Main dashboard
-            render_dashboard(filtered_data, st.session_state.processed_data)
+            render_dashboard(filtered_data, data, view)
+        
+        # Memory saved by the dtype compaction of the processed data
+        if processor.memory_report is not None:
+            with st.expander("💾 Uso de memória dos dados processados"):
+                report = processor.memory_report
+                total_before = report['Bytes antes'].sum()
+                total_after = report['Bytes depois'].sum()
+                st.caption(
+                    f"{total_before / 1024:,.1f} KB → {total_after / 1024:,.1f} KB "
+                    f"({(1 - total_after / total_before) * 100:.1f}% de redução)"
+                )
+                st.dataframe(report, hide_index=True)
+        
+        # Time, rows and memory of each processing stage of the run that produced this dataset
+        if processor.stage_timings is not None:
+            with st.expander("⏱️ Tempos de processamento"):
+                st.caption(f"Tempo total: {processor.stage_timings['segundos'].sum():.2f} s")
+                st.dataframe(format_stage_timings(processor.stage_timings), hide_index=True)
+        
+        # Schools dropped by the validity rules, and which rules they failed
+        if processor.rejected_rows is not None and not processor.rejected_rows.empty:
+            with st.expander(f"🚫 Escolas descartadas na validação ({len(processor.rejected_rows)})"):
+                rules = DataProcessor.SCHOOL_RULES
+                st.dataframe(rules.summary(processor.rejected_rows), hide_index=True)
+                st.dataframe(
+                    processor.rejected_rows.assign(**{
+                        'Motivos': processor.rejected_rows['Regras'].map(
+                            lambda bitmask: '; '.join(rules.describe(bitmask))
+                        )
+                    }),
+                    hide_index=True
+                )
+        
+        # School codes repeated in an input, and present on only one side of the IDEB joins
+        if processor.join_report is not None:
+            with st.expander("🔗 Códigos de escola sem correspondência no IDEB"):
+                if processor.key_report is not None:
+                    st.caption("Códigos repetidos em cada arquivo, antes da junção:")
+                    st.dataframe(processor.key_report, hide_index=True)
+                st.caption(
+                    "Lado 'esquerda': escolas do censo sem IDEB; "
+                    "lado 'direita': códigos do IDEB que não estão entre as escolas analisadas."
+                )
+                st.dataframe(processor.join_report, hide_index=True)
     
     # Footer
     st.markdown("---")
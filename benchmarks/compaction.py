@@ -0,0 +1,28 @@
+"""Report the memory saved by the dtype compaction of the processed frame.
+
+    python -m benchmarks.compaction [escolas.xlsx ideb_iniciais.xlsx ideb_finais.xlsx]
+"""
+import argparse
+from utils.data_processor import DataProcessor
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('paths', nargs='*', default=['escolas_rio.xlsx', 'ideb_iniciais.xlsx', 'ideb_finais.xlsx'])
+    args = parser.parse_args()
+    
+    processor = DataProcessor(streaming=True)
+    processor.process_files_from_paths(*args.paths)
+    report = processor.memory_report
+    print(report.to_string(index=False))
+    
+    total_before = report['Bytes antes'].sum()
+    total_after = report['Bytes depois'].sum()
+    print(f"\ntotal: {total_before:,} -> {total_after:,} bytes ({(1 - total_after / total_before) * 100:.1f}% de redução)")
+    
+    # Compaction must never grow a column, and the downcast columns must actually shrink
+    assert (report['Bytes depois'] <= report['Bytes antes']).all(), 'compactação aumentou uma coluna'
+    shrunk = report.set_index('Coluna').loc[DataProcessor.COUNT_COLUMNS + DataProcessor.RATE_COLUMNS]
+    assert (shrunk['Bytes depois'] < shrunk['Bytes antes']).all(), 'coluna numérica não foi compactada'
+
+if __name__ == '__main__':
+    main()
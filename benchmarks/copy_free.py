@@ -0,0 +1,98 @@
+"""Compare peak RSS of the dashboard analysis code paths with and without copy-free mode.
+
+A synthetic census is generated and processed once (see benchmarks.synthetic); then each
+mode runs a few simulated dashboard reruns (filters, statistics and charts) over the
+processed frame in a fresh process, with peak RSS measured from the start of the reruns.
+
+    python -m benchmarks.copy_free [--escolas N] [--reruns R] [--dir DIR]
+"""
+import argparse
+import multiprocessing
+import os
+import tempfile
+import time
+
+MODES = ['defensive', 'copy_free']
+
+def _process(paths, output, queue):
+    from utils.data_processor import DataProcessor
+    from utils.memory import peak_rss_mb
+    
+    start = time.perf_counter()
+    data = DataProcessor().process_files(*paths)
+    data.to_parquet(output, index=False)
+    queue.put({'rows': len(data), 'seconds': time.perf_counter() - start, 'peak_mb': peak_rss_mb()})
+
+def _analyse(mode, processed, reruns, queue):
+    import pandas as pd
+    from utils.data_processor import DataProcessor
+    from utils.memory import current_rss_mb, peak_rss_mb, reset_peak_rss, set_copy_free
+    from utils.statistical_analysis import StatisticalAnalysis
+    from utils.visualizations import Visualizations
+    
+    set_copy_free(mode == 'copy_free')
+    data = pd.read_parquet(processed)
+    processor = DataProcessor()
+    stats_analyzer = StatisticalAnalysis()
+    viz = Visualizations()
+    
+    # Only what a dashboard rerun does with the processed frame is measured
+    reset_peak_rss()
+    baseline = current_rss_mb()
+    start = time.perf_counter()
+    for _ in range(reruns):
+        filtered = processor.apply_filters(data, {'bairro': 'Todos'})
+        stats_analyzer.analyze_correlations(filtered)
+        stats_analyzer.calculate_correlation_matrix(filtered)
+        stats_analyzer.perform_group_analysis(filtered)
+        stats_analyzer.perform_statistical_tests(filtered)
+        viz.create_climate_distribution_chart(filtered)
+    
+    queue.put({
+        'mode': mode,
+        'seconds': time.perf_counter() - start,
+        'data_mb': data.memory_usage(deep=True).sum() / (1024 * 1024),
+        'peak_mb': peak_rss_mb(),
+        'growth_mb': peak_rss_mb() - baseline,
+    })
+
+def _spawn(ctx, target, *args):
+    queue = ctx.Queue()
+    proc = ctx.Process(target=target, args=args + (queue,))
+    proc.start()
+    result = queue.get()
+    proc.join()
+    return result
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--escolas', type=int, default=1_000_000)
+    parser.add_argument('--reruns', type=int, default=3)
+    parser.add_argument('--dir', help='reuse or create the synthetic files here')
+    args = parser.parse_args()
+    
+    from benchmarks.synthetic import write_dataset
+    destino = args.dir or tempfile.mkdtemp(prefix='censo_sintetico_')
+    paths = [os.path.join(destino, name) for name in ('escolas.parquet', 'ideb_iniciais.parquet', 'ideb_finais.parquet')]
+    if not all(os.path.exists(path) for path in paths):
+        paths = write_dataset(destino, args.escolas)
+    
+    ctx = multiprocessing.get_context('spawn')
+    processed = os.path.join(destino, 'processado.parquet')
+    result = _spawn(ctx, _process, paths, processed)
+    print(f"pipeline: {result['rows']} escolas em {result['seconds']:.2f}s, pico RSS {result['peak_mb']:.1f} MB\n")
+    
+    results = {}
+    print(f"{'modo':<12}{'dados (MB)':>12}{'análise (s)':>13}{'pico (MB)':>11}{'pico acima da base (MB)':>25}")
+    for mode in MODES:
+        result = results[mode] = _spawn(ctx, _analyse, mode, processed, args.reruns)
+        print(
+            f"{mode:<12}{result['data_mb']:>12.1f}{result['seconds']:>13.2f}"
+            f"{result['peak_mb']:>11.1f}{result['growth_mb']:>25.1f}"
+        )
+    
+    saved = results['defensive']['growth_mb'] - results['copy_free']['growth_mb']
+    print(f"\nmodo sem cópias: pico de RSS da análise {saved:.1f} MB menor")
+
+if __name__ == '__main__':
+    main()
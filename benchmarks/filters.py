@@ -0,0 +1,95 @@
+"""Compare the sidebar filters as full-column masks and through the argsort range indexes.
+
+Runs the real pipeline on synthetic data (see benchmarks.synthetic) at each size, then
+times DataProcessor.apply_filters against the boolean-mask evaluation it replaced.
+
+    python -m benchmarks.filters [--escolas 10000 1000000] [--repeat N]
+"""
+import argparse
+import os
+import statistics
+import tempfile
+import time
+import pandas as pd
+from benchmarks.synthetic import write_dataset
+from utils.data_processor import DataProcessor
+from utils.memory import working_copy
+
+def mask_filters(data, filters):
+    """The previous apply_filters: one full-column comparison per filter"""
+    
+    filtered_data = working_copy(data)
+    if filters.get('bairro') and filters['bairro'] != 'Todos':
+        filtered_data = filtered_data[filtered_data['Bairro'] == filters['bairro']]
+    if filters.get('ac_range'):
+        min_ac, max_ac = filters['ac_range']
+        filtered_data = filtered_data[(filtered_data['Percentual_AC'] >= min_ac) & (filtered_data['Percentual_AC'] <= max_ac)]
+    if filters.get('salas_range'):
+        min_salas, max_salas = filters['salas_range']
+        filtered_data = filtered_data[(filtered_data['Total de Salas'] >= min_salas) & (filtered_data['Total de Salas'] <= max_salas)]
+    for key, column in (('ideb_iniciais_range', 'IDEB Iniciais'), ('ideb_finais_range', 'IDEB Finais')):
+        if filters.get(key):
+            min_ideb, max_ideb = filters[key]
+            mask = ((filtered_data[column] >= min_ideb) & (filtered_data[column] <= max_ideb)) | filtered_data[column].isna()
+            filtered_data = filtered_data[mask]
+    return filtered_data
+
+def scenarios(data):
+    """Sidebar states, from untouched sliders to narrow selections"""
+    
+    # Slider limits as the sidebar computes them
+    percentual_ac = (data['Salas com Ar'] / data['Total de Salas'] * 100).fillna(0)
+    full = {
+        'ac_range': (float(percentual_ac.min()), float(percentual_ac.max())),
+        'salas_range': (int(data['Total de Salas'].min()), int(data['Total de Salas'].max())),
+        'ideb_iniciais_range': (float(data['IDEB Iniciais'].min()), float(data['IDEB Iniciais'].max())),
+        'ideb_finais_range': (float(data['IDEB Finais'].min()), float(data['IDEB Finais'].max())),
+    }
+    bairro = data['Bairro'].value_counts().index[0]
+    return {
+        'sliders nos limites': full,
+        'um bairro': {**full, 'bairro': bairro},
+        'faixa ampla de AC': {**full, 'ac_range': (10.0, 90.0)},
+        'faixas estreitas': {**full, 'ac_range': (40.0, 45.0), 'salas_range': (10, 20)},
+        'IDEB alto e bairro': {**full, 'bairro': bairro, 'ideb_iniciais_range': (95.0, 100.0)},
+    }
+
+def timed(func, repeat):
+    """Median wall time of func over repeat runs, with its last result"""
+    
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func()
+        times.append(time.perf_counter() - start)
+    return statistics.median(times), result
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--escolas', type=int, nargs='+', default=[10_000, 1_000_000])
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+    
+    for n_schools in args.escolas:
+        with tempfile.TemporaryDirectory() as destino:
+            paths = write_dataset(os.path.join(destino, 'dados'), n_schools)
+            processor = DataProcessor(categoricals=True)
+            data = processor.process_files_from_paths(*paths)
+        
+        start = time.perf_counter()
+        for column in ('Bairro', 'Percentual_AC', 'Total de Salas', 'IDEB Iniciais', 'IDEB Finais'):
+            processor._filter_index(data).column(column)
+        print(f"\n{n_schools:,} escolas no censo, {len(data):,} após o processamento "
+              f"(índices: {(time.perf_counter() - start) * 1000:.1f} ms, uma vez por conjunto de dados)")
+        print(f"{'cenário':<22}{'linhas':>10}{'máscaras (ms)':>16}{'índices (ms)':>15}{'ganho':>8}")
+        
+        for name, filters in scenarios(data).items():
+            mask_time, expected = timed(lambda: mask_filters(data, filters), args.repeat)
+            index_time, result = timed(lambda: processor.apply_filters(data, filters), args.repeat)
+            # Same rows, same order, same labels as the mask evaluation
+            pd.testing.assert_frame_equal(result, expected)
+            print(f"{name:<22}{len(result):>10,}{mask_time * 1000:>16.2f}{index_time * 1000:>15.2f}"
+                  f"{mask_time / index_time:>7.1f}x")
+
+if __name__ == '__main__':
+    main()
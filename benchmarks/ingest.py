@@ -0,0 +1,56 @@
+"""Compare the full-sheet, streaming and shared-string ingest of the school census workbook.
+
+Each mode runs in a fresh process so peak RSS is not shared between runs.
+
+    python -m benchmarks.ingest [escolas.xlsx] [--repeat N]
+"""
+import argparse
+import multiprocessing
+import time
+
+# mode -> DataProcessor options
+MODES = {
+    'read_excel': {},
+    'streaming': {'streaming': True},
+    'categorical': {'categoricals': True},
+}
+
+def _run(mode, path, queue):
+    from utils.data_processor import DataProcessor
+    from utils.memory import peak_rss_mb
+    
+    processor = DataProcessor(**MODES[mode])
+    baseline = peak_rss_mb()
+    start = time.perf_counter()
+    df = processor._read_school_sheet(path)
+    elapsed = time.perf_counter() - start
+    queue.put({
+        'mode': mode,
+        'seconds': elapsed,
+        'peak_rss_mb': peak_rss_mb(),
+        'ingest_rss_mb': peak_rss_mb() - baseline,
+        'shape': df.shape,
+    })
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('path', nargs='?', default='escolas_rio.xlsx')
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+    
+    ctx = multiprocessing.get_context('spawn')
+    print(f"{'modo':<12}{'tempo (s)':>12}{'pico RSS (MB)':>16}{'RSS ingest (MB)':>18}  shape")
+    for mode in MODES:
+        for _ in range(args.repeat):
+            queue = ctx.Queue()
+            proc = ctx.Process(target=_run, args=(mode, args.path, queue))
+            proc.start()
+            result = queue.get()
+            proc.join()
+            print(
+                f"{result['mode']:<12}{result['seconds']:>12.3f}{result['peak_rss_mb']:>16.1f}"
+                f"{result['ingest_rss_mb']:>18.1f}  {result['shape']}"
+            )
+
+if __name__ == '__main__':
+    main()
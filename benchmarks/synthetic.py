@@ -0,0 +1,82 @@
+"""Write a synthetic Censo Escolar and matching IDEB files of any size, as Parquet.
+
+The census mimics the real layout (public and private schools, many municipalities,
+a few invalid rows and a band of unused columns) so every pipeline stage does real work.
+
+    python -m benchmarks.synthetic DESTINO [--escolas N] [--seed S]
+"""
+import argparse
+import os
+import numpy as np
+import pandas as pd
+
+# Census columns the pipeline never reads, to give the file a realistic width
+FILLER_COLUMNS = 40
+
+def make_census(n_schools, seed=0):
+    """Return a synthetic census with n_schools rows, sorted by school code"""
+    
+    rng = np.random.default_rng(seed)
+    municipios = 3300000 + np.arange(1, 93) * 100
+    bairros = np.array([f'BAIRRO {i:03d}' for i in range(500)])
+    
+    total = rng.integers(1, 60, n_schools).astype(float)
+    climatizadas = np.floor(total * rng.random(n_schools))
+    # A small share of rows breaks the validity rules
+    invalid = rng.random(n_schools) < 0.002
+    total[invalid] = 0
+    climatizadas[rng.random(n_schools) < 0.05] = np.nan
+    
+    codigo_municipio = rng.choice(municipios, n_schools)
+    census = {
+        'CO_ENTIDADE': 33000000 + np.arange(n_schools, dtype=np.int64),
+        'NO_ENTIDADE': [f'  ESCOLA MUNICIPAL {i}  ' for i in range(n_schools)],
+        'TP_DEPENDENCIA': rng.choice([1, 2, 3, 4], n_schools, p=[0.02, 0.18, 0.5, 0.3]),
+        'CO_MUNICIPIO': codigo_municipio,
+        'NO_MUNICIPIO': pd.Series(codigo_municipio).map(lambda code: f'Município {code}').to_numpy(),
+        'NO_BAIRRO': rng.choice(bairros, n_schools),
+        'QT_SALAS_UTILIZADAS': total,
+        'QT_SALAS_UTILIZA_CLIMATIZADAS': climatizadas,
+    }
+    for i in range(FILLER_COLUMNS):
+        census[f'QT_OUTRO_{i:02d}'] = rng.integers(0, 100, n_schools)
+    return pd.DataFrame(census)
+
+def make_ideb(census, coverage, seed=0):
+    """Return a synthetic IDEB sheet for a random share of the public schools of census"""
+    
+    rng = np.random.default_rng(seed)
+    public = census[census['TP_DEPENDENCIA'] == 3]
+    sample = public[rng.random(len(public)) < coverage]
+    return pd.DataFrame({
+        'Sigla da UF': 'RJ',
+        'Código do Município': sample['CO_MUNICIPIO'].to_numpy(),
+        'Código da Escola': sample['CO_ENTIDADE'].to_numpy(),
+        'Nome da Escola': sample['NO_ENTIDADE'].to_numpy(),
+        'Taxa de Aprovação - 2023': np.round(rng.uniform(60, 100, len(sample)), 1),
+        'IDEB 2023 (N x P)': np.round(rng.uniform(3, 8, len(sample)), 1),
+    })
+
+def write_dataset(destino, n_schools, seed=0):
+    """Write escolas/ideb_iniciais/ideb_finais Parquet files and return their paths"""
+    
+    os.makedirs(destino, exist_ok=True)
+    census = make_census(n_schools, seed)
+    paths = [os.path.join(destino, name) for name in ('escolas.parquet', 'ideb_iniciais.parquet', 'ideb_finais.parquet')]
+    census.to_parquet(paths[0], index=False)
+    make_ideb(census, 0.6, seed + 1).to_parquet(paths[1], index=False)
+    make_ideb(census, 0.3, seed + 2).to_parquet(paths[2], index=False)
+    return paths
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('destino')
+    parser.add_argument('--escolas', type=int, default=1_000_000)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+    
+    for path in write_dataset(args.destino, args.escolas, args.seed):
+        print(f"{path}: {os.path.getsize(path) / (1024 * 1024):.1f} MB")
+
+if __name__ == '__main__':
+    main()
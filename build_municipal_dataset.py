@@ -0,0 +1,32 @@
+"""Process a partitioned census with the IDEB files into one dataset partition per municipality.
+
+    python ingest_census.py microdados_ed_basica_2023.csv dados/censo_particionado
+    python build_municipal_dataset.py dados/censo_particionado ideb_iniciais.xlsx ideb_finais.xlsx dados/municipios
+
+The app offers the municipalities of MUNICIPAL_DATASET_DIR (default dados/municipios)
+and loads only the ones selected.
+"""
+import argparse
+import time
+from utils.data_processor import DataProcessor
+from utils.partition_store import PartitionStore
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('censo', help="Diretório do censo particionado (ingest_census.py)")
+    parser.add_argument('ideb_iniciais', help="Arquivo do IDEB dos anos iniciais")
+    parser.add_argument('ideb_finais', help="Arquivo do IDEB dos anos finais")
+    parser.add_argument('destino', help="Diretório dos dados processados por município")
+    args = parser.parse_args()
+    
+    start = time.perf_counter()
+    summary = DataProcessor().build_municipal_dataset(
+        PartitionStore(args.censo), args.ideb_iniciais, args.ideb_finais, PartitionStore(args.destino)
+    )
+    print(
+        f"{summary['escolas']} escolas processadas em {summary['municipios']} municípios "
+        f"({time.perf_counter() - start:.1f}s)"
+    )
+
+if __name__ == '__main__':
+    main()
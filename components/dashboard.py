@@ -3,17 +3,24 @@ import pandas as pd
 import numpy as np
 from utils.statistical_analysis import StatisticalAnalysis
 from utils.visualizations import Visualizations
+from utils.memory import working_copy
 import io
 
-def render_dashboard(filtered_data, full_data):
+# Rows per page of the raw data table when it is served by the query backend
+PAGE_SIZE = 100
+
+def render_dashboard(filtered_data, full_data, view=None):
     """Render the main dashboard with analysis and visualizations"""
     
+    # With a query backend view the frames are None: every widget fetches its own
+    # aggregate or page, so the selection never becomes a DataFrame
+    
     # Initialize analysis tools
     stats_analyzer = StatisticalAnalysis()
     viz = Visualizations()
     
     # Summary statistics section
-    render_summary_stats(filtered_data, full_data)
+    render_summary_stats(filtered_data, full_data, view)
     
     # Detailed analysis tabs
     tab1, tab2, tab3, tab4 = st.tabs([
@@ -24,32 +31,43 @@ def render_dashboard(filtered_data, full_data):
     ])
     
     with tab1:
-        render_overview_tab(filtered_data, viz)
+        render_overview_tab(filtered_data, viz, view)
     
     with tab2:
-        render_detailed_analysis_tab(filtered_data, stats_analyzer, viz)
+        render_detailed_analysis_tab(filtered_data, stats_analyzer, viz, view)
     
     with tab3:
-        render_distribution_tab(filtered_data, viz)
+        render_distribution_tab(filtered_data, viz, view)
     
     with tab4:
-        render_raw_data_tab(filtered_data)
+        render_raw_data_tab(filtered_data, view)
 
-def render_summary_stats(filtered_data, full_data):
+def render_summary_stats(filtered_data, full_data, view=None):
     """Render summary statistics cards"""
     
     st.header("📊 Resumo Executivo")
     
     # Calculate key metrics
-    total_escolas = len(filtered_data)
-    total_salas = filtered_data['Total de Salas'].sum()
-    salas_com_ar = filtered_data['Salas com Ar'].sum()
+    if view is not None:
+        # One aggregate query instead of reductions over the frames
+        summary = view.summary()
+        total_escolas = summary['escolas']
+        total_geral = summary['total']
+        total_salas = summary['salas']
+        salas_com_ar = summary['salas_com_ar']
+        ideb_iniciais_media = summary['ideb_iniciais']
+        ideb_finais_media = summary['ideb_finais']
+    else:
+        total_escolas = len(filtered_data)
+        total_geral = len(full_data)
+        total_salas = filtered_data['Total de Salas'].sum()
+        salas_com_ar = filtered_data['Salas com Ar'].sum()
+        
+        # IDEB averages
+        ideb_iniciais_media = filtered_data['IDEB Iniciais'].mean()
+        ideb_finais_media = filtered_data['IDEB Finais'].mean()
     percentual_climatizacao = (salas_com_ar / total_salas * 100) if total_salas > 0 else 0
     
-    # IDEB averages
-    ideb_iniciais_media = filtered_data['IDEB Iniciais'].mean()
-    ideb_finais_media = filtered_data['IDEB Finais'].mean()
-    
     # Display metrics in columns
     col1, col2, col3, col4, col5 = st.columns(5)
     
@@ -57,7 +75,7 @@ def render_summary_stats(filtered_data, full_data):
         st.metric(
             label="🏫 Total de Escolas",
             value=f"{total_escolas:,}",
-            delta=f"{((total_escolas/len(full_data))*100):.1f}% do total" if len(full_data) > 0 else None
+            delta=f"{((total_escolas/total_geral)*100):.1f}% do total" if total_geral > 0 else None
         )
     
     with col2:
@@ -94,65 +112,82 @@ def render_summary_stats(filtered_data, full_data):
         else:
             st.metric(label="📊 IDEB Finais", value="N/A")
 
-def render_overview_tab(filtered_data, viz):
+def render_overview_tab(filtered_data, viz, view=None):
     """Render overview visualizations"""
     
     col1, col2 = st.columns(2)
     
     with col1:
         st.subheader("Distribuição de Climatização")
-        fig_climate = viz.create_climate_distribution_chart(filtered_data)
+        if view is not None:
+            fig_climate = viz.create_climate_distribution_chart_from_counts(
+                view.bin_counts('Percentual_AC', viz.AC_BINS, viz.AC_LABELS)
+            )
+        else:
+            fig_climate = viz.create_climate_distribution_chart(filtered_data)
         if fig_climate:
             st.plotly_chart(fig_climate, use_container_width=True)
     
     with col2:
         st.subheader("Performance IDEB")
-        fig_ideb = viz.create_ideb_comparison_chart(filtered_data)
+        if view is not None:
+            fig_ideb = viz.create_ideb_comparison_chart_from_stats({
+                'Anos Iniciais': view.box_stats('IDEB Iniciais'),
+                'Anos Finais': view.box_stats('IDEB Finais'),
+            })
+        else:
+            fig_ideb = viz.create_ideb_comparison_chart(filtered_data)
         if fig_ideb:
             st.plotly_chart(fig_ideb, use_container_width=True)
     
-    # Schools comparison chart
+    # Schools comparison chart (the chart shows the first 50 schools)
     st.subheader("Comparação por Escola")
-    fig_comparison = viz.create_school_comparison_chart(filtered_data)
+    fig_comparison = viz.create_school_comparison_chart(
+        view.page(0, 50) if view is not None else filtered_data
+    )
     if fig_comparison:
         st.plotly_chart(fig_comparison, use_container_width=True)
 
-def render_detailed_analysis_tab(filtered_data, stats_analyzer, viz):
+def render_detailed_analysis_tab(filtered_data, stats_analyzer, viz, view=None):
     """Render detailed statistical analysis"""
     
     st.subheader("Análise Estatística Detalhada")
     
+    if view is not None:
+        render_descriptive_stats(view.describe('Percentual_AC'), view.describe('IDEB Iniciais'))
+        return
+    
     # Calculate AC percentage for analysis
-    filtered_data_analysis = filtered_data.copy()
+    filtered_data_analysis = working_copy(filtered_data)
     filtered_data_analysis['Percentual_AC'] = (
         filtered_data_analysis['Salas com Ar'] / filtered_data_analysis['Total de Salas'] * 100
     ).fillna(0)
     
     # Statistical summary
+    climate_stats = stats_analyzer.calculate_descriptive_stats(filtered_data_analysis['Percentual_AC'])
+    ideb_stats = {}
+    if not filtered_data_analysis['IDEB Iniciais'].dropna().empty:
+        ideb_stats = stats_analyzer.calculate_descriptive_stats(
+            filtered_data_analysis['IDEB Iniciais'].dropna()
+        )
+    render_descriptive_stats(climate_stats, ideb_stats)
+
+def render_descriptive_stats(climate_stats, ideb_stats):
+    """Render the climate and IDEB statistics of the detailed analysis tab"""
+    
     col1, col2 = st.columns(2)
     
     with col1:
         st.markdown("#### 📊 Estatísticas de Climatização")
-        climate_stats = stats_analyzer.calculate_descriptive_stats(
-            filtered_data_analysis['Percentual_AC']
-        )
-        
         for stat, value in climate_stats.items():
             st.metric(stat, f"{value:.2f}%")
     
     with col2:
         st.markdown("#### 📚 Estatísticas de IDEB")
-        if not filtered_data_analysis['IDEB Iniciais'].dropna().empty:
-            ideb_stats = stats_analyzer.calculate_descriptive_stats(
-                filtered_data_analysis['IDEB Iniciais'].dropna()
-            )
-            
-            for stat, value in ideb_stats.items():
-                st.metric(f"IDEB Iniciais - {stat}", f"{value:.2f}")
+        for stat, value in ideb_stats.items():
+            st.metric(f"IDEB Iniciais - {stat}", f"{value:.2f}")
 
-
-
-def render_distribution_tab(filtered_data, viz):
+def render_distribution_tab(filtered_data, viz, view=None):
     """Render distribution analysis"""
     
     st.subheader("Análise de Distribuição")
@@ -161,21 +196,35 @@ def render_distribution_tab(filtered_data, viz):
     
     with col1:
         st.markdown("#### 📍 Distribuição por Bairro")
-        fig_neighborhood = viz.create_neighborhood_distribution(filtered_data)
+        if view is not None:
+            fig_neighborhood = viz.create_neighborhood_distribution_from_counts(view.value_counts('Bairro', limit=20))
+        else:
+            fig_neighborhood = viz.create_neighborhood_distribution(filtered_data)
         if fig_neighborhood:
             st.plotly_chart(fig_neighborhood, use_container_width=True)
     
     with col2:
         st.markdown("#### 📊 Histograma de Performance")
-        fig_histogram = viz.create_performance_histogram(filtered_data)
+        if view is not None:
+            bins, width = view.histogram(['IDEB Iniciais', 'IDEB Finais'], bins=20)
+            bins = bins.assign(**{
+                'Nível': bins['Coluna'].map({'IDEB Iniciais': 'Anos Iniciais', 'IDEB Finais': 'Anos Finais'})
+            }).rename(columns={'Centro': 'IDEB', 'Linhas': 'Escolas'})
+            fig_histogram = viz.create_performance_histogram_from_bins(bins, width)
+        else:
+            fig_histogram = viz.create_performance_histogram(filtered_data)
         if fig_histogram:
             st.plotly_chart(fig_histogram, use_container_width=True)
 
-def render_raw_data_tab(filtered_data):
+def render_raw_data_tab(filtered_data, view=None):
     """Render raw data table with export functionality"""
     
     st.subheader("Dados Brutos")
     
+    if view is not None:
+        render_paged_data(view)
+        return
+    
     # Data summary
     st.write(f"**Total de registros:** {len(filtered_data)}")
     
@@ -183,7 +232,8 @@ def render_raw_data_tab(filtered_data):
     search_term = st.text_input("🔍 Buscar escola por nome:")
     
     if search_term:
-        mask = filtered_data['Nome da Escola'].str.contains(search_term, case=False, na=False)
+        # Literal (not regex) search runs as a single Arrow substring kernel over the names
+        mask = filtered_data['Nome da Escola'].str.contains(search_term, case=False, regex=False, na=False)
         display_data = filtered_data[mask]
     else:
         display_data = filtered_data
@@ -220,3 +270,29 @@ def render_raw_data_tab(filtered_data):
                 file_name="escolas_analise.xlsx",
                 mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
             )
+
+def render_paged_data(view):
+    """Render the raw data one page at a time, each page fetched from the query backend"""
+    
+    search_term = st.text_input("🔍 Buscar escola por nome:")
+    total = view.count(search_term)
+    st.write(f"**Total de registros:** {total}")
+    
+    pages = max((total + PAGE_SIZE - 1) // PAGE_SIZE, 1)
+    page = st.number_input("Página:", min_value=1, max_value=pages, value=1, step=1)
+    st.caption(f"Página {page} de {pages}")
+    
+    st.dataframe(
+        view.page((page - 1) * PAGE_SIZE, PAGE_SIZE, search_term),
+        use_container_width=True,
+        hide_index=True
+    )
+    
+    # The full selection is only fetched when it is exported
+    if st.button("📥 Baixar dados filtrados (CSV)"):
+        st.download_button(
+            label="Download CSV",
+            data=view.to_frame(search_term).to_csv(index=False),
+            file_name="escolas_analise.csv",
+            mime="text/csv"
+        )
@@ -5,7 +5,8 @@ def render_data_upload():
     
     st.markdown("""
     ### Instruções de Upload
-    Por favor, faça o upload dos três arquivos Excel necessários para a análise:
+    Por favor, faça o upload dos três arquivos necessários para a análise
+    (Excel, CSV — inclusive os microdados do INEP —, Parquet ou Feather):
     1. **Planilha de Escolas**: Dados gerais das escolas (infraestrutura, localização)
     2. **IDEB Anos Iniciais**: Dados de desempenho para anos iniciais
     3. **IDEB Anos Finais**: Dados de desempenho para anos finais
@@ -19,7 +20,7 @@ def render_data_upload():
         st.subheader("📋 Dados das Escolas")
         uploaded_files['escolas'] = st.file_uploader(
             "Selecione a planilha de escolas",
-            type=["xlsx", "xls"],
+            type=["xlsx", "xls", "csv", "parquet", "feather"],
             key="escolas",
             help="Arquivo contendo dados de infraestrutura das escolas"
         )
@@ -28,7 +29,7 @@ def render_data_upload():
         st.subheader("📈 IDEB Anos Iniciais")
         uploaded_files['ideb_iniciais'] = st.file_uploader(
             "Selecione a planilha de IDEB (anos iniciais)",
-            type=["xlsx", "xls"],
+            type=["xlsx", "xls", "csv", "parquet", "feather"],
             key="ideb_iniciais",
             help="Dados de desempenho para ensino fundamental I"
         )
@@ -37,7 +38,7 @@ def render_data_upload():
         st.subheader("📊 IDEB Anos Finais")
         uploaded_files['ideb_finais'] = st.file_uploader(
             "Selecione a planilha de IDEB (anos finais)",
-            type=["xlsx", "xls"],
+            type=["xlsx", "xls", "csv", "parquet", "feather"],
             key="ideb_finais",
             help="Dados de desempenho para ensino fundamental II"
         )
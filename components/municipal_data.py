@@ -0,0 +1,69 @@
+import streamlit as st
+import os
+from utils.data_processor import DataProcessor
+from utils.dataset_registry import get_dataset_registry
+from utils.partition_store import PartitionStore
+
+# Processed data with one partition per municipality (see build_municipal_dataset.py)
+MUNICIPAL_DATASET_DIR = os.environ.get('MUNICIPAL_DATASET_DIR', 'dados/municipios')
+
+def render_municipal_data_option():
+    """Render the municipality selector of a dataset partitioned by municipality"""
+    
+    # Don't show if data is already loaded
+    if st.session_state.get('analysis_complete', False):
+        return False
+    
+    store = PartitionStore(MUNICIPAL_DATASET_DIR)
+    if not store.exists():
+        return False
+    
+    municipios = store.municipios()
+    st.info(f"🗺️ Dados processados de {len(municipios)} municípios disponíveis")
+    
+    selected = st.multiselect(
+        "Selecione os municípios:",
+        options=sorted(municipios, key=lambda code: municipios[code]['nome'] or str(code)),
+        format_func=lambda code: f"{municipios[code]['nome'] or code} ({municipios[code]['escolas']} escolas)",
+        help="Somente os municípios selecionados são carregados em memória"
+    )
+    
+    if selected and st.button("🗺️ Carregar Municípios", type="primary"):
+        return load_municipal_data(store, selected)
+    
+    return False
+
+def municipal_handle(store, codes):
+    """Registry handle of a selection of municipalities in one version of the store"""
+    
+    return (
+        f'municipios:{os.path.abspath(store.root)}:{store.version()}:'
+        + ','.join(str(code) for code in sorted(codes))
+    )
+
+def load_municipal_data(store, codes):
+    """Load the partitions of the selected municipalities"""
+    
+    try:
+        with st.spinner("Carregando municípios..."):
+            # Sessions selecting the same municipalities share one read-only copy; the registry
+            # bound evicts selections nobody is using, so the state never sits in memory whole
+            handle = municipal_handle(store, codes)
+            
+            def build():
+                processor = DataProcessor()
+                processor.load_municipal_dataset(store, codes)
+                return processor
+            
+            processor = get_dataset_registry().get_or_build(handle, build)
+            
+            st.session_state.dataset_handle = handle
+            st.session_state.analysis_complete = True
+            
+            st.success(f"✅ Dados carregados com sucesso! {processor.row_count()} escolas processadas.")
+            st.rerun()  # Force a rerun to update the UI
+            return True
+    
+    except Exception as e:
+        st.error(f"❌ Erro ao carregar os dados: {str(e)}")
+        return False
@@ -2,7 +2,24 @@
 import streamlit as st
 import pandas as pd
 import os
+from components.progress import create_progress_callback
 from utils.data_processor import DataProcessor
+from utils.dataset_registry import get_dataset_registry
+from utils.pipeline import StageCache
+from utils.snapshot_cache import SnapshotCache
+from utils.source_watcher import SourceWatcher
+
+# Shared by every session so repeat loads are a single Parquet read
+snapshot_cache = SnapshotCache()
+# When one of the files changes, only the stages downstream of it run again
+stage_cache = StageCache()
+
+# Sample files shipped with the app
+SAMPLE_FILES = {
+    'escolas': 'escolas_rio.xlsx',
+    'ideb_iniciais': 'ideb_iniciais.xlsx', 
+    'ideb_finais': 'ideb_finais.xlsx'
+}
 
 def render_preloaded_data_option():
     """Render option to use preloaded data files"""
@@ -12,13 +29,7 @@ def render_preloaded_data_option():
         return False
     
     # Check if sample files exist
-    sample_files = {
-        'escolas': 'escolas_rio.xlsx',
-        'ideb_iniciais': 'ideb_iniciais.xlsx', 
-        'ideb_finais': 'ideb_finais.xlsx'
-    }
-    
-    files_exist = all(os.path.exists(f) for f in sample_files.values())
+    files_exist = all(os.path.exists(f) for f in SAMPLE_FILES.values())
     
     if files_exist:
         st.info("📁 Arquivos de dados detectados no sistema")
@@ -35,41 +46,98 @@ def render_preloaded_data_option():
         
         with col2:
             if st.button("🚀 Usar Dados Disponíveis", type="primary"):
-                return load_preloaded_data(sample_files)
+                return load_preloaded_data(SAMPLE_FILES)
     
     return False
 
+def preloaded_handle(file_paths):
+    """Registry handle of a preloaded dataset: a content key of its files"""
+    
+    # build_preloaded_data always uses the same processor options, so the files alone name the result
+    return 'preloaded:' + snapshot_cache.key_for([
+        file_paths['escolas'],
+        file_paths['ideb_iniciais'],
+        file_paths['ideb_finais']
+    ])
+
+def preloaded_alias(file_paths):
+    """Stable registry name of a set of preloaded files, resolving to their latest processed version"""
+    
+    return 'preloaded-files:' + '|'.join(
+        os.path.abspath(file_paths[name]) for name in ('escolas', 'ideb_iniciais', 'ideb_finais')
+    )
+
+def build_preloaded_data(file_paths, progress=None):
+    """Process the preloaded files, served from the snapshot cache when they are unchanged"""
+    
+    processor = DataProcessor(
+        streaming=True, parallel=True, categoricals=True, stage_cache=stage_cache,
+        progress=progress
+    )
+    processor.process_files_from_paths(
+        file_paths['escolas'],
+        file_paths['ideb_iniciais'],
+        file_paths['ideb_finais'],
+        snapshot_cache=snapshot_cache
+    )
+    return processor
+
+def refresh_preloaded_data(file_paths, progress=None):
+    """Make the alias of the preloaded files point at the processed version of their current contents"""
+    
+    registry = get_dataset_registry()
+    handle = preloaded_handle(file_paths)
+    alias = preloaded_alias(file_paths)
+    # A touched file with unchanged contents hashes to the version already served
+    if registry.resolve(alias) != handle:
+        registry.get_or_build(handle, lambda: build_preloaded_data(file_paths, progress=progress))
+        registry.point(alias, handle)
+    return alias
+
+@st.cache_resource(show_spinner=False)
+def start_preloaded_watcher():
+    """Rebuild the sample files in the background whenever they change, once per server"""
+    
+    # PRELOADED_WATCH_INTERVAL seconds between checks; 0 turns the watcher off
+    interval = float(os.environ.get('PRELOADED_WATCH_INTERVAL', 5))
+    if interval <= 0 or not all(os.path.exists(f) for f in SAMPLE_FILES.values()):
+        return None
+    
+    # Sessions keep serving the previous version until the new one is published, then
+    # pick it up through the alias on their next rerun
+    watcher = SourceWatcher(
+        SAMPLE_FILES.values(), lambda: refresh_preloaded_data(SAMPLE_FILES), interval=interval
+    )
+    watcher.start()
+    return watcher
+
+@st.cache_resource(show_spinner=False)
+def start_preloaded_warmup():
+    """Start processing the sample files in the background, once per server"""
+    
+    if not all(os.path.exists(f) for f in SAMPLE_FILES.values()):
+        return None
+    
+    # The result lands in the dataset registry, so the first click finds it ready
+    return get_dataset_registry().warm_up(
+        preloaded_handle(SAMPLE_FILES), lambda: build_preloaded_data(SAMPLE_FILES)
+    )
+
 def load_preloaded_data(file_paths):
     """Load and process the preloaded data files"""
     
     try:
         with st.spinner("Carregando dados..."):
-            processor = DataProcessor()
-            
-            # Create file-like objects for the processor
-            class FileWrapper:
-                def __init__(self, filepath):
-                    self.filepath = filepath
-                    self.name = os.path.basename(filepath)
-            
-            file_objects = {
-                'escolas': FileWrapper(file_paths['escolas']),
-                'ideb_iniciais': FileWrapper(file_paths['ideb_iniciais']),
-                'ideb_finais': FileWrapper(file_paths['ideb_finais'])
-            }
-            
-            # Process using file paths directly
-            processed_data = processor.process_files_from_paths(
-                file_paths['escolas'],
-                file_paths['ideb_iniciais'],
-                file_paths['ideb_finais']
-            )
+            # Every session using the same files shares one read-only copy of the result;
+            # while the warm-up (or another session) is still processing them, this waits for it.
+            # The session keeps the alias, so it follows the files when the watcher rebuilds them
+            handle = refresh_preloaded_data(file_paths, progress=create_progress_callback())
+            processor = get_dataset_registry().get(handle)
             
-            st.session_state.data_processor = processor
-            st.session_state.processed_data = processed_data
+            st.session_state.dataset_handle = handle
             st.session_state.analysis_complete = True
             
-            st.success(f"✅ Dados carregados com sucesso! {len(processed_data)} escolas processadas.")
+            st.success(f"✅ Dados carregados com sucesso! {processor.row_count()} escolas processadas.")
             st.rerun()  # Force a rerun to update the UI
             return True
             
@@ -0,0 +1,55 @@
+import streamlit as st
+import pandas as pd
+
+# Portuguese names of the DataProcessor stages
+STAGE_LABELS = {
+    'snapshot': 'Leitura do snapshot',
+    'read_escolas': 'Leitura das escolas',
+    'read_ideb_iniciais': 'Leitura do IDEB (anos iniciais)',
+    'read_ideb_finais': 'Leitura do IDEB (anos finais)',
+    'validate_escolas': 'Validação das colunas das escolas',
+    'validate_ideb_iniciais': 'Validação das colunas do IDEB (anos iniciais)',
+    'validate_ideb_finais': 'Validação das colunas do IDEB (anos finais)',
+    'check_keys': 'Verificação de códigos repetidos',
+    'clean_escolas': 'Limpeza e validação das escolas',
+    'metrics': 'Indicadores IDEB',
+    'clean_ideb_iniciais': 'Limpeza do IDEB (anos iniciais)',
+    'clean_ideb_finais': 'Limpeza do IDEB (anos finais)',
+    'merge': 'Junção com o IDEB',
+    'final_cleanup': 'Limpeza final',
+    'compact': 'Compactação dos tipos',
+}
+
+def format_stage_timings(timings):
+    """Return the stage events of a run as a table for display"""
+    
+    return pd.DataFrame({
+        'Etapa': timings['etapa'].map(lambda stage: STAGE_LABELS.get(stage, stage)),
+        'Origem': timings['cache'].map({True: 'cache', False: 'processado'}),
+        'Linhas': timings['linhas'],
+        'Tempo (s)': timings['segundos'].round(3),
+        'Memória (MB)': timings['memoria_mb'].round(1),
+    })
+
+def create_progress_callback():
+    """Return a callback rendering a progress bar with a live stage breakdown as stages finish"""
+    
+    # The widgets only appear once a stage actually runs, so a dataset that is already
+    # available never flashes an empty bar
+    widgets = {}
+    events = []
+    
+    def on_stage(event):
+        if not widgets:
+            widgets['bar'] = st.progress(0.0, text="Iniciando o processamento...")
+            widgets['table'] = st.empty()
+        bar, table = widgets['bar'], widgets['table']
+        events.append(event)
+        label = STAGE_LABELS.get(event['etapa'], event['etapa'])
+        bar.progress(
+            min(event['concluidas'] / event['total'], 1.0),
+            text=f"{label} ({event['concluidas']}/{event['total']})"
+        )
+        table.dataframe(format_stage_timings(pd.DataFrame(events)), hide_index=True)
+    
+    return on_stage
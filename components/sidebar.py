@@ -2,16 +2,76 @@ import streamlit as st
 import pandas as pd
 import numpy as np
 
-def render_sidebar(data):
+def render_metric_selector(metric_store, default):
+    """Render the selector for the IDEB indicator shown in the IDEB columns"""
+    
+    if metric_store is None:
+        return default
+    
+    indicators = metric_store.indicators()
+    if not indicators:
+        return default
+    st.sidebar.subheader("📈 Indicador IDEB")
+    return st.sidebar.selectbox(
+        "Indicador exibido nas colunas IDEB:",
+        options=indicators,
+        index=indicators.index(default) if default in indicators else 0,
+        help="Troca o indicador sem reprocessar os arquivos"
+    )
+
+def render_sidebar(data, backend=None, indicator=None):
     """Render the sidebar with filtering options"""
     
+    # With a query backend (and data None) the options and slider bounds are DISTINCT and
+    # MIN/MAX queries, so the table is never scanned in pandas
+    if backend is not None:
+        columns = backend.columns
+        
+        def categories(column, municipio=None):
+            return backend.distinct(column, {'municipio': municipio} if municipio else None)
+        
+        def bounds(column):
+            return backend.bounds(column, indicator)
+    else:
+        columns = data.columns
+        
+        def categories(column, municipio=None):
+            values = data[column]
+            if municipio:
+                values = values[data['Nome do Município'] == municipio]
+            return sorted(values.dropna().unique())
+        
+        def bounds(column):
+            if column == 'Percentual_AC':
+                # Calculate AC percentage for filtering (only the bounds are needed, so no copy of data)
+                values = (data['Salas com Ar'] / data['Total de Salas'] * 100).fillna(0)
+            else:
+                values = data[column].dropna()
+            if values.empty:
+                return None, None
+            return values.min(), values.max()
+    
     st.sidebar.header("🔍 Filtros de Análise")
     
     filters = {}
     
     # Neighborhood filter
     st.sidebar.subheader("📍 Localização")
-    bairros = sorted(data['Bairro'].dropna().unique())
+    
+    # Municipality filter, for datasets loaded with several municipalities
+    municipio = None
+    if 'Nome do Município' in columns:
+        municipios = categories('Nome do Município')
+        if len(municipios) > 1:
+            filters['municipio'] = st.sidebar.selectbox(
+                "Selecione o município:",
+                options=['Todos'] + municipios,
+                help="Filtrar escolas por município"
+            )
+            if filters['municipio'] != 'Todos':
+                municipio = filters['municipio']
+    
+    bairros = categories('Bairro', municipio)
     filters['bairro'] = st.sidebar.selectbox(
         "Selecione o bairro:",
         options=['Todos'] + list(bairros),
@@ -21,12 +81,7 @@ def render_sidebar(data):
     # Air conditioning percentage filter
     st.sidebar.subheader("❄️ Climatização")
     
-    # Calculate AC percentage for filtering
-    data_temp = data.copy()
-    data_temp['Percentual_AC'] = (data_temp['Salas com Ar'] / data_temp['Total de Salas'] * 100).fillna(0)
-    
-    min_ac = float(data_temp['Percentual_AC'].min())
-    max_ac = float(data_temp['Percentual_AC'].max())
+    min_ac, max_ac = (float(value) for value in bounds('Percentual_AC'))
     
     filters['ac_range'] = st.sidebar.slider(
         "Percentual de salas com ar-condicionado:",
@@ -40,8 +95,7 @@ def render_sidebar(data):
     
     # School size filter
     st.sidebar.subheader("🏫 Tamanho da Escola")
-    min_salas = int(data['Total de Salas'].min())
-    max_salas = int(data['Total de Salas'].max())
+    min_salas, max_salas = (int(value) for value in bounds('Total de Salas'))
     
     filters['salas_range'] = st.sidebar.slider(
         "Número total de salas:",
@@ -55,10 +109,9 @@ def render_sidebar(data):
     st.sidebar.subheader("📚 Performance IDEB")
     
     # IDEB Iniciais filter
-    ideb_iniciais_valid = data['IDEB Iniciais'].dropna()
-    if not ideb_iniciais_valid.empty:
-        min_ideb_i = float(ideb_iniciais_valid.min())
-        max_ideb_i = float(ideb_iniciais_valid.max())
+    min_ideb_i, max_ideb_i = bounds('IDEB Iniciais')
+    if min_ideb_i is not None:
+        min_ideb_i, max_ideb_i = float(min_ideb_i), float(max_ideb_i)
         filters['ideb_iniciais_range'] = st.sidebar.slider(
             "IDEB Anos Iniciais:",
             min_value=min_ideb_i,
@@ -72,10 +125,9 @@ def render_sidebar(data):
         filters['ideb_iniciais_range'] = None
     
     # IDEB Finais filter
-    ideb_finais_valid = data['IDEB Finais'].dropna()
-    if not ideb_finais_valid.empty:
-        min_ideb_f = float(ideb_finais_valid.min())
-        max_ideb_f = float(ideb_finais_valid.max())
+    min_ideb_f, max_ideb_f = bounds('IDEB Finais')
+    if min_ideb_f is not None:
+        min_ideb_f, max_ideb_f = float(min_ideb_f), float(max_ideb_f)
         filters['ideb_finais_range'] = st.sidebar.slider(
             "IDEB Anos Finais:",
             min_value=min_ideb_f,
@@ -0,0 +1,28 @@
+"""Clean a Censo Escolar file in chunks and store it partitioned by municipality.
+
+    python ingest_census.py microdados_ed_basica_2023.csv dados/censo_particionado
+"""
+import argparse
+import time
+from utils.data_processor import DataProcessor
+from utils.partition_store import PartitionStore
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('censo', help="Arquivo do censo (xlsx, csv, parquet ou feather)")
+    parser.add_argument('destino', help="Diretório dos dados particionados")
+    parser.add_argument('--chunk-rows', type=int, default=50_000)
+    args = parser.parse_args()
+    
+    start = time.perf_counter()
+    summary = DataProcessor().ingest_census_partitioned(
+        args.censo, PartitionStore(args.destino), chunk_rows=args.chunk_rows
+    )
+    print(
+        f"{summary['linhas_filtradas']} linhas de escolas públicas lidas, {summary['linhas_rejeitadas']} rejeitadas, "
+        f"{summary['escolas']} escolas válidas "
+        f"em {summary['municipios']} municípios ({time.perf_counter() - start:.1f}s)"
+    )
+
+if __name__ == '__main__':
+    main()
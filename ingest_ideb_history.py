@@ -0,0 +1,28 @@
+"""Melt every release year of the IDEB files into one long panel stored as Parquet.
+
+    python ingest_ideb_history.py ideb_iniciais.xlsx ideb_finais.xlsx dados/ideb_panel.parquet
+"""
+import argparse
+import time
+from utils.data_processor import DataProcessor
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('ideb_iniciais', help="Arquivo do IDEB dos anos iniciais")
+    parser.add_argument('ideb_finais', help="Arquivo do IDEB dos anos finais")
+    parser.add_argument('destino', help="Arquivo Parquet do painel")
+    parser.add_argument('--duplicatas', default='first', help="Política para códigos repetidos (first, mean ou fail)")
+    args = parser.parse_args()
+    
+    start = time.perf_counter()
+    panel = DataProcessor(duplicate_policy=args.duplicatas).process_ideb_history(args.ideb_iniciais, args.ideb_finais)
+    # Stored in the panel's order (school, stage, indicator, year), so it loads back already sorted
+    panel.to_frame().to_parquet(args.destino, index=False)
+    years = panel.available_years()
+    print(
+        f"{len(panel)} valores de {len(panel.indicator_names)} indicadores "
+        f"entre {years[0]} e {years[-1]} ({time.perf_counter() - start:.1f}s)"
+    )
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,25 @@
+import os
+import pytest
+from utils.data_processor import DataProcessor
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Sample files shipped with the app
+SAMPLE_PATHS = [
+    os.path.join(ROOT, 'escolas_rio.xlsx'),
+    os.path.join(ROOT, 'ideb_iniciais.xlsx'),
+    os.path.join(ROOT, 'ideb_finais.xlsx'),
+]
+
+@pytest.fixture(scope='session')
+def sample_paths():
+    """Paths of the sample school census and IDEB workbooks"""
+    
+    return list(SAMPLE_PATHS)
+
+@pytest.fixture(scope='session', params=[False, True], ids=['texto', 'categoricals'])
+def processed(request):
+    """(processor, processed frame) of the sample files, with plain text and categorical bairros"""
+    
+    processor = DataProcessor(categoricals=request.param)
+    return processor, processor.process_files_from_paths(*SAMPLE_PATHS)
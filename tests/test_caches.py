@@ -0,0 +1,152 @@
+import os
+import shutil
+import numpy as np
+import pandas as pd
+import pytest
+from utils.data_processor import DataProcessor
+from utils.pipeline import Pipeline, StageCache, value_nbytes
+from utils.snapshot_cache import SnapshotCache
+
+@pytest.fixture
+def copied_paths(sample_paths, tmp_path):
+    """Copies of the sample files that a test may modify"""
+    
+    paths = []
+    for path in sample_paths:
+        paths.append(str(tmp_path / os.path.basename(path)))
+        shutil.copyfile(path, paths[-1])
+    return paths
+
+def frame(n, seed=0):
+    return pd.DataFrame({'a': np.random.default_rng(seed).random(n), 'b': np.arange(n)})
+
+def test_snapshot_round_trip(tmp_path):
+    cache = SnapshotCache(cache_dir=str(tmp_path / 'snapshots'))
+    frames = {'data': frame(50), 'report': frame(3, seed=1)}
+    cache.store('chave', frames)
+    
+    loaded = cache.load('chave')
+    assert sorted(loaded) == ['data', 'report']
+    for name, df in frames.items():
+        pd.testing.assert_frame_equal(loaded[name], df)
+    assert cache.load('outra') is None
+
+def test_snapshot_store_replaces_an_existing_key(tmp_path):
+    cache = SnapshotCache(cache_dir=str(tmp_path / 'snapshots'))
+    cache.store('chave', {'data': frame(5), 'antigo': frame(2)})
+    cache.store('chave', {'data': frame(7)})
+    
+    assert list(cache.load('chave')) == ['data']
+    # Nothing is left behind from the swap
+    assert os.listdir(cache.cache_dir) == ['chave']
+
+def test_snapshot_prunes_the_oldest(tmp_path):
+    cache = SnapshotCache(cache_dir=str(tmp_path / 'snapshots'), max_snapshots=2)
+    for i, key in enumerate(['a', 'b', 'c']):
+        cache.store(key, {'data': frame(3)})
+        os.utime(os.path.join(cache.cache_dir, key), ns=(i * 10**9, i * 10**9))
+    
+    assert cache.load('a') is None
+    assert cache.load('c') is not None
+
+def test_snapshot_key_follows_contents_and_options(copied_paths, tmp_path):
+    cache = SnapshotCache(cache_dir=str(tmp_path / 'snapshots'))
+    key = cache.key_for(copied_paths, extra={'municipios': []})
+    
+    assert cache.key_for(copied_paths, extra={'municipios': []}) == key
+    assert cache.key_for(copied_paths, extra={'municipios': [3304557]}) != key
+    with open(copied_paths[1], 'ab') as f:
+        f.write(b'\0')
+    assert cache.key_for(copied_paths, extra={'municipios': []}) != key
+
+def test_processor_serves_unchanged_files_from_the_snapshot(copied_paths, tmp_path):
+    cache = SnapshotCache(cache_dir=str(tmp_path / 'snapshots'))
+    first = DataProcessor()
+    expected = first.process_files_from_paths(*copied_paths, snapshot_cache=cache)
+    
+    second = DataProcessor()
+    result = second.process_files_from_paths(*copied_paths, snapshot_cache=cache)
+    assert second.last_run_report == {'snapshot': 'hit'}
+    pd.testing.assert_frame_equal(result, expected)
+    assert second.metric_store.indicators() == first.metric_store.indicators()
+    
+    # Other output options are another snapshot
+    other = DataProcessor(duplicate_policy='mean')
+    other.process_files_from_paths(*copied_paths, snapshot_cache=cache)
+    assert other.last_run_report != {'snapshot': 'hit'}
+
+def test_snapshot_without_data_is_a_miss(copied_paths, tmp_path):
+    cache = SnapshotCache(cache_dir=str(tmp_path / 'snapshots'))
+    processor = DataProcessor()
+    expected = processor.process_files_from_paths(*copied_paths, snapshot_cache=cache)
+    key = cache.key_for(copied_paths, extra=processor._output_options())
+    os.remove(os.path.join(cache.cache_dir, key, 'data.parquet'))
+    
+    rebuilt = DataProcessor()
+    result = rebuilt.process_files_from_paths(*copied_paths, snapshot_cache=cache)
+    assert rebuilt.last_run_report != {'snapshot': 'hit'}
+    pd.testing.assert_frame_equal(result, expected)
+    assert 'data.parquet' in os.listdir(os.path.join(cache.cache_dir, key))
+
+def test_stage_cache_is_bounded_by_bytes():
+    small = frame(100)
+    size = value_nbytes(small)
+    cache = StageCache(max_bytes=int(size * 2.5))
+    for key in ('a', 'b', 'c'):
+        cache.put(key, frame(100))
+    
+    assert cache.get('a') == (False, None)
+    assert cache.get('b')[0] and cache.get('c')[0]
+    assert cache.current_bytes == 2 * size
+    # Outputs larger than the budget are never memoized
+    cache.put('grande', frame(1000))
+    assert cache.get('grande') == (False, None)
+
+def run_pipeline(cache, digests, params=()):
+    """Two sources, a stage per source and a stage joining both; returns (pipeline, calls)"""
+    
+    calls = []
+    
+    def doubled(name):
+        def func(value):
+            calls.append(name)
+            return value * 2
+        return func
+    
+    pipeline = Pipeline(cache)
+    pipeline.source('x', 1, digests[0])
+    pipeline.source('y', 10, digests[1])
+    pipeline.stage('dobro_x', doubled('dobro_x'), ['x'], params)
+    pipeline.stage('dobro_y', doubled('dobro_y'), ['y'])
+    pipeline.stage('soma', lambda a, b: calls.append('soma') or a + b, ['dobro_x', 'dobro_y'])
+    return pipeline, calls
+
+def test_pipeline_reruns_only_downstream_of_a_change():
+    cache = StageCache()
+    pipeline, calls = run_pipeline(cache, ['x1', 'y1'])
+    assert calls == ['dobro_x', 'dobro_y', 'soma']
+    assert pipeline.values['soma'] == 22
+    
+    pipeline, calls = run_pipeline(cache, ['x1', 'y1'])
+    assert calls == []
+    assert list(pipeline.report.values()) == ['hit', 'hit', 'hit']
+    
+    pipeline, calls = run_pipeline(cache, ['x1', 'y2'])
+    assert calls == ['dobro_y', 'soma']
+    assert dict(pipeline.report) == {'dobro_x': 'hit', 'dobro_y': 'miss', 'soma': 'miss'}
+
+def test_pipeline_stage_parameters_are_part_of_the_key():
+    cache = StageCache()
+    run_pipeline(cache, ['x1', 'y1'], params=('first',))
+    
+    _, calls = run_pipeline(cache, ['x1', 'y1'], params=('mean',))
+    assert calls == ['dobro_x', 'soma']
+
+def test_processor_reuses_stages_of_unchanged_inputs(copied_paths):
+    cache = StageCache()
+    expected = DataProcessor(stage_cache=cache).process_files_from_paths(*copied_paths)
+    
+    processor = DataProcessor(stage_cache=cache)
+    result = processor.process_files_from_paths(*copied_paths)
+    assert set(processor.last_run_report.values()) == {'hit'}
+    pd.testing.assert_frame_equal(result, expected)
@@ -0,0 +1,115 @@
+import numpy as np
+import pandas as pd
+import pytest
+from utils.query_backend import QueryBackend
+from utils.range_index import FilterIndex
+
+def mask_filters(data, filters):
+    """The sidebar filters as plain boolean masks, the reference for both engines"""
+    
+    mask = pd.Series(True, index=data.index)
+    if filters.get('bairro') and filters['bairro'] != 'Todos':
+        mask &= data['Bairro'] == filters['bairro']
+    for key, column in (('ac_range', 'Percentual_AC'), ('salas_range', 'Total de Salas')):
+        if filters.get(key):
+            lo, hi = filters[key]
+            mask &= (data[column] >= lo) & (data[column] <= hi)
+    # Schools without IDEB are kept
+    for key, column in (('ideb_iniciais_range', 'IDEB Iniciais'), ('ideb_finais_range', 'IDEB Finais')):
+        if filters.get(key):
+            lo, hi = filters[key]
+            mask &= ((data[column] >= lo) & (data[column] <= hi)) | data[column].isna()
+    return data[mask.fillna(False).astype(bool)]
+
+def scenarios(data):
+    """Sidebar states, from untouched sliders to empty selections"""
+    
+    full = {
+        'bairro': 'Todos',
+        'ac_range': (float(data['Percentual_AC'].min()), float(data['Percentual_AC'].max())),
+        'salas_range': (int(data['Total de Salas'].min()), int(data['Total de Salas'].max())),
+        'ideb_iniciais_range': (float(data['IDEB Iniciais'].min()), float(data['IDEB Iniciais'].max())),
+        'ideb_finais_range': (float(data['IDEB Finais'].min()), float(data['IDEB Finais'].max())),
+    }
+    bairro = data['Bairro'].value_counts().index[0]
+    return {
+        'limites': full,
+        'bairro': {**full, 'bairro': bairro},
+        'bairro inexistente': {**full, 'bairro': 'NÃO EXISTE'},
+        'faixa de AC': {**full, 'ac_range': (10.0, 90.0)},
+        'faixas estreitas': {**full, 'ac_range': (40.0, 45.5), 'salas_range': (10, 20)},
+        'salas fracionárias': {**full, 'salas_range': (5.5, 7.5)},
+        'IDEB alto': {**full, 'bairro': bairro, 'ideb_iniciais_range': (99.1, 100.0)},
+        'IDEB finais': {**full, 'ideb_finais_range': (75.0, 95.2)},
+        'vazio': {**full, 'salas_range': (100, 200)},
+    }
+
+SCENARIOS = [
+    'limites', 'bairro', 'bairro inexistente', 'faixa de AC', 'faixas estreitas',
+    'salas fracionárias', 'IDEB alto', 'IDEB finais', 'vazio',
+]
+
+@pytest.fixture(scope='module')
+def sqlite_backend(processed):
+    """SQLite copy of the processed sample data"""
+    
+    processor, data = processed
+    return QueryBackend(data, processor.metric_store, 'sqlite', default_indicator=processor.DEFAULT_INDICATOR)
+
+@pytest.mark.parametrize('scenario', SCENARIOS)
+def test_apply_filters_matches_masks(processed, scenario):
+    processor, data = processed
+    filters = scenarios(data)[scenario]
+    
+    pd.testing.assert_frame_equal(processor.apply_filters(data, filters), mask_filters(data, filters))
+
+@pytest.mark.parametrize('scenario', SCENARIOS)
+def test_query_backend_matches_apply_filters(processed, sqlite_backend, scenario):
+    processor, data = processed
+    filters = scenarios(data)[scenario]
+    expected = processor.apply_filters(data, filters).reset_index(drop=True)
+    view = sqlite_backend.view(filters)
+    
+    assert view.count() == len(expected)
+    pd.testing.assert_frame_equal(view.to_frame(), expected)
+
+def test_query_backend_summary_matches_pandas(processed, sqlite_backend):
+    processor, data = processed
+    filters = scenarios(data)['faixa de AC']
+    expected = processor.apply_filters(data, filters)
+    summary = sqlite_backend.view(filters).summary()
+    
+    assert summary['escolas'] == len(expected)
+    assert summary['salas'] == expected['Total de Salas'].sum()
+    assert summary['salas_com_ar'] == expected['Salas com Ar'].sum()
+    assert summary['ideb_iniciais'] == pytest.approx(expected['IDEB Iniciais'].mean())
+
+def test_query_backend_swaps_indicators_like_with_metric(processed, sqlite_backend):
+    processor, data = processed
+    indicator = next(name for name in processor.metric_store.indicators() if name != processor.DEFAULT_INDICATOR)
+    expected = processor.with_metric(data, indicator)
+    
+    result = sqlite_backend.view({}, indicator).to_frame()
+    np.testing.assert_allclose(
+        result['IDEB Iniciais'].to_numpy(dtype=float), expected['IDEB Iniciais'].to_numpy(dtype=float)
+    )
+
+def test_filter_index_select_positions(processed):
+    _, data = processed
+    index = FilterIndex(data)
+    positions = index.select([
+        ('Total de Salas', ('range', 10, 20), False),
+        ('IDEB Iniciais', ('range', 99.0, 100.0), True),
+    ])
+    
+    expected = np.flatnonzero(
+        data['Total de Salas'].between(10, 20)
+        & (data['IDEB Iniciais'].between(np.float32(99.0), 100.0) | data['IDEB Iniciais'].isna())
+    )
+    np.testing.assert_array_equal(positions, expected)
+
+def test_filter_index_restricting_nothing_returns_none(processed):
+    _, data = processed
+    salas = data['Total de Salas']
+    
+    assert FilterIndex(data).select([('Total de Salas', ('range', salas.min(), salas.max()), False)]) is None
@@ -0,0 +1,67 @@
+import io
+import pandas as pd
+import pytest
+from utils.ingest import TableReader
+
+def inep_csv(n_rows=5000, last_name='ESCOLA SÃO JOÃO'):
+    """A ';' census file whose only non-ASCII text is in its last row, past the sniffed head"""
+    
+    rows = ['CO_ENTIDADE;NO_ENTIDADE;TP_DEPENDENCIA']
+    rows += [f'{33000000 + i};ESCOLA MUNICIPAL {i};3' for i in range(n_rows)]
+    rows.append(f'33999999;{last_name};3')
+    return '\n'.join(rows) + '\n'
+
+@pytest.fixture
+def latin1_file(tmp_path):
+    data = inep_csv().encode('latin-1')
+    assert len(data) > 65536 and data[:65536].isascii()
+    path = tmp_path / 'censo.csv'
+    path.write_bytes(data)
+    return path
+
+def test_sniff_csv_detects_delimiter():
+    reader = TableReader()
+    
+    assert reader._sniff_csv(io.BytesIO(b'a,b,c\n1,2,3\n')) == (',', 'utf-8')
+    assert reader._sniff_csv(io.BytesIO(b'a;b;c\n1;2;3\n')) == (';', 'utf-8')
+    assert reader._sniff_csv(io.BytesIO('NO;SÃO\n'.encode('latin-1'))) == (';', 'latin-1')
+
+@pytest.mark.parametrize('as_upload', [False, True], ids=['caminho', 'upload'])
+def test_latin1_file_with_ascii_head(latin1_file, as_upload):
+    reader = TableReader()
+    source = io.BytesIO(latin1_file.read_bytes()) if as_upload else str(latin1_file)
+    
+    # Only the head is sniffed, and it is plain ASCII
+    assert reader._sniff_csv(source) == (';', 'utf-8')
+    df = reader.read_csv(source)
+    assert len(df) == 5001
+    assert df['NO_ENTIDADE'].iloc[-1] == 'ESCOLA SÃO JOÃO'
+
+def test_latin1_fallback_keeps_every_chunk_once(latin1_file):
+    chunks = list(TableReader().iter_chunks(str(latin1_file), 'csv', chunk_rows=700))
+    
+    df = pd.concat(chunks, ignore_index=True)
+    assert df['CO_ENTIDADE'].is_unique
+    assert len(df) == 5001
+    assert df['NO_ENTIDADE'].iloc[-1] == 'ESCOLA SÃO JOÃO'
+
+def test_utf8_head_cut_inside_a_character():
+    reader = TableReader()
+    # 'ã' is two bytes in utf-8; the 64KB head ends between them
+    data = ('A;B\n' + 'a;' + 'x' * 65529 + 'ã\n' + '1;ção\n').encode('utf-8')
+    assert data[65535] >= 0x80
+    
+    assert reader._sniff_csv(io.BytesIO(data)) == (';', 'utf-8')
+    df = reader.read_csv(io.BytesIO(data))
+    assert df['B'].tolist() == ['x' * 65529 + 'ã', 'ção']
+
+def test_read_csv_projects_and_filters():
+    # School 33000003 becomes a state school (TP_DEPENDENCIA 2)
+    data = inep_csv(n_rows=10).replace('33000003;ESCOLA MUNICIPAL 3;3', '33000003;ESCOLA MUNICIPAL 3;2').encode('utf-8')
+    df = TableReader().read_csv(
+        io.BytesIO(data), columns=['CO_ENTIDADE'], filters={'TP_DEPENDENCIA': [3]}
+    )
+    
+    assert list(df.columns) == ['CO_ENTIDADE', 'TP_DEPENDENCIA']
+    assert len(df) == 10
+    assert 33000003 not in df['CO_ENTIDADE'].tolist()
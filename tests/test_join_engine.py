@@ -0,0 +1,86 @@
+import numpy as np
+import pandas as pd
+import pytest
+from utils.join_engine import SortedKeyJoin, normalize_codes, resolve_duplicates
+
+KEY = 'Código da Escola'
+
+@pytest.fixture
+def tables():
+    """Unsorted left table and a right table with text and float codes, unmatched on both sides"""
+    
+    rng = np.random.default_rng(7)
+    left = pd.DataFrame({
+        KEY: rng.permutation(np.arange(100, 160, dtype=np.int64)),
+        'Salas': rng.integers(1, 30, 60),
+    })
+    right_codes = np.arange(130, 190, 2)
+    right = pd.DataFrame({
+        KEY: [str(code) if code % 4 else float(code) for code in right_codes],
+        'Taxa': rng.random(len(right_codes)),
+    })
+    return left, right
+
+def test_left_join_matches_merge(tables):
+    left, right = tables
+    result = SortedKeyJoin(KEY).left_join(left, right, 'iniciais', columns={'Taxa': 'IDEB'})
+    
+    expected = left.merge(
+        right.assign(**{KEY: pd.to_numeric(right[KEY]).astype(np.int64)}).rename(columns={'Taxa': 'IDEB'}),
+        on=KEY, how='left'
+    ).sort_values(KEY, kind='stable')
+    pd.testing.assert_frame_equal(result.reset_index(drop=True), expected.reset_index(drop=True))
+
+def test_left_join_reports_unmatched_codes(tables):
+    left, right = tables
+    join = SortedKeyJoin(KEY)
+    join.left_join(left, right, 'iniciais', columns={'Taxa': 'IDEB'})
+    
+    right_codes = set(pd.to_numeric(right[KEY]).astype(np.int64))
+    left_codes = set(left[KEY])
+    assert join.unmatched['iniciais']['esquerda'].tolist() == sorted(left_codes - right_codes)
+    assert join.unmatched['iniciais']['direita'].tolist() == sorted(right_codes - left_codes)
+    report = join.report()
+    assert report['Códigos sem par'].tolist() == [len(left_codes - right_codes), len(right_codes - left_codes)]
+
+def test_normalize_codes_drops_missing_and_fractional_codes():
+    df = pd.DataFrame({KEY: ['3', None, '1.5', 2.0, 'x'], 'v': range(5)})
+    result = normalize_codes(df, KEY)
+    
+    assert result[KEY].dtype == np.int64
+    assert result[KEY].tolist() == [2, 3]
+    assert result['v'].tolist() == [3, 0]
+
+@pytest.fixture
+def repeated():
+    """Sorted codes with repeats, a numeric and a text column"""
+    
+    return pd.DataFrame({
+        KEY: np.array([1, 1, 2, 3, 3, 3], dtype=np.int64),
+        'Taxa': [10.0, 20.0, 5.0, 1.0, np.nan, 4.0],
+        'Nome': ['a', 'b', 'c', 'd', 'e', 'f'],
+    })
+
+def test_resolve_duplicates_first_matches_drop_duplicates(repeated):
+    result = resolve_duplicates(repeated, KEY, 'first', 'teste')
+    
+    pd.testing.assert_frame_equal(result, repeated.drop_duplicates(KEY, keep='first'))
+
+def test_resolve_duplicates_mean_matches_groupby(repeated):
+    result = resolve_duplicates(repeated, KEY, 'mean', 'teste')
+    
+    expected = repeated.groupby(KEY, as_index=False).agg({'Taxa': 'mean', 'Nome': 'first'})
+    pd.testing.assert_frame_equal(result.reset_index(drop=True), expected)
+
+def test_resolve_duplicates_fail_names_the_codes(repeated):
+    with pytest.raises(ValueError, match='2 códigos de escola repetidos'):
+        resolve_duplicates(repeated, KEY, 'fail', 'teste')
+
+def test_resolve_duplicates_rejects_unknown_policy(repeated):
+    with pytest.raises(ValueError, match='Política de duplicatas inválida'):
+        resolve_duplicates(repeated, KEY, 'last', 'teste')
+
+def test_unique_codes_are_returned_as_is(repeated):
+    unique = repeated.drop_duplicates(KEY)
+    
+    assert resolve_duplicates(unique, KEY, 'fail', 'teste') is unique
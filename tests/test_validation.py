@@ -0,0 +1,72 @@
+import numpy as np
+import pandas as pd
+from utils.data_processor import DataProcessor
+from utils.validation import RuleEngine
+
+RULES = DataProcessor.SCHOOL_RULES
+
+def school_rows():
+    """One row per outcome of SCHOOL_RULES, named by the bits it should set"""
+    
+    return pd.DataFrame({
+        'Código da Escola': pd.array([1, 2, None, 4, 5, 6, 7], dtype='Int64'),
+        'Nome da Escola': ['ok', 'sem total', 'sem código', 'zero salas', 'ar negativo', 'ar demais', 'privada'],
+        'Total de Salas': [10, np.nan, 5, 0, 8, 4, 3],
+        'Salas com Ar': [5, 2, 1, 0, -1, 6, 9],
+    })
+
+def test_bitmask_per_failed_rule():
+    clean, rejected = RULES.evaluate(school_rows(), id_columns=['Nome da Escola'])
+    
+    assert clean['Nome da Escola'].tolist() == ['ok']
+    bitmasks = dict(zip(rejected['Nome da Escola'], rejected['Regras'].tolist()))
+    assert bitmasks == {
+        'sem total': 0b00010,
+        'sem código': 0b00001,
+        'zero salas': 0b00100,
+        'ar negativo': 0b01000,
+        'ar demais': 0b10000,
+        'privada': 0b10000,
+    }
+
+def test_missing_total_only_reports_its_own_rule():
+    _, rejected = RULES.evaluate(school_rows(), id_columns=['Nome da Escola'])
+    
+    bitmask = rejected.loc[rejected['Nome da Escola'] == 'sem total', 'Regras'].iloc[0]
+    assert RULES.describe(bitmask) == ['Total de Salas não numérico']
+
+def test_rows_outside_scope_are_dropped_without_report():
+    df = school_rows()
+    scope = (df['Nome da Escola'] != 'privada').to_numpy()
+    clean, rejected = RULES.evaluate(df, scope=scope, id_columns=['Nome da Escola'])
+    
+    assert 'privada' not in rejected['Nome da Escola'].tolist()
+    assert clean['Nome da Escola'].tolist() == ['ok']
+
+def test_id_columns_keep_nullable_dtypes():
+    _, rejected = RULES.evaluate(school_rows(), id_columns=['Código da Escola', 'Nome da Escola'])
+    
+    assert list(rejected.columns) == ['Código da Escola', 'Nome da Escola', 'Regras']
+    assert rejected['Código da Escola'].dtype == 'Int64'
+    assert rejected['Código da Escola'].isna().sum() == 1
+
+def test_summary_counts_rows_per_rule():
+    _, rejected = RULES.evaluate(school_rows())
+    summary = RULES.summary(rejected)
+    
+    assert summary['Regra'].tolist() == [name for name, _ in RULES.rules]
+    assert summary['Linhas rejeitadas'].tolist() == [1, 1, 1, 1, 2]
+
+def test_bitmask_dtype_grows_with_the_rules():
+    rules = [(f'regra {i}', lambda df: df['x'] > 0) for i in range(9)]
+    engine = RuleEngine(rules)
+    _, rejected = engine.evaluate(pd.DataFrame({'x': [1, -1]}))
+    
+    assert engine.bitmask_dtype == np.uint16
+    assert rejected['Regras'].tolist() == [(1 << 9) - 1]
+
+def test_processor_reports_rejected_codes_as_int64(processed):
+    processor, _ = processed
+    
+    assert processor.rejected_rows['Código da Escola'].dtype == 'Int64'
+    assert processor.rejected_rows['Regras'].map(RULES.describe).map(len).gt(0).all()
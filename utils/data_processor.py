@@ -1,59 +1,718 @@
+import threading
+import time
+from collections import OrderedDict, deque
 import pandas as pd
 import numpy as np
 import streamlit as st
+from utils.ingest import TableReader, WorkbookReader
+from utils.memory import current_rss_mb, working_copy
+from utils.join_engine import (
+    DUPLICATE_POLICIES, SortedKeyJoin, duplicate_diagnostics, normalize_codes, resolve_duplicates
+)
+from utils.metric_store import MetricStore
+from utils.ideb_panel import IdebPanel
+from utils.pipeline import Pipeline
+from utils.query_backend import QueryBackend
+from utils.range_index import FilterIndex
+from utils.validation import RuleEngine
+from concurrent.futures.process import BrokenProcessPool
+from utils.parallel_loader import ParallelLoader, available_cpus
 
 class DataProcessor:
     """Class for processing and cleaning school data"""
     
-    def __init__(self):
+    # Census columns the pipeline actually uses
+    SCHOOL_COLUMNS = [
+        'NO_ENTIDADE', 'CO_ENTIDADE', 'TP_DEPENDENCIA',
+        'QT_SALAS_UTILIZADAS', 'QT_SALAS_UTILIZA_CLIMATIZADAS'
+    ]
+    BAIRRO_COLUMNS = ['NO_BAIRRO', 'BAIRRO', 'Bairro']
+    # dtype hints for text inputs (INEP microdata CSVs) so codes are not parsed as objects;
+    # nullable, so a blank code reaches SCHOOL_RULES (and the rejection report) instead of failing the read
+    SCHOOL_DTYPES = {
+        'CO_ENTIDADE': 'Int64',
+        'TP_DEPENDENCIA': 'Int64',
+        'CO_MUNICIPIO': 'Int64',
+        'QT_SALAS_UTILIZADAS': 'float64',
+        'QT_SALAS_UTILIZA_CLIMATIZADAS': 'float64',
+    }
+    
+    # Dtype compaction of the final frame: room counts become the smallest unsigned int
+    # that holds them, rates float32 (IDEB has one decimal place) and bairros (and
+    # municipality names, in multi-municipality datasets) categorical
+    COUNT_COLUMNS = ['Total de Salas', 'Salas com Ar', 'Salas sem Ar']
+    RATE_COLUMNS = ['IDEB Iniciais', 'IDEB Finais', 'Percentual_AC']
+    CATEGORY_COLUMNS = ['Bairro', 'Nome do Município']
+    # Text is kept in Arrow string arrays (string[pyarrow] storage, NaN for missing values
+    # like the rest of the frame): contiguous buffers, Arrow compute for strip/search and
+    # a zero-copy hand-off to st.dataframe
+    TEXT_DTYPE = pd.StringDtype('pyarrow', na_value=np.nan)
+    TEXT_COLUMNS = ['Nome da Escola']
+    
+    # Validity rules of a cleaned school row, evaluated together; failed rules are
+    # reported as a bitmask per rejected row (bit i = rule i)
+    SCHOOL_RULES = RuleEngine([
+        ('Código da Escola inválido', lambda df: pd.to_numeric(df['Código da Escola'], errors='coerce') % 1 == 0),
+        ('Total de Salas não numérico', lambda df: df['Total de Salas'].notna()),
+        # Rules comparing against the room total pass when it is missing, so only the rule
+        # above names that cause
+        ('Total de Salas <= 0', lambda df: df['Total de Salas'].isna() | (df['Total de Salas'] > 0)),
+        ('Salas com Ar < 0', lambda df: df['Salas com Ar'] >= 0),
+        ('Salas com Ar > Total de Salas',
+         lambda df: df['Total de Salas'].isna() | (df['Salas com Ar'] <= df['Total de Salas'])),
+    ])
+    
+    MUNICIPIO_COLUMN = 'CO_MUNICIPIO'
+    # IDEB indicator shown in the 'IDEB Iniciais'/'IDEB Finais' columns by default
+    DEFAULT_INDICATOR = 'Taxa de Aprovação - 2023'
+    # Census columns kept (and renamed) when the data is partitioned by municipality
+    MUNICIPIO_COLUMNS = {
+        'CO_MUNICIPIO': 'Código do Município',
+        'NO_MUNICIPIO': 'Nome do Município',
+    }
+    
+    # Stages of _run_pipeline in execution order, for progress reporting
+    PIPELINE_STAGES = [
+        'read_escolas', 'read_ideb_iniciais', 'read_ideb_finais',
+        'validate_escolas', 'validate_ideb_iniciais', 'validate_ideb_finais', 'check_keys',
+        'clean_escolas', 'metrics', 'clean_ideb_iniciais', 'clean_ideb_finais',
+        'merge', 'final_cleanup', 'compact',
+    ]
+    
+    # Input files of the processing DAG, with the kind of reader each one needs
+    SOURCES = [
+        ('escolas', 'escolas'),
+        ('ideb_iniciais', 'ideb'),
+        ('ideb_finais', 'ideb'),
+    ]
+    
+    def __init__(self, streaming=False, municipios=None, parallel=False, categoricals=False,
+                 stage_cache=None, duplicate_policy='first', progress=None):
+        if duplicate_policy not in DUPLICATE_POLICIES:
+            raise ValueError(
+                f"Política de duplicatas inválida: {duplicate_policy}. Use uma de {list(DUPLICATE_POLICIES)}"
+            )
         self.processed_data = None
+        # Every IDEB indicator of both stages, filled in while processing
+        self.metric_store = None
+        # Per-column memory before/after dtype compaction, filled in while processing
+        self.memory_report = None
+        # School codes left without a match by each join, filled in while processing
+        self.join_report = None
+        # What to do with school codes repeated in an input: 'first', 'mean' or 'fail'
+        self.duplicate_policy = duplicate_policy
+        # Repeated school codes found in each input before merging
+        self.key_report = None
+        # Schools dropped by SCHOOL_RULES: code, name and failed-rule bitmask
+        self.rejected_rows = None
+        # Optional callback receiving one event dict per finished stage (see _emit_progress)
+        self.progress = progress
+        # The events of the last run, one row per stage, kept for later inspection
+        self.stage_timings = None
+        # Every year of the IDEB history files, filled by process_ideb_history
+        self.ideb_panel = None
+        # SQL copy of processed_data, built on first use by query_backend, and the frame it was built from
+        self._query_backend = None
+        self._query_backend_source = None
+        self._query_backend_lock = threading.Lock()
+        # Range indexes of the frames being filtered (the data and its recent indicator views)
+        self._filter_indexes = deque(maxlen=4)
+        self._filter_lock = threading.Lock()
+        # indicator -> (source frame, frame with that indicator), least recently used first
+        self._metric_frames = OrderedDict()
+        # Stream the school sheet reading only SCHOOL_COLUMNS instead of the whole sheet
+        self.streaming = streaming
+        # Optional municipality codes (CO_MUNICIPIO) to restrict the census to
+        self.municipios = set(municipios) if municipios else None
+        # Parse the three input files concurrently in a process pool
+        self.parallel = parallel
+        # Decode repeated xlsx text (e.g. bairros) from the shared-string table into categoricals
+        self.categoricals = categoricals
+        # Memo of stage outputs shared between runs (a utils.pipeline.StageCache)
+        self.stage_cache = stage_cache
+        # stage name -> 'hit' or 'miss' for the last processing run
+        self.last_run_report = None
+        self.reader = WorkbookReader()
+        self.table_reader = TableReader()
+    
+    def _reader_options(self):
+        """Constructor options that affect how input files are read"""
+        
+        return {
+            'streaming': self.streaming,
+            'municipios': self.municipios,
+            'categoricals': self.categoricals,
+        }
+    
+    def _output_options(self):
+        """Constructor options that change the processed output, for the snapshot key"""
+        
+        # parallel and the caches only change how fast the same result is produced
+        return {
+            'streaming': self.streaming,
+            'municipios': sorted(self.municipios or ()),
+            'categoricals': self.categoricals,
+            'duplicate_policy': self.duplicate_policy,
+        }
+    
+    def _uses_pool(self):
+        """Whether input files are read in the process pool"""
+        
+        # A pool only pays off with more than one core to run on
+        return self.parallel and available_cpus() > 1
+    
+    def _read_sources(self, jobs):
+        """Read (kind, source) jobs, in parallel when enabled"""
+        
+        if self._uses_pool():
+            try:
+                return ParallelLoader(self._reader_options()).read_all(jobs)
+            except BrokenProcessPool:
+                # Workers can be killed (e.g. out of memory); reading serially still works
+                pass
+        return [self._read_source(kind, source) for kind, source in jobs]
+    
+    def _read_source(self, kind, source):
+        """Read one input file of the given kind ('escolas' or 'ideb')"""
+        
+        if kind == 'escolas':
+            return self._read_school_sheet(source)
+        return self._read_ideb_sheet(source)
+    
+    def _read_ideb_sheet(self, source):
+        """Read an IDEB sheet skipping the empty header rows"""
+        
+        file_format = self.table_reader.detect_format(source)
+        if file_format == 'xlsx':
+            # Resolves the multi-row header band and types the indicator columns in one pass
+            df_ideb = self.reader.read_ideb_sheet(source)
+        elif file_format == 'xls':
+            df_ideb = pd.read_excel(source)
+        else:
+            df_ideb = self.table_reader.read_table(source, file_format)
+        
+        # Blank header rows show up as rows without a state; CSV/Parquet/Feather rarely have them
+        if 'Sigla da UF' not in df_ideb.columns or not df_ideb['Sigla da UF'].isna().any():
+            return df_ideb
+        return df_ideb.dropna(subset=['Sigla da UF']).reset_index(drop=True)
+    
+    def _school_filters(self):
+        """Row predicates for the school sheet, as column -> accepted values"""
+        
+        # Only public schools (TP_DEPENDENCIA == 3) are analysed
+        filters = {'TP_DEPENDENCIA': {3}}
+        if self.municipios:
+            filters[self.MUNICIPIO_COLUMN] = self.municipios
+        return filters
+    
+    def _read_school_sheet(self, source):
+        """Read the school census in any supported format, projected and filtered while reading"""
+        
+        file_format = self.table_reader.detect_format(source)
+        filters = self._school_filters()
+        columns = self.SCHOOL_COLUMNS + self.BAIRRO_COLUMNS
+        columns += [col for col in filters if col not in columns]
+        
+        if file_format == 'xlsx' and self.categoricals:
+            return self.reader.read_columns_categorical(source, columns, filters=filters)
+        if file_format == 'xlsx' and self.streaming:
+            return self.reader.read_columns(source, columns, filters=filters)
+        if file_format in ('xlsx', 'xls'):
+            return pd.read_excel(source)
+        return self.table_reader.read_table(
+            source, file_format, columns, filters=filters, dtypes=self.SCHOOL_DTYPES
+        )
     
     def process_files(self, arquivo_escolas, arquivo_ideb_iniciais, arquivo_ideb_finais):
         """Process the uploaded Excel files and return cleaned data"""
         
         try:
-            # Read Excel files - skip rows with NaN in first column for IDEB files
-            df_escolas = pd.read_excel(arquivo_escolas)
+            return self._run_pipeline(arquivo_escolas, arquivo_ideb_iniciais, arquivo_ideb_finais)
             
-            # For IDEB files, read and skip empty header rows
-            df_ideb_iniciais = pd.read_excel(arquivo_ideb_iniciais)
-            df_ideb_iniciais = df_ideb_iniciais.dropna(subset=['Sigla da UF']).reset_index(drop=True)
+        except Exception as e:
+            raise Exception(f"Erro no processamento dos dados: {str(e)}")
+    
+    def process_files_from_paths(self, path_escolas, path_ideb_iniciais, path_ideb_finais,
+                                 snapshot_cache=None):
+        """Process Excel files from file paths, reusing a cached snapshot when available"""
+        
+        try:
+            # Serve the processed frame straight from disk if the sources are unchanged
+            snapshot_key = None
+            if snapshot_cache is not None:
+                snapshot_key = snapshot_cache.key_for(
+                    [path_escolas, path_ideb_iniciais, path_ideb_finais], extra=self._output_options()
+                )
+                try:
+                    cached_data = snapshot_cache.load(snapshot_key)
+                except Exception:
+                    # A corrupt or unreadable snapshot is treated as a miss
+                    cached_data = None
+                # A snapshot without the processed frame (e.g. partial, from an older version) is a miss too
+                if cached_data is not None and 'data' in cached_data:
+                    self._start_progress()
+                    start = time.perf_counter()
+                    processed_data = self._restore_snapshot(cached_data)
+                    self._emit_progress('snapshot', True, processed_data, time.perf_counter() - start, total=1)
+                    return processed_data
             
-            df_ideb_finais = pd.read_excel(arquivo_ideb_finais)
-            df_ideb_finais = df_ideb_finais.dropna(subset=['Sigla da UF']).reset_index(drop=True)
+            processed_data = self._run_pipeline(path_escolas, path_ideb_iniciais, path_ideb_finais)
             
-            return self._process_dataframes(df_escolas, df_ideb_iniciais, df_ideb_finais)
+            if snapshot_cache is not None:
+                try:
+                    snapshot_cache.store(snapshot_key, self._snapshot_frames())
+                except Exception:
+                    # Failing to write the cache must not fail the load itself
+                    pass
             
+            return processed_data
+        
         except Exception as e:
             raise Exception(f"Erro no processamento dos dados: {str(e)}")
     
-    def process_files_from_paths(self, path_escolas, path_ideb_iniciais, path_ideb_finais):
-        """Process Excel files from file paths"""
+    def ingest_census_partitioned(self, source, store, chunk_rows=50_000):
+        """Clean a (national) census file chunk by chunk and store it partitioned by municipality"""
         
         try:
-            # Read Excel files - skip rows with NaN in first column for IDEB files
-            df_escolas = pd.read_excel(path_escolas)
+            counts = {'linhas_filtradas': 0, 'linhas_rejeitadas': 0, 'escolas': 0}
             
-            # For IDEB files, read and skip empty header rows
-            df_ideb_iniciais = pd.read_excel(path_ideb_iniciais)
-            df_ideb_iniciais = df_ideb_iniciais.dropna(subset=['Sigla da UF']).reset_index(drop=True)
+            def cleaned_chunks():
+                # Sorted int64 codes of the rows already handed to the store
+                seen = np.empty(0, dtype=np.int64)
+                for chunk in self._iter_school_chunks(source, chunk_rows):
+                    counts['linhas_filtradas'] += len(chunk)
+                    self._validate_school_columns(chunk, extra_required=[self.MUNICIPIO_COLUMN])
+                    df_chunk, rejected = self._process_school_data(
+                        chunk, extra_columns=self.MUNICIPIO_COLUMNS, unique=False
+                    )
+                    counts['linhas_rejeitadas'] += len(rejected)
+                    df_chunk, seen = self._drop_seen_codes(df_chunk, seen)
+                    counts['escolas'] += len(df_chunk)
+                    yield df_chunk
+                if counts['escolas'] == 0:
+                    # Raised before the store is swapped, so an existing one is left in place
+                    raise ValueError("Nenhuma escola válida encontrada no censo")
             
-            df_ideb_finais = pd.read_excel(path_ideb_finais)
-            df_ideb_finais = df_ideb_finais.dropna(subset=['Sigla da UF']).reset_index(drop=True)
+            # Chunks go to disk as they are cleaned, so the census is never held in memory at once;
+            # each municipality is then sorted by code, with 'mean' repeats resolved within it
+            manifest = store.write_chunks(
+                cleaned_chunks(), assemble=lambda partition: self._unique_codes(partition, 'escolas')
+            )
+            return {
+                'linhas_filtradas': counts['linhas_filtradas'],
+                'linhas_rejeitadas': counts['linhas_rejeitadas'],
+                'escolas': sum(info['escolas'] for info in manifest.values()),
+                'municipios': len(manifest),
+            }
+        
+        except Exception as e:
+            raise Exception(f"Erro no processamento do censo: {str(e)}")
+    
+    def _drop_seen_codes(self, df, seen):
+        """Apply the duplicate policy to codes repeated across chunks, given the sorted codes seen so far"""
+        
+        codes = df['Código da Escola'].to_numpy()
+        positions = np.searchsorted(seen, codes)
+        repeated = positions < len(seen)
+        repeated[repeated] = seen[positions[repeated]] == codes[repeated]
+        # Repeats inside the chunk too (its codes are sorted): every occurrence after the first
+        repeated[1:] |= codes[1:] == codes[:-1]
+        
+        # 'mean' keeps every row: repeats are averaged when the municipality is assembled
+        if repeated.any() and self.duplicate_policy != 'mean':
+            if self.duplicate_policy == 'fail':
+                examples = np.unique(codes[repeated])
+                raise ValueError(
+                    f"escolas: {len(examples)} códigos de escola repetidos "
+                    f"(ex.: {', '.join(str(code) for code in examples[:5])})"
+                )
+            df = df[~repeated]
+            codes = codes[~repeated]
+        return df, np.union1d(seen, codes)
+    
+    def _iter_school_chunks(self, source, chunk_rows):
+        """Yield the census in chunks of at most chunk_rows rows, projected and filtered"""
+        
+        file_format = self.table_reader.detect_format(source)
+        filters = self._school_filters()
+        columns = self.SCHOOL_COLUMNS + self.BAIRRO_COLUMNS + list(self.MUNICIPIO_COLUMNS)
+        columns += [col for col in filters if col not in columns]
+        
+        if file_format == 'xlsx':
+            yield from self.reader.iter_columns(source, columns, filters=filters, chunk_rows=chunk_rows)
+        elif file_format == 'xls':
+            df = pd.read_excel(source)
+            for start in range(0, len(df), chunk_rows):
+                yield df.iloc[start:start + chunk_rows]
+        else:
+            yield from self.table_reader.iter_chunks(
+                source, file_format, columns, filters=filters,
+                dtypes=self.SCHOOL_DTYPES, chunk_rows=chunk_rows
+            )
+    
+    def process_from_partitions(self, store, municipios, path_ideb_iniciais, path_ideb_finais):
+        """Process the selected municipalities of a partitioned census with the IDEB files"""
+        
+        try:
+            # Partitions are already cleaned, so only the IDEB side needs processing
+            df_escolas = store.load(municipios)
+            df_escolas = df_escolas.drop(columns=list(self.MUNICIPIO_COLUMNS.values()), errors='ignore')
+            
+            df_ideb_iniciais = self._normalize_ideb_columns(self._read_ideb_sheet(path_ideb_iniciais))
+            df_ideb_finais = self._normalize_ideb_columns(self._read_ideb_sheet(path_ideb_finais))
+            
+            return self._combine_with_ideb(df_escolas, df_ideb_iniciais, df_ideb_finais)
+        
+        except Exception as e:
+            raise Exception(f"Erro no processamento dos dados: {str(e)}")
+    
+    def build_municipal_dataset(self, census_store, path_ideb_iniciais, path_ideb_finais, dataset_store):
+        """Process every municipality of a partitioned census and store the results per municipality"""
+        
+        try:
+            ideb_sheets = [
+                self._normalize_ideb_columns(df)
+                for df in self._read_sources([('ideb', path_ideb_iniciais), ('ideb', path_ideb_finais)])
+            ]
+            # IDEB rows are split by municipality once, so each partition only joins its own schools
+            ideb_groups = [self._group_by_municipio(df) for df in ideb_sheets]
+            
+            def partitions():
+                # One municipality in memory at a time, written as soon as it is processed
+                for code in sorted(census_store.municipios()):
+                    df_ideb_iniciais, df_ideb_finais = (
+                        groups.get(code, df.iloc[:0]) if groups is not None else df
+                        for df, groups in zip(ideb_sheets, ideb_groups)
+                    )
+                    final_data = self._combine_with_ideb(census_store.load([code]), df_ideb_iniciais, df_ideb_finais)
+                    yield code, {
+                        None: final_data,
+                        'indicadores': self.metric_store.to_frame(),
+                        'juncao': self.join_report,
+                    }
+            
+            manifest = dataset_store.write_partitions(partitions())
+            return {
+                'municipios': len(manifest),
+                'escolas': sum(info['escolas'] for info in manifest.values()),
+            }
+        
+        except Exception as e:
+            raise Exception(f"Erro no processamento dos dados: {str(e)}")
+    
+    def _group_by_municipio(self, df_ideb):
+        """Split an IDEB sheet by municipality code, or None if it has no municipality column"""
+        
+        column = self.MUNICIPIO_COLUMNS[self.MUNICIPIO_COLUMN]
+        if column not in df_ideb.columns:
+            return None
+        codes = pd.to_numeric(df_ideb[column], errors='coerce')
+        return {int(code): group for code, group in df_ideb.groupby(codes, sort=False)}
+    
+    def load_municipal_dataset(self, dataset_store, municipios):
+        """Load the processed data of the selected municipalities only"""
+        
+        try:
+            codes = sorted(int(code) for code in municipios)
+            if not codes:
+                raise ValueError("Selecione ao menos um município")
+            
+            # Each partition has its own category dictionaries, so the combined frame is compacted again
+            final_data, self.memory_report = self._compact_dtypes(dataset_store.load(codes))
             
-            return self._process_dataframes(df_escolas, df_ideb_iniciais, df_ideb_finais)
+            # Schools belong to one municipality, so the codes only need re-sorting across partitions
+            metrics = dataset_store.load(codes, table='indicadores')
+            self.metric_store = MetricStore.from_frame(
+                metrics if len(codes) == 1 else metrics.sort_values(MetricStore.CODE_COLUMN, kind='stable')
+            )
+            
+            join_report = dataset_store.load(codes, table='juncao')
+            self.join_report = join_report.groupby(['Junção', 'Lado'], sort=False, as_index=False).agg({
+                'Códigos sem par': 'sum',
+                'Exemplos': 'first',
+            })
+            self.key_report = None
+            self.rejected_rows = None
             
+            self.processed_data = final_data
+            return final_data
+        
         except Exception as e:
             raise Exception(f"Erro no processamento dos dados: {str(e)}")
     
-    def _process_dataframes(self, df_escolas, df_ideb_iniciais, df_ideb_finais):
-        """Common processing logic for dataframes"""
+    def process_ideb_history(self, arquivo_ideb_iniciais, arquivo_ideb_finais):
+        """Load every release year of the IDEB files into one long panel (see IdebPanel)"""
         
-        # Validate required columns exist
-        self._validate_columns(df_escolas, df_ideb_iniciais, df_ideb_finais)
+        try:
+            frames = {}
+            sources = self._read_sources([('ideb', arquivo_ideb_iniciais), ('ideb', arquivo_ideb_finais)])
+            for stage, df_ideb in zip(MetricStore.STAGES, sources):
+                df_ideb = self._clean_ideb_column_names(df_ideb)
+                if 'Código da Escola' not in df_ideb.columns:
+                    raise ValueError(f"IDEB {stage}: Coluna 'Código da Escola' não encontrada")
+                frames[stage] = self._unique_codes(df_ideb, f'IDEB {stage}')
+            
+            panel = IdebPanel.from_ideb(frames)
+            if len(panel) == 0:
+                raise ValueError("Nenhum indicador com ano encontrado nos arquivos do IDEB")
+            
+            self.ideb_panel = panel
+            return panel
         
-        # Process school data
-        df_escolas_processed = self._process_school_data(df_escolas)
+        except Exception as e:
+            raise Exception(f"Erro no processamento dos dados: {str(e)}")
+    
+    def _start_progress(self):
+        """Reset the per-stage timings of a new run"""
+        
+        self._progress_events = []
+        self.stage_timings = None
+    
+    def _emit_progress(self, stage, hit, value, seconds, total=None):
+        """Record a finished stage and hand it to the progress callback"""
+        
+        # Rows produced by the stage: frames, (frame, report) pairs or the metric store
+        output = value[0] if isinstance(value, tuple) else value
+        if isinstance(output, MetricStore):
+            rows = len(output.codes)
+        elif isinstance(output, pd.DataFrame):
+            rows = len(output)
+        else:
+            rows = None
+        
+        event = {
+            'etapa': stage,
+            'cache': hit,
+            'linhas': rows,
+            'segundos': seconds,
+            'memoria_mb': current_rss_mb(),
+            'concluidas': len(self._progress_events) + 1,
+            'total': total or len(self.PIPELINE_STAGES),
+        }
+        self._progress_events.append(event)
+        self.stage_timings = pd.DataFrame(self._progress_events)
+        
+        if self.progress is not None:
+            self.progress(event)
+    
+    def _snapshot_frames(self):
+        """Frames that fully describe the processed state, for SnapshotCache"""
+        
+        frames = {'data': self.processed_data}
+        if self.metric_store is not None:
+            frames['metrics'] = self.metric_store.to_frame()
+        if self.memory_report is not None:
+            frames['memory_report'] = self.memory_report
+        if self.join_report is not None:
+            frames['join_report'] = self.join_report
+        if self.key_report is not None:
+            frames['key_report'] = self.key_report
+        if self.rejected_rows is not None:
+            frames['rejected_rows'] = self.rejected_rows
+        return frames
+    
+    def _restore_snapshot(self, frames):
+        """Restore the processed state from frames written by _snapshot_frames"""
+        
+        self.processed_data = frames['data']
+        self.last_run_report = {'snapshot': 'hit'}
+        if 'metrics' in frames:
+            self.metric_store = MetricStore.from_frame(frames['metrics'])
+        self.memory_report = frames.get('memory_report')
+        self.join_report = frames.get('join_report')
+        self.key_report = frames.get('key_report')
+        self.rejected_rows = frames.get('rejected_rows')
+        return self.processed_data
+    
+    def with_metric(self, data, indicator):
+        """Return data with 'IDEB Iniciais'/'IDEB Finais' holding the chosen IDEB indicator"""
+        
+        # No indicator (an empty store) or an unknown one leaves the default columns in place
+        if (self.metric_store is None or indicator == self.DEFAULT_INDICATOR
+                or indicator not in self.metric_store.indicators()):
+            return data
+        
+        # The same frame is handed out on every rerun, so its filter index is reused
+        with self._filter_lock:
+            cached = self._metric_frames.get(indicator)
+            if cached is not None and cached[0] is data:
+                self._metric_frames.move_to_end(indicator)
+                return cached[1]
+        
+        # Served from the metric store, so switching indicators never re-reads the sources
+        codes = data['Código da Escola'].to_numpy()
+        result = data.assign(**{
+            'IDEB Iniciais': self.metric_store.lookup(codes, 'iniciais', indicator),
+            'IDEB Finais': self.metric_store.lookup(codes, 'finais', indicator),
+        })
+        with self._filter_lock:
+            self._metric_frames[indicator] = (data, result)
+            while len(self._metric_frames) > 3:
+                self._metric_frames.popitem(last=False)
+        return result
+    
+    def nbytes(self):
+        """Memory held by the processed data and everything built from it so far"""
+        
+        total = 0
+        if self.processed_data is not None:
+            total += int(self.processed_data.memory_usage(deep=True).sum())
+        if self.metric_store is not None:
+            total += self.metric_store.nbytes()
+        with self._filter_lock:
+            # Indicator views share every column but the two IDEB ones with the data
+            for _, frame in self._metric_frames.values():
+                total += int(frame[['IDEB Iniciais', 'IDEB Finais']].memory_usage(index=False).sum())
+            total += sum(index.nbytes() for index in self._filter_indexes)
+        backend = self._query_backend
+        if backend is not None:
+            total += backend.nbytes()
+        return total
+    
+    def query_backend(self, engine='auto', release=False):
+        """Embedded SQL copy of processed_data and the metric store (see QueryBackend)"""
+        
+        # Shared by every session using this dataset, so it is built once
+        with self._query_backend_lock:
+            backend = self._query_backend
+            stale = (
+                backend is None
+                or (self.processed_data is not None and self._query_backend_source is not self.processed_data)
+                or engine not in ('auto', backend.engine)
+            )
+            if stale:
+                if self.processed_data is None:
+                    raise ValueError("Os dados processados já foram entregues a outro mecanismo de consulta")
+                backend = QueryBackend(
+                    self.processed_data, self.metric_store, engine, default_indicator=self.DEFAULT_INDICATOR
+                )
+                self._query_backend = backend
+                self._query_backend_source = self.processed_data
+            
+            if release and self.processed_data is not None:
+                # With release the SQL copy becomes the only one: the frame, the metric store and
+                # everything built from them are dropped, so the table is resident once
+                self.processed_data = None
+                self.metric_store = None
+                self._query_backend_source = None
+                with self._filter_lock:
+                    self._filter_indexes.clear()
+                    self._metric_frames.clear()
+            return backend
+    
+    def row_count(self):
+        """Schools in the processed data, also once it only lives in the query backend"""
+        
+        if self.processed_data is not None:
+            return len(self.processed_data)
+        return self._query_backend.row_count()
+    
+    def _run_pipeline(self, arquivo_escolas, arquivo_ideb_iniciais, arquivo_ideb_finais):
+        """Run the processing stages, re-running only those downstream of a changed input"""
+        
+        self._start_progress()
+        pipeline = Pipeline(self.stage_cache, listener=self._emit_progress)
+        
+        # Sources are fingerprinted by content; without a cache the keys are never used
+        arquivos = {
+            'escolas': arquivo_escolas,
+            'ideb_iniciais': arquivo_ideb_iniciais,
+            'ideb_finais': arquivo_ideb_finais,
+        }
+        for name, _ in self.SOURCES:
+            digest = self.stage_cache.digest(arquivos[name]) if self.stage_cache is not None else ''
+            pipeline.source(f'arquivo_{name}', arquivos[name], digest)
+        
+        # Reader options change what the read stages produce, so they are part of their key
+        options = self._reader_options()
+        params = (options['streaming'], options['categoricals'], sorted(self.municipios or ()))
+        
+        # Only the files that changed are read. With the pool they are read together by the
+        # first read stage that runs (which then carries the time of the whole batch)
+        pending = [
+            (name, kind) for name, kind in self.SOURCES
+            if not pipeline.is_cached(f'read_{name}', [f'arquivo_{name}'], params)
+        ]
+        frames = {}
+        
+        def read(name, kind, source):
+            if self._uses_pool() and len(pending) > 1 and not frames:
+                frames.update(zip(
+                    [pending_name for pending_name, _ in pending],
+                    self._read_sources([(pending_kind, arquivos[pending_name]) for pending_name, pending_kind in pending])
+                ))
+            return frames.pop(name) if name in frames else self._read_source(kind, source)
+        
+        for name, kind in self.SOURCES:
+            pipeline.stage(
+                f'read_{name}',
+                lambda source, name=name, kind=kind: read(name, kind, source),
+                [f'arquivo_{name}'], params
+            )
+        
+        pipeline.stage('validate_escolas', self._validate_school_columns, ['read_escolas'])
+        pipeline.stage('validate_ideb_iniciais', self._normalize_ideb_columns, ['read_ideb_iniciais'])
+        pipeline.stage('validate_ideb_finais', self._normalize_ideb_columns, ['read_ideb_finais'])
+        
+        # Repeated codes are reported (and with the 'fail' policy rejected) before any merge
+        policy = (self.duplicate_policy,)
+        self.key_report = pipeline.stage(
+            'check_keys',
+            self._key_diagnostics,
+            ['validate_escolas', 'validate_ideb_iniciais', 'validate_ideb_finais'], policy
+        )
+        
+        pipeline.stage('clean_escolas', self._process_school_data, ['validate_escolas'], policy)
+        self.rejected_rows = pipeline.values['clean_escolas'][1]
+        
+        # Keep every IDEB indicator before the sheets are reduced to the approval rate
+        pipeline.stage(
+            'metrics',
+            lambda df_iniciais, df_finais: MetricStore.from_ideb({
+                'iniciais': self._unique_codes(df_iniciais, 'IDEB iniciais'),
+                'finais': self._unique_codes(df_finais, 'IDEB finais'),
+            }),
+            ['validate_ideb_iniciais', 'validate_ideb_finais'], policy
+        )
+        pipeline.stage(
+            'clean_ideb_iniciais',
+            lambda df: self._process_ideb_data(df, 'iniciais'),
+            ['validate_ideb_iniciais'], policy
+        )
+        pipeline.stage(
+            'clean_ideb_finais',
+            lambda df: self._process_ideb_data(df, 'finais'),
+            ['validate_ideb_finais'], policy
+        )
+        
+        pipeline.stage(
+            'merge',
+            lambda escolas, df_iniciais, df_finais: (
+                self._merge_data(escolas[0], df_iniciais, df_finais), self.join_report
+            ),
+            ['clean_escolas', 'clean_ideb_iniciais', 'clean_ideb_finais']
+        )
+        self.join_report = pipeline.values['merge'][1]
+        pipeline.stage('final_cleanup', lambda merged: self._final_cleanup(merged[0]), ['merge'])
+        final_data, self.memory_report = pipeline.stage('compact', self._compact_dtypes, ['final_cleanup'])
+        
+        self.metric_store = pipeline.values['metrics']
+        self.last_run_report = dict(pipeline.report)
+        
+        # Hand out a lazily copied frame so in-place edits never reach the memoized output
+        self.processed_data = final_data.copy(deep=False)
+        return self.processed_data
+    
+    def _combine_with_ideb(self, df_escolas_processed, df_ideb_iniciais, df_ideb_finais):
+        """Process both IDEB sheets and merge them into the cleaned school data"""
+        
+        self.key_report = self._key_diagnostics(df_escolas_processed, df_ideb_iniciais, df_ideb_finais)
+        
+        # Keep every IDEB indicator before the sheets are reduced to the approval rate
+        self.metric_store = MetricStore.from_ideb({
+            'iniciais': self._unique_codes(df_ideb_iniciais, 'IDEB iniciais'),
+            'finais': self._unique_codes(df_ideb_finais, 'IDEB finais'),
+        })
         
         # Process IDEB data
         df_ideb_iniciais_processed = self._process_ideb_data(df_ideb_iniciais, 'iniciais')
@@ -68,22 +727,21 @@ class DataProcessor:
         
         # Final cleaning and validation
         final_data = self._final_cleanup(final_data)
+        final_data, self.memory_report = self._compact_dtypes(final_data)
         
         self.processed_data = final_data
         return final_data
     
-    def _validate_columns(self, df_escolas, df_ideb_iniciais, df_ideb_finais):
-        """Validate that required columns exist in the dataframes"""
+    def _validate_school_columns(self, df_escolas, extra_required=()):
+        """Validate that the school sheet has the required columns and return it unchanged"""
         
-        required_escola_cols = [
-            'NO_ENTIDADE', 'CO_ENTIDADE', 'TP_DEPENDENCIA',
-            'QT_SALAS_UTILIZADAS', 'QT_SALAS_UTILIZA_CLIMATIZADAS'
-        ]
+        required_escola_cols = list(self.SCHOOL_COLUMNS) + list(extra_required)
+        if self.municipios and self.MUNICIPIO_COLUMN not in required_escola_cols:
+            required_escola_cols.append(self.MUNICIPIO_COLUMN)
         
         # Check if NO_BAIRRO exists, if not try alternatives
-        bairro_cols = ['NO_BAIRRO', 'BAIRRO', 'Bairro']
         bairro_col = None
-        for col in bairro_cols:
+        for col in self.BAIRRO_COLUMNS:
             if col in df_escolas.columns:
                 bairro_col = col
                 break
@@ -99,31 +757,49 @@ class DataProcessor:
                 f"Colunas disponíveis: {available_cols}"
             )
         
-        # Validate IDEB files have required columns
-        ideb_required = ['Código da Escola', 'Taxa de Aprovação - 2023']
+        return df_escolas
+    
+    def _clean_ideb_column_names(self, df):
+        """Return an IDEB sheet with stripped column names and the school code column renamed"""
+        
+        # Clean up column names - remove newlines and extra whitespace
+        df = df.set_axis([str(col).strip().replace('\n', ' ') for col in df.columns], axis=1)
         
-        # Try alternative column names for IDEB files
-        for df, name in [(df_ideb_iniciais, 'IDEB Iniciais'), (df_ideb_finais, 'IDEB Finais')]:
-            # Clean up column names - remove newlines and extra whitespace
-            df.columns = [str(col).strip().replace('\n', ' ') for col in df.columns]
-            
-            if 'CO_ENTIDADE' in df.columns and 'Código da Escola' not in df.columns:
-                df.rename(columns={'CO_ENTIDADE': 'Código da Escola'}, inplace=True)
-            
-            # Look for approval rate columns with different names
-            rate_cols = [col for col in df.columns if 'Taxa' in str(col) or 'Aprovação' in str(col)]
-            if rate_cols and 'Taxa de Aprovação - 2023' not in df.columns:
-                df.rename(columns={rate_cols[0]: 'Taxa de Aprovação - 2023'}, inplace=True)
+        if 'CO_ENTIDADE' in df.columns and 'Código da Escola' not in df.columns:
+            df = df.rename(columns={'CO_ENTIDADE': 'Código da Escola'})
+        return df
     
-    def _process_school_data(self, df_escolas):
-        """Process and clean school infrastructure data"""
+    def _normalize_ideb_columns(self, df):
+        """Return an IDEB sheet with normalized column names (the input is left untouched)"""
+        
+        df = self._clean_ideb_column_names(df)
+        
+        # Look for approval rate columns with different names
+        rate_cols = [col for col in df.columns if 'Taxa' in str(col) or 'Aprovação' in str(col)]
+        if rate_cols and 'Taxa de Aprovação - 2023' not in df.columns:
+            df = df.rename(columns={rate_cols[0]: 'Taxa de Aprovação - 2023'})
+        
+        return df
+    
+    def _process_school_data(self, df_escolas, extra_columns=None, unique=True):
+        """Process and clean school infrastructure data, returning it with the rejected rows"""
+        
+        # extra_columns maps additional census columns to keep onto their output names;
+        # unique=False leaves repeated codes to the caller (the chunked census ingest)
+        extra_columns = {
+            col: name for col, name in (extra_columns or {}).items()
+            if col in df_escolas.columns
+        }
         
-        # Filter only public schools (TP_DEPENDENCIA == 3)
-        df_escolas = df_escolas[df_escolas['TP_DEPENDENCIA'] == 3].copy()
+        # Only public schools (TP_DEPENDENCIA == 3) and the selected municipalities are in scope.
+        # The streaming reader already applied these, so this is all True in that mode
+        scope = np.ones(len(df_escolas), dtype=bool)
+        for col, accepted in self._school_filters().items():
+            scope &= df_escolas[col].isin(accepted).to_numpy()
         
         # Determine bairro column name
         bairro_col = None
-        for col in ['NO_BAIRRO', 'BAIRRO', 'Bairro']:
+        for col in self.BAIRRO_COLUMNS:
             if col in df_escolas.columns:
                 bairro_col = col
                 break
@@ -136,8 +812,7 @@ class DataProcessor:
         
         if bairro_col:
             columns_to_select.append(bairro_col)
-        
-        df_escolas = df_escolas[columns_to_select].copy()
+        columns_to_select += list(extra_columns)
         
         # Rename columns
         rename_dict = {
@@ -149,75 +824,130 @@ class DataProcessor:
         
         if bairro_col:
             rename_dict[bairro_col] = 'Bairro'
+        rename_dict.update(extra_columns)
         
-        df_escolas.rename(columns=rename_dict, inplace=True)
+        # With copy-on-write, projecting and renaming share the input's buffers
+        df_escolas = df_escolas[columns_to_select].rename(columns=rename_dict)
         
-        # Clean and validate numerical data
-        df_escolas['Total de Salas'] = pd.to_numeric(df_escolas['Total de Salas'], errors='coerce')
-        df_escolas['Salas com Ar'] = pd.to_numeric(df_escolas['Salas com Ar'], errors='coerce')
+        # Clean numerical data; air conditioned rooms default to 0 when missing
+        df_escolas = df_escolas.assign(**{
+            'Total de Salas': pd.to_numeric(df_escolas['Total de Salas'], errors='coerce'),
+            'Salas com Ar': pd.to_numeric(df_escolas['Salas com Ar'], errors='coerce').fillna(0),
+        })
         
-        # Fill NaN values with 0 for air conditioned rooms
-        df_escolas['Salas com Ar'] = df_escolas['Salas com Ar'].fillna(0)
+        # Every validity rule at once; out-of-scope and rejected rows go in a single take
+        df_escolas, rejected = self.SCHOOL_RULES.evaluate(
+            df_escolas, scope=scope, id_columns=['Código da Escola', 'Nome da Escola']
+        )
+        # Nullable Int64 like SCHOOL_DTYPES, so a blank code among them never turns the others into floats
+        codes = pd.to_numeric(rejected['Código da Escola'], errors='coerce')
+        rejected = rejected.assign(**{'Código da Escola': codes.where(codes % 1 == 0).astype('Int64')})
         
-        # Remove schools with invalid data
-        df_escolas = df_escolas[
-            (df_escolas['Total de Salas'] > 0) & 
-            (df_escolas['Salas com Ar'] >= 0) &
-            (df_escolas['Salas com Ar'] <= df_escolas['Total de Salas'])
-        ]
+        # int64 codes, sorted and unique, so the IDEB joins are a searchsorted alignment
+        if unique:
+            df_escolas = self._unique_codes(df_escolas, 'escolas')
+        else:
+            df_escolas = normalize_codes(df_escolas, 'Código da Escola')
         
         # Clean school and neighborhood names
-        df_escolas['Nome da Escola'] = df_escolas['Nome da Escola'].astype(str).str.strip()
+        cleaned_text = {'Nome da Escola': self._strip_text(df_escolas['Nome da Escola'])}
         if 'Bairro' in df_escolas.columns:
-            df_escolas['Bairro'] = df_escolas['Bairro'].astype(str).str.strip()
-            df_escolas['Bairro'] = df_escolas['Bairro'].replace(['nan', 'None'], np.nan)
+            cleaned_text['Bairro'] = self._strip_text(df_escolas['Bairro'], missing=['nan', 'None'])
         
-        return df_escolas
+        return df_escolas.assign(**cleaned_text), rejected
+    
+    def _strip_text(self, series, missing=()):
+        """Strip text values and turn the given placeholders into NaN"""
+        
+        if not isinstance(series.dtype, pd.CategoricalDtype):
+            series = series.astype(self.TEXT_DTYPE).str.strip()
+            return series.replace(list(missing), np.nan) if missing else series
+        
+        # Categoricals are cleaned on their dictionary: one strip per distinct value
+        categories = series.cat.categories.astype(self.TEXT_DTYPE).str.strip()
+        if categories.has_duplicates:
+            dedup_codes, categories = pd.factorize(categories)
+            codes = series.cat.codes.to_numpy()
+            codes = np.where(codes >= 0, dedup_codes[codes], -1)
+            series = pd.Series(
+                pd.Categorical.from_codes(codes, categories=categories),
+                index=series.index, name=series.name
+            )
+        else:
+            series = series.cat.rename_categories(categories)
+        
+        placeholders = [value for value in missing if value in series.cat.categories]
+        return series.cat.remove_categories(placeholders) if placeholders else series
+    
+    def _key_diagnostics(self, df_escolas, df_ideb_iniciais, df_ideb_finais):
+        """Report repeated school codes in each input, failing early under the 'fail' policy"""
+        
+        report = pd.DataFrame([
+            duplicate_diagnostics(df_escolas, self._school_code_column(df_escolas), 'escolas'),
+            duplicate_diagnostics(df_ideb_iniciais, 'Código da Escola', 'IDEB iniciais'),
+            duplicate_diagnostics(df_ideb_finais, 'Código da Escola', 'IDEB finais'),
+        ])
+        report['Política'] = self.duplicate_policy
+        
+        if self.duplicate_policy == 'fail' and report['Códigos repetidos'].any():
+            repeated = report[report['Códigos repetidos'] > 0]
+            raise ValueError(
+                "Códigos de escola repetidos: " + "; ".join(
+                    f"{row['Tabela']} ({row['Códigos repetidos']}, ex.: {row['Exemplos']})"
+                    for _, row in repeated.iterrows()
+                )
+            )
+        return report
+    
+    def _school_code_column(self, df):
+        """Name of the school code column, before or after renaming"""
+        
+        return 'CO_ENTIDADE' if 'CO_ENTIDADE' in df.columns else 'Código da Escola'
+    
+    def _unique_codes(self, df, table):
+        """Normalize school codes to sorted int64 and resolve repeats with the duplicate policy"""
+        
+        df = normalize_codes(df, 'Código da Escola')
+        return resolve_duplicates(df, 'Código da Escola', self.duplicate_policy, table)
     
     def _process_ideb_data(self, df_ideb, level):
         """Process IDEB performance data"""
         
-        df_ideb = df_ideb.copy()
-        
         # Ensure required columns exist
         if 'Código da Escola' not in df_ideb.columns or 'Taxa de Aprovação - 2023' not in df_ideb.columns:
             raise ValueError(f"IDEB {level}: Colunas obrigatórias não encontradas")
         
-        # Select only necessary columns
-        df_ideb = df_ideb[['Código da Escola', 'Taxa de Aprovação - 2023']].copy()
-        
-        # Clean the approval rate data
-        df_ideb['Taxa de Aprovação - 2023'] = pd.to_numeric(
-            df_ideb['Taxa de Aprovação - 2023'], 
-            errors='coerce'
-        )
+        # Select only necessary columns (a new frame, so the input is left untouched)
+        df_ideb = df_ideb[['Código da Escola', 'Taxa de Aprovação - 2023']]
         
-        # Remove invalid entries
-        df_ideb = df_ideb.dropna(subset=['Código da Escola'])
+        # Clean the approval rate data; the xlsx IDEB reader already delivers it typed
+        if not pd.api.types.is_numeric_dtype(df_ideb['Taxa de Aprovação - 2023']):
+            df_ideb = df_ideb.assign(**{
+                'Taxa de Aprovação - 2023': pd.to_numeric(df_ideb['Taxa de Aprovação - 2023'], errors='coerce')
+            })
         
-        return df_ideb
+        # Remove invalid entries; codes become sorted unique int64 like the school table's
+        return self._unique_codes(df_ideb, f'IDEB {level}')
     
     def _merge_data(self, df_escolas, df_ideb_iniciais, df_ideb_finais):
         """Merge school data with IDEB performance data"""
         
+        # All three tables are keyed by sorted int64 codes, so each join is a searchsorted
+        join = SortedKeyJoin('Código da Escola')
+        
         # Merge with IDEB iniciais
-        merged_data = pd.merge(
-            df_escolas,
-            df_ideb_iniciais,
-            on='Código da Escola',
-            how='left'
+        merged_data = join.left_join(
+            df_escolas, df_ideb_iniciais, 'iniciais',
+            columns={'Taxa de Aprovação - 2023': 'IDEB Iniciais'}
         )
-        merged_data.rename(columns={'Taxa de Aprovação - 2023': 'IDEB Iniciais'}, inplace=True)
         
         # Merge with IDEB finais
-        merged_data = pd.merge(
-            merged_data,
-            df_ideb_finais,
-            on='Código da Escola',
-            how='left'
+        merged_data = join.left_join(
+            merged_data, df_ideb_finais, 'finais',
+            columns={'Taxa de Aprovação - 2023': 'IDEB Finais'}
         )
-        merged_data.rename(columns={'Taxa de Aprovação - 2023': 'IDEB Finais'}, inplace=True)
         
+        self.join_report = join.report()
         return merged_data
     
     def _final_cleanup(self, df):
@@ -239,42 +969,89 @@ class DataProcessor:
         
         return df
     
+    def _compact_dtypes(self, df):
+        """Downcast the final frame to compact dtypes and report the memory of each column"""
+        
+        dtypes_before = df.dtypes.astype(str)
+        bytes_before = df.memory_usage(deep=True, index=False)
+        
+        compacted = {}
+        for col in self.COUNT_COLUMNS:
+            if col in df.columns:
+                # Whole non-negative counts become uint8/uint16/...; anything else stays float
+                values = pd.to_numeric(df[col], downcast='unsigned')
+                compacted[col] = values.astype('float32') if values.dtype.kind == 'f' else values
+        for col in self.RATE_COLUMNS:
+            if col in df.columns:
+                compacted[col] = df[col].astype('float32')
+        for col in self.CATEGORY_COLUMNS:
+            if col in df.columns:
+                # The dictionary itself is an Arrow string array too
+                values = df[col].astype('category')
+                compacted[col] = values.cat.set_categories(
+                    values.cat.categories.astype(self.TEXT_DTYPE)
+                )
+        for col in self.TEXT_COLUMNS:
+            if col in df.columns:
+                compacted[col] = df[col].astype(self.TEXT_DTYPE)
+        df = df.assign(**compacted)
+        
+        bytes_after = df.memory_usage(deep=True, index=False)
+        report = pd.DataFrame({
+            'Coluna': df.columns,
+            'Tipo antes': dtypes_before.to_numpy(),
+            'Tipo depois': df.dtypes.astype(str).to_numpy(),
+            'Bytes antes': bytes_before.to_numpy(),
+            'Bytes depois': bytes_after.to_numpy(),
+        })
+        report['Redução (%)'] = (
+            (1 - report['Bytes depois'] / report['Bytes antes']) * 100
+        ).fillna(0).round(1)
+        
+        return df, report
+    
     def apply_filters(self, data, filters):
         """Apply user-selected filters to the data"""
         
-        filtered_data = data.copy()
+        conditions = []
+        
+        # Municipality filter (only offered for multi-municipality datasets)
+        if filters.get('municipio') and filters['municipio'] != 'Todos':
+            conditions.append(('Nome do Município', ('eq', filters['municipio']), False))
         
         # Neighborhood filter
         if filters.get('bairro') and filters['bairro'] != 'Todos':
-            filtered_data = filtered_data[filtered_data['Bairro'] == filters['bairro']]
+            conditions.append(('Bairro', ('eq', filters['bairro']), False))
         
         # Air conditioning percentage filter
         if filters.get('ac_range'):
-            min_ac, max_ac = filters['ac_range']
-            mask = (filtered_data['Percentual_AC'] >= min_ac) & (filtered_data['Percentual_AC'] <= max_ac)
-            filtered_data = filtered_data[mask]
+            conditions.append(('Percentual_AC', ('range', *filters['ac_range']), False))
         
         # School size filter
         if filters.get('salas_range'):
-            min_salas, max_salas = filters['salas_range']
-            mask = (filtered_data['Total de Salas'] >= min_salas) & (filtered_data['Total de Salas'] <= max_salas)
-            filtered_data = filtered_data[mask]
+            conditions.append(('Total de Salas', ('range', *filters['salas_range']), False))
         
-        # IDEB filters
+        # IDEB filters; schools without IDEB are kept
         if filters.get('ideb_iniciais_range'):
-            min_ideb, max_ideb = filters['ideb_iniciais_range']
-            mask = (
-                (filtered_data['IDEB Iniciais'] >= min_ideb) & 
-                (filtered_data['IDEB Iniciais'] <= max_ideb)
-            ) | filtered_data['IDEB Iniciais'].isna()
-            filtered_data = filtered_data[mask]
+            conditions.append(('IDEB Iniciais', ('range', *filters['ideb_iniciais_range']), True))
         
         if filters.get('ideb_finais_range'):
-            min_ideb, max_ideb = filters['ideb_finais_range']
-            mask = (
-                (filtered_data['IDEB Finais'] >= min_ideb) & 
-                (filtered_data['IDEB Finais'] <= max_ideb)
-            ) | filtered_data['IDEB Finais'].isna()
-            filtered_data = filtered_data[mask]
-        
-        return filtered_data
\ No newline at end of file
+            conditions.append(('IDEB Finais', ('range', *filters['ideb_finais_range']), True))
+        
+        # Each condition is two searchsorted calls on an argsort index of its column; only the
+        # rows of the smallest match are ever touched, then taken once
+        positions = self._filter_index(data).select(conditions)
+        if positions is None:
+            return working_copy(data)
+        return data.take(positions)
+    
+    def _filter_index(self, data):
+        """FilterIndex of data, kept per frame so its argsorts run once per dataset and indicator"""
+        
+        with self._filter_lock:
+            for index in self._filter_indexes:
+                if index.data is data:
+                    return index
+            index = FilterIndex(data)
+            self._filter_indexes.append(index)
+            return index
\ No newline at end of file
@@ -0,0 +1,169 @@
+import os
+import threading
+from collections import OrderedDict
+from concurrent.futures import Future
+import pandas as pd
+import streamlit as st
+
+def freeze_frame(df):
+    """Return df backed by read-only arrays, sharing memory with the original"""
+    
+    columns = {}
+    for col in df.columns:
+        series = df[col]
+        if isinstance(series.dtype, pd.CategoricalDtype):
+            # Only the codes are per row; the categories are an immutable Index already
+            codes = series.cat.codes.to_numpy()
+            codes.flags.writeable = False
+            columns[col] = pd.Categorical.from_codes(codes, dtype=series.dtype, validate=False)
+        elif isinstance(series.array, pd.arrays.NumpyExtensionArray):
+            # A view of the column's block; with copy-on-write it is handed out read-only
+            values = series.to_numpy()
+            values.flags.writeable = False
+            columns[col] = values
+        else:
+            # Arrow-backed columns (e.g. str) are immutable by construction
+            columns[col] = series.array
+    
+    return pd.DataFrame(columns, index=df.index, copy=False)
+
+class DatasetRegistry:
+    """Process-wide registry of processed datasets, shared read-only by every session"""
+    
+    def __init__(self, max_datasets=8):
+        self.max_datasets = max_datasets
+        # handle -> DataProcessor, least recently used first
+        self._datasets = OrderedDict()
+        # handle -> Future of a build in progress, so concurrent requests share one build
+        self._pending = {}
+        # alias -> handle, a stable name for the current version of a dataset
+        self._aliases = {}
+        self._lock = threading.Lock()
+    
+    def publish(self, handle, processor):
+        """Register a processed dataset under handle, keeping the copy published first"""
+        
+        with self._lock:
+            if handle in self._datasets:
+                self._datasets.move_to_end(handle)
+                return handle
+        
+        # A processor already handed to the query backend has no frame left to freeze
+        if processor.processed_data is not None:
+            processor.processed_data = freeze_frame(processor.processed_data)
+        if processor.metric_store is not None:
+            processor.metric_store.codes.flags.writeable = False
+            processor.metric_store.values.flags.writeable = False
+        
+        with self._lock:
+            # Another session may have published the same data meanwhile; the first copy wins
+            self._datasets.setdefault(handle, processor)
+            self._datasets.move_to_end(handle)
+            while len(self._datasets) > self.max_datasets:
+                self._datasets.popitem(last=False)
+        return handle
+    
+    def get(self, handle):
+        """Return the DataProcessor published under handle (or alias), or None if it was evicted"""
+        
+        with self._lock:
+            handle = self._aliases.get(handle, handle)
+            processor = self._datasets.get(handle)
+            if processor is not None:
+                self._datasets.move_to_end(handle)
+            return processor
+    
+    def resolve(self, handle):
+        """Return the handle an alias currently points to (a plain handle resolves to itself)"""
+        
+        with self._lock:
+            return self._aliases.get(handle, handle)
+    
+    def point(self, alias, handle):
+        """Atomically make alias resolve to the published handle, dropping the version it replaces"""
+        
+        with self._lock:
+            if handle not in self._datasets:
+                raise KeyError(f"Conjunto de dados não publicado: {handle}")
+            previous = self._aliases.get(alias)
+            self._aliases[alias] = handle
+            # Sessions reach the old version only through the alias, so nothing else needs it;
+            # a rerun already holding the old processor keeps its reference until it finishes
+            if previous not in (None, handle) and previous not in self._aliases.values():
+                self._datasets.pop(previous, None)
+        return previous
+    
+    def get_or_build(self, handle, build):
+        """Return the dataset under handle, running build() at most once across sessions"""
+        
+        processor, future, owner = self._claim(handle)
+        if processor is not None:
+            return processor
+        if not owner:
+            # Someone else (e.g. the warm-up thread) is already building it: wait for them
+            return future.result()
+        return self._build(handle, future, build)
+    
+    def warm_up(self, handle, build):
+        """Start building a dataset in a background thread; get_or_build waits for it"""
+        
+        processor, future, owner = self._claim(handle)
+        if not owner:
+            return None
+        
+        def run():
+            try:
+                self._build(handle, future, build)
+            except Exception:
+                # Waiters get the error through the future; a later request simply retries
+                pass
+        
+        thread = threading.Thread(target=run, name='dataset-warm-up', daemon=True)
+        thread.start()
+        return thread
+    
+    def _claim(self, handle):
+        """Return (dataset, None, False) if published, else (None, future, whether we must build it)"""
+        
+        with self._lock:
+            processor = self._datasets.get(handle)
+            if processor is not None:
+                self._datasets.move_to_end(handle)
+                return processor, None, False
+            future = self._pending.get(handle)
+            if future is not None:
+                return None, future, False
+            # Registered before any work starts, so a request arriving right after waits
+            future = self._pending[handle] = Future()
+            return None, future, True
+    
+    def _build(self, handle, future, build):
+        """Run build(), publish its result and hand it to everyone waiting on future"""
+        
+        try:
+            self.publish(handle, build())
+            with self._lock:
+                processor = self._datasets[handle]
+            future.set_result(processor)
+            return processor
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        finally:
+            with self._lock:
+                self._pending.pop(handle, None)
+    
+    def stats(self):
+        """Return the number of datasets and the memory they hold"""
+        
+        with self._lock:
+            datasets = list(self._datasets.values())
+        return {
+            'datasets': len(datasets),
+            'bytes': sum(p.nbytes() for p in datasets),
+        }
+
+@st.cache_resource
+def get_dataset_registry():
+    """The registry shared by every session of this server, bounded by DATASET_REGISTRY_MAX"""
+    return DatasetRegistry(max_datasets=int(os.environ.get('DATASET_REGISTRY_MAX', 8)))
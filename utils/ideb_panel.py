@@ -0,0 +1,179 @@
+import re
+import numpy as np
+import pandas as pd
+
+# A release year inside a column name, e.g. 'Nota SAEB - 2019 - Matemática' or 'VL_IDEB_2005'
+YEAR_PATTERN = re.compile(r'(?<!\d)((?:19|20)\d{2})(?!\d)')
+
+def split_year_column(column):
+    """Return (year, indicator name without the year) for a year-suffixed column, or None"""
+    
+    match = YEAR_PATTERN.search(str(column))
+    if match is None:
+        return None
+    
+    prefix = column[:match.start()].rstrip(' -_')
+    suffix = column[match.end():].lstrip(' -_')
+    if not prefix:
+        return None
+    if not suffix:
+        return int(match.group(1)), prefix
+    # 'IDEB 2023 (N x P)' -> 'IDEB (N x P)'; 'Taxa de Aprovação - 2023 - 1º' -> 'Taxa de Aprovação - 1º'
+    separator = ' ' if suffix.startswith('(') else ' - '
+    return int(match.group(1)), f'{prefix}{separator}{suffix}'
+
+class IdebPanel:
+    """Long table of every IDEB indicator per school, stage and year, in a sorted columnar layout"""
+    
+    CODE_COLUMN = 'Código da Escola'
+    # Identifier columns that may carry a year-like number but are not indicators
+    ID_COLUMNS = {'Código da Escola', 'Código do Município', 'Nome do Município', 'Nome da Escola'}
+    
+    def __init__(self, codes, stages, years, indicators, values, stage_names, indicator_names):
+        # One entry per (school, stage, indicator, year) with a value, sorted in that order,
+        # so the history of one school is a contiguous slice of every array
+        self.codes = codes
+        self.stages = stages
+        self.years = years
+        self.indicators = indicators
+        self.values = values
+        # Names behind the small integer codes of stages and indicators
+        self.stage_names = stage_names
+        self.indicator_names = indicator_names
+        
+        # Stable permutation ordering the entries by year, so one year is a slice of it
+        self.year_order = np.argsort(years, kind='stable').astype(np.int32 if len(years) < 2**31 else np.int64)
+        self.year_values, self.year_starts = np.unique(years[self.year_order], return_index=True)
+    
+    @classmethod
+    def from_ideb(cls, frames):
+        """Melt IDEB frames, as {stage: DataFrame} with unique int64 codes, into a panel"""
+        
+        stage_names = list(frames)
+        indicator_names = []
+        parts = []
+        for stage_id, df in enumerate(frames.values()):
+            columns = {}
+            for col in df.columns:
+                parsed = None if col in cls.ID_COLUMNS else split_year_column(col)
+                if parsed is not None:
+                    columns[col] = parsed
+            if not columns:
+                continue
+            
+            for _, name in columns.values():
+                if name not in indicator_names:
+                    indicator_names.append(name)
+            column_years = np.array([year for year, _ in columns.values()], dtype=np.int16)
+            column_indicators = np.array(
+                [indicator_names.index(name) for _, name in columns.values()], dtype=np.int16
+            )
+            
+            # One (schools x columns) block; raveled row-major it is already the long table
+            matrix = np.column_stack([
+                pd.to_numeric(df[col], errors='coerce').to_numpy(dtype=np.float32, na_value=np.nan)
+                for col in columns
+            ])
+            present = ~np.isnan(matrix.ravel())
+            n_schools, n_columns = matrix.shape
+            parts.append((
+                np.repeat(df[cls.CODE_COLUMN].to_numpy(dtype=np.int64), n_columns)[present],
+                np.full(int(present.sum()), stage_id, dtype=np.int8),
+                np.tile(column_years, n_schools)[present],
+                np.tile(column_indicators, n_schools)[present],
+                matrix.ravel()[present],
+            ))
+        
+        if parts:
+            codes, stages, years, indicators, values = (np.concatenate(arrays) for arrays in zip(*parts))
+        else:
+            codes, stages, years, indicators, values = (
+                np.empty(0, dtype) for dtype in (np.int64, np.int8, np.int16, np.int16, np.float32)
+            )
+        
+        order = np.lexsort((years, indicators, stages, codes))
+        return cls(
+            codes[order], stages[order], years[order], indicators[order], values[order],
+            stage_names, indicator_names
+        )
+    
+    def __len__(self):
+        return len(self.values)
+    
+    def available_years(self):
+        """Release years present in the panel, ascending"""
+        
+        return [int(year) for year in self.year_values]
+    
+    def _frame(self, positions):
+        """Build the long table for positions (a slice or an index array) of the panel"""
+        
+        return pd.DataFrame({
+            'Código da Escola': self.codes[positions],
+            'Etapa': pd.Categorical.from_codes(self.stages[positions], self.stage_names, validate=False),
+            'Ano': self.years[positions],
+            'Indicador': pd.Categorical.from_codes(
+                self.indicators[positions], self.indicator_names, validate=False
+            ),
+            'Valor': self.values[positions],
+        })
+    
+    def school(self, code):
+        """History of one school: every stage, indicator and year"""
+        
+        start, stop = np.searchsorted(self.codes, [code, code + 1])
+        return self._frame(slice(start, stop))
+    
+    def year(self, year):
+        """Every school and indicator of one release year"""
+        
+        i = np.searchsorted(self.year_values, year)
+        if i == len(self.year_values) or self.year_values[i] != year:
+            return self._frame(slice(0, 0))
+        stop = self.year_starts[i + 1] if i + 1 < len(self.year_starts) else len(self.year_order)
+        return self._frame(self.year_order[self.year_starts[i]:stop])
+    
+    def series(self, code, stage, indicator):
+        """Time series of one indicator of one school, as a Series indexed by year"""
+        
+        start, stop = np.searchsorted(self.codes, [code, code + 1])
+        if stage not in self.stage_names or indicator not in self.indicator_names:
+            return pd.Series([], index=pd.Index([], dtype=np.int16, name='Ano'), dtype=np.float32, name=indicator)
+        
+        # Inside a school's slice entries are ordered by stage, then indicator, then year
+        keys = self.stages[start:stop].astype(np.int32) * len(self.indicator_names) + self.indicators[start:stop]
+        key = self.stage_names.index(stage) * len(self.indicator_names) + self.indicator_names.index(indicator)
+        lo, hi = start + np.searchsorted(keys, [key, key + 1])
+        return pd.Series(
+            self.values[lo:hi], index=pd.Index(self.years[lo:hi], name='Ano'), name=indicator
+        )
+    
+    def to_frame(self):
+        """The whole panel as a long DataFrame (e.g. to store it as Parquet)"""
+        
+        return self._frame(slice(None))
+    
+    @classmethod
+    def from_frame(cls, df):
+        """Rebuild a panel saved with to_frame"""
+        
+        stages = pd.Categorical(df['Etapa'])
+        indicators = pd.Categorical(df['Indicador'])
+        codes = df['Código da Escola'].to_numpy(dtype=np.int64)
+        years = df['Ano'].to_numpy(dtype=np.int16)
+        stage_codes = stages.codes.astype(np.int8)
+        indicator_codes = indicators.codes.astype(np.int16)
+        values = df['Valor'].to_numpy(dtype=np.float32)
+        
+        order = np.lexsort((years, indicator_codes, stage_codes, codes))
+        return cls(
+            codes[order], stage_codes[order], years[order], indicator_codes[order], values[order],
+            list(stages.categories), list(indicators.categories)
+        )
+    
+    def nbytes(self):
+        """Memory held by the panel arrays"""
+        
+        return sum(array.nbytes for array in (
+            self.codes, self.stages, self.years, self.indicators, self.values, self.year_order
+        ))
@@ -0,0 +1,622 @@
+import codecs
+import os
+import posixpath
+import zipfile
+from operator import itemgetter
+from xml.etree.ElementTree import iterparse
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.feather as feather
+import pyarrow.parquet as pq
+from openpyxl import load_workbook
+
+class WorkbookReader:
+    """Class for reading only the needed parts of large input workbooks"""
+    
+    def __init__(self):
+        pass
+    
+    def read_columns(self, source, columns, filters=None):
+        """Stream the first sheet of a workbook keeping only the requested columns and rows"""
+        
+        chunks = list(self.iter_columns(source, columns, filters=filters))
+        if len(chunks) == 1:
+            return chunks[0]
+        return pd.concat(chunks, ignore_index=True)
+    
+    def iter_columns(self, source, columns, filters=None, chunk_rows=None):
+        """Yield DataFrames of at most chunk_rows rows with the requested columns and rows"""
+        
+        # filters maps a column name to the set of accepted values; rows failing any of them
+        # are dropped as they stream in. Requested columns missing from the header are
+        # skipped; callers validate afterwards
+        if hasattr(source, 'seek'):
+            source.seek(0)
+        
+        # The read-only iterator yields one row at a time, so the whole sheet never sits in memory
+        workbook = load_workbook(source, read_only=True, data_only=True)
+        try:
+            rows = workbook.active.iter_rows(values_only=True)
+            header = next(rows, None)
+            if header is None:
+                yield pd.DataFrame(columns=list(columns))
+                return
+            
+            header = [str(col).strip() if col is not None else None for col in header]
+            positions = {col: i for i, col in enumerate(header) if col is not None}
+            selected = [col for col in columns if col in positions]
+            indices = [positions[col] for col in selected]
+            if not indices:
+                yield pd.DataFrame(columns=selected)
+                return
+            
+            checks = [
+                (positions[col], accepted)
+                for col, accepted in (filters or {}).items()
+                if col in positions
+            ]
+            
+            width = max(indices + [i for i, _ in checks]) + 1
+            pick = itemgetter(*indices)
+            padding = (None,) * width
+            
+            values = []
+            for row in rows:
+                # Read-only rows can be shorter than the header when trailing cells are empty
+                if len(row) < width:
+                    row = row + padding[:width - len(row)]
+                if checks and not all(row[i] in accepted for i, accepted in checks):
+                    continue
+                picked = pick(row)
+                if len(indices) == 1:
+                    picked = (picked,)
+                # Skip blank rows, e.g. the empty trailing rows some exporters leave behind
+                if all(value is None for value in picked):
+                    continue
+                values.append(picked)
+                
+                if chunk_rows and len(values) >= chunk_rows:
+                    yield pd.DataFrame.from_records(values, columns=selected)
+                    values = []
+            
+            if values or not chunk_rows:
+                yield pd.DataFrame.from_records(values, columns=selected)
+        finally:
+            workbook.close()
+    
+    SPREADSHEET_NS = '{http://schemas.openxmlformats.org/spreadsheetml/2006/main}'
+    RELATIONSHIP_NS = '{http://schemas.openxmlformats.org/officeDocument/2006/relationships}'
+    
+    def read_columns_categorical(self, source, columns, filters=None, categorical_ratio=0.5):
+        """Read an xlsx sheet straight from its XML, decoding shared strings as categoricals"""
+        
+        # Text columns keep the shared-string indices as codes over a deduplicated dictionary,
+        # so each distinct text is decoded and stripped once. Columns with many distinct values
+        # (e.g. school names) are expanded back to plain strings after cleaning the dictionary
+        if hasattr(source, 'seek'):
+            source.seek(0)
+        
+        with zipfile.ZipFile(source) as archive:
+            shared_strings = self._read_shared_strings(archive)
+            cells = self._read_sheet_cells(archive, shared_strings, columns, filters)
+        
+        if cells is None:
+            return pd.DataFrame(columns=list(columns))
+        
+        selected, kinds, values, n_rows = cells
+        data = {}
+        for col in selected:
+            data[col] = self._build_column(
+                kinds[col], values[col], shared_strings, n_rows, categorical_ratio
+            )
+        return pd.DataFrame(data, columns=selected)
+    
+    def _read_shared_strings(self, archive):
+        """Return the workbook's shared-string table as a list"""
+        
+        if 'xl/sharedStrings.xml' not in archive.namelist():
+            return []
+        
+        ns = self.SPREADSHEET_NS
+        strings = []
+        with archive.open('xl/sharedStrings.xml') as f:
+            for _, elem in iterparse(f):
+                if elem.tag == f'{ns}si':
+                    # Rich-text entries split their text across several <t> runs
+                    strings.append(''.join(t.text or '' for t in elem.iter(f'{ns}t')))
+                    elem.clear()
+        return strings
+    
+    def _first_sheet_path(self, archive):
+        """Resolve the XML part of the workbook's first sheet"""
+        
+        ns = self.SPREADSHEET_NS
+        with archive.open('xl/workbook.xml') as f:
+            sheet = next(elem for _, elem in iterparse(f) if elem.tag == f'{ns}sheet')
+        rel_id = sheet.get(f'{self.RELATIONSHIP_NS}id')
+        
+        with archive.open('xl/_rels/workbook.xml.rels') as f:
+            for _, elem in iterparse(f):
+                if elem.get('Id') == rel_id:
+                    target = elem.get('Target')
+                    if target.startswith('/'):
+                        return target.lstrip('/')
+                    return posixpath.normpath(posixpath.join('xl', target))
+        return 'xl/worksheets/sheet1.xml'
+    
+    def _column_index(self, ref):
+        """Convert a cell reference such as 'AB12' to a zero-based column index"""
+        
+        index = 0
+        for char in ref:
+            if char.isdigit():
+                break
+            index = index * 26 + (ord(char) - 64)
+        return index - 1
+    
+    def _cell_value(self, cell_type, raw, shared_strings):
+        """Decode a single raw cell value"""
+        
+        if raw is None:
+            return None
+        if cell_type == 's':
+            return shared_strings[int(raw)]
+        if cell_type in ('str', 'inlineStr'):
+            return raw
+        if cell_type == 'b':
+            return raw == '1'
+        if cell_type == 'e':
+            return None
+        number = float(raw)
+        return int(number) if number.is_integer() else number
+    
+    def _iter_sheet_rows(self, archive, keep=None, merges=None):
+        """Yield (row number, {column index: (cell type, raw value)}) for the first sheet"""
+        
+        # keep(index) decides which cells are decoded; everything else is skipped untouched.
+        # Merged ranges (listed after the rows in the XML) are appended to merges if given
+        ns = self.SPREADSHEET_NS
+        row_tag, cell_tag, value_tag = f'{ns}row', f'{ns}c', f'{ns}v'
+        inline_tag, text_tag, merge_tag = f'{ns}is', f'{ns}t', f'{ns}mergeCell'
+        
+        with archive.open(self._first_sheet_path(archive)) as f:
+            row_number = 0
+            for _, elem in iterparse(f):
+                if elem.tag == merge_tag:
+                    if merges is not None:
+                        merges.append(elem.get('ref'))
+                    continue
+                if elem.tag != row_tag:
+                    continue
+                
+                row_number = int(elem.get('r', row_number + 1))
+                row = {}
+                for position, cell in enumerate(elem.iter(cell_tag)):
+                    ref = cell.get('r')
+                    index = self._column_index(ref) if ref else position
+                    if keep is not None and not keep(index):
+                        continue
+                    cell_type = cell.get('t', 'n')
+                    if cell_type == 'inlineStr':
+                        inline = cell.find(inline_tag)
+                        raw = ''.join(t.text or '' for t in inline.iter(text_tag)) if inline is not None else None
+                    else:
+                        value_elem = cell.find(value_tag)
+                        raw = value_elem.text if value_elem is not None else None
+                    row[index] = (cell_type, raw)
+                elem.clear()
+                yield row_number, row
+    
+    def _read_sheet_cells(self, archive, shared_strings, columns, filters):
+        """Collect the raw cells of the requested columns for the rows passing filters"""
+        
+        header = None
+        wanted = {}
+        checks = []
+        checks_index = set()
+        kinds = {}
+        values = {}
+        n_rows = 0
+        
+        # Only cells of wanted columns are looked at once the header is known
+        keep = lambda index: header is None or index in wanted or index in checks_index
+        
+        for _, row in self._iter_sheet_rows(archive, keep=keep):
+            if header is None:
+                header = {
+                    str(self._cell_value(t, raw, shared_strings)).strip(): index
+                    for index, (t, raw) in row.items() if raw is not None
+                }
+                selected = [col for col in columns if col in header]
+                if not selected:
+                    return None
+                wanted = {header[col]: col for col in selected}
+                checks = [
+                    (header[col], accepted)
+                    for col, accepted in (filters or {}).items()
+                    if col in header
+                ]
+                checks_index = {index for index, _ in checks}
+                for col in selected:
+                    kinds[col] = set()
+                    values[col] = []
+                continue
+            
+            if checks and not all(
+                self._cell_value(*row.get(index, ('n', None)), shared_strings) in accepted
+                for index, accepted in checks
+            ):
+                continue
+            if not any(row.get(index, (None, None))[1] is not None for index in wanted):
+                continue
+            
+            for index, col in wanted.items():
+                cell_type, raw = row.get(index, ('n', None))
+                if raw is not None:
+                    kinds[col].add(cell_type)
+                values[col].append((cell_type, raw))
+            n_rows += 1
+        
+        if header is None:
+            return None
+        return selected, kinds, values, n_rows
+    
+    def _build_column(self, kinds, cells, shared_strings, n_rows, categorical_ratio):
+        """Turn the raw cells of one column into a typed array"""
+        
+        if kinds == {'s'}:
+            # Pure shared-string column: the indices become categorical codes
+            indices = np.fromiter(
+                (int(raw) if raw is not None else -1 for _, raw in cells),
+                dtype=np.int64, count=n_rows
+            )
+            present = indices >= 0
+            uniques, inverse = np.unique(indices[present], return_inverse=True)
+            
+            # Clean the dictionary, not the rows: strip once per distinct string and merge
+            # entries that only differed by surrounding whitespace
+            dictionary = pd.Index([shared_strings[i].strip() for i in uniques])
+            dedup_codes, categories = pd.factorize(dictionary)
+            
+            codes = np.full(n_rows, -1, dtype=np.int64)
+            codes[present] = dedup_codes[inverse]
+            column = pd.Categorical.from_codes(codes, categories=categories)
+            
+            if len(categories) > categorical_ratio * max(present.sum(), 1):
+                return np.asarray(column, dtype=object)
+            return column
+        
+        if kinds <= {'n'}:
+            numbers = np.fromiter(
+                (float(raw) if raw is not None else np.nan for _, raw in cells),
+                dtype=np.float64, count=n_rows
+            )
+            # Match pandas.read_excel: whole numbers without gaps become integers
+            if not np.isnan(numbers).any() and np.array_equal(numbers, np.floor(numbers)):
+                return numbers.astype(np.int64)
+            return numbers
+        
+        return np.array(
+            [self._cell_value(cell_type, raw, shared_strings) for cell_type, raw in cells],
+            dtype=object
+        )
+    
+    # Placeholders INEP uses for suppressed or unavailable indicators
+    MISSING_MARKERS = {'', '-', '--', '---', 'ND', 'N/D', 'NA', 'N/A', '*', '**'}
+    
+    def read_ideb_sheet(self, source):
+        """Read an IDEB workbook in one pass, resolving its multi-row header band"""
+        
+        # Header rows (text only) are buffered until the first data row; data cells are
+        # decoded straight into per-column lists with ND/- already turned into missing values
+        if hasattr(source, 'seek'):
+            source.seek(0)
+        
+        with zipfile.ZipFile(source) as archive:
+            shared_strings = self._read_shared_strings(archive)
+            merges = []
+            header_rows = []
+            columns = {}
+            n_rows = 0
+            
+            for row_number, row in self._iter_sheet_rows(archive, merges=merges):
+                decoded = {
+                    index: self._ideb_value(cell_type, raw, shared_strings)
+                    for index, (cell_type, raw) in row.items()
+                }
+                if n_rows == 0 and self._is_header_row(decoded):
+                    header_rows.append((row_number, decoded))
+                    continue
+                if all(value is None for value in decoded.values()):
+                    continue
+                
+                # Formatted but empty cells do not open a column on their own
+                for index in decoded.keys() - columns.keys():
+                    if decoded[index] is not None:
+                        columns[index] = [None] * n_rows
+                for index, values in columns.items():
+                    values.append(decoded.get(index))
+                n_rows += 1
+        
+        names = self._resolve_header(header_rows, merges, sorted(columns))
+        data = {names[index]: self._typed_column(columns[index]) for index in sorted(columns)}
+        return pd.DataFrame(data)
+    
+    def _ideb_value(self, cell_type, raw, shared_strings):
+        """Decode an IDEB cell, mapping placeholders to None and numeric text to numbers"""
+        
+        value = self._cell_value(cell_type, raw, shared_strings)
+        if not isinstance(value, str):
+            return value
+        
+        text = value.strip()
+        if text.upper() in self.MISSING_MARKERS:
+            return None
+        try:
+            return float(text.replace(',', '.'))
+        except ValueError:
+            return text
+    
+    def _is_header_row(self, decoded):
+        """Header rows hold labels only (years such as 2023 are allowed)"""
+        
+        numbers = [v for v in decoded.values() if isinstance(v, (int, float)) and not isinstance(v, bool)]
+        return all(float(v).is_integer() and 1900 <= v <= 2100 for v in numbers) and any(
+            isinstance(v, str) for v in decoded.values()
+        )
+    
+    def _parse_range(self, ref):
+        """Convert 'G1:M2' to ((first row, first col), (last row, last col)), zero-based columns"""
+        
+        bounds = []
+        for part in ref.split(':'):
+            letters = part.rstrip('0123456789')
+            bounds.append((int(part[len(letters):]), self._column_index(letters)))
+        return bounds[0], bounds[-1]
+    
+    def _resolve_header(self, header_rows, merges, indices):
+        """Build one composite name per column from the header band and its merged cells"""
+        
+        grid = {row_number: dict(values) for row_number, values in header_rows}
+        
+        # A merged banner (e.g. 'Nota SAEB - 2023' over three columns) labels every cell it covers
+        for ref in merges:
+            (first_row, first_col), (last_row, last_col) = self._parse_range(ref)
+            if first_row not in grid:
+                continue
+            label = grid[first_row].get(first_col)
+            for row_number in range(first_row, last_row + 1):
+                if row_number not in grid:
+                    continue
+                for col in range(first_col, last_col + 1):
+                    grid[row_number][col] = label
+        
+        names = {}
+        seen = set()
+        for index in indices:
+            parts = []
+            for row_number in sorted(grid):
+                value = grid[row_number].get(index)
+                if value is None:
+                    continue
+                text = ' '.join(str(value).split())
+                if isinstance(value, float) and value.is_integer():
+                    text = str(int(value))
+                if text and (not parts or parts[-1] != text):
+                    parts.append(text)
+            
+            name = ' - '.join(parts) or f'Coluna {index + 1}'
+            unique_name, suffix = name, 2
+            while unique_name in seen:
+                unique_name, suffix = f'{name} ({suffix})', suffix + 1
+            seen.add(unique_name)
+            names[index] = unique_name
+        return names
+    
+    def _typed_column(self, values):
+        """Return a numeric array when every present value is a number, else an object array"""
+        
+        if all(v is None or (isinstance(v, (int, float)) and not isinstance(v, bool)) for v in values):
+            numbers = np.array([np.nan if v is None else v for v in values], dtype=np.float64)
+            if len(numbers) and not np.isnan(numbers).any() and np.array_equal(numbers, np.floor(numbers)):
+                return numbers.astype(np.int64)
+            return numbers
+        return np.array(values, dtype=object)
+
+class TableReader:
+    """Class for reading CSV, Parquet and Feather inputs into the processing pipeline"""
+    
+    EXTENSIONS = {
+        '.xlsx': 'xlsx', '.xlsm': 'xlsx', '.xls': 'xls',
+        '.csv': 'csv', '.txt': 'csv',
+        '.parquet': 'parquet', '.pq': 'parquet',
+        '.feather': 'feather', '.arrow': 'feather',
+    }
+    MAGIC_NUMBERS = [
+        (b'PAR1', 'parquet'),
+        (b'ARROW1', 'feather'),
+        (b'PK\x03\x04', 'xlsx'),
+        (b'\xd0\xcf\x11\xe0', 'xls'),
+    ]
+    CSV_CHUNK_ROWS = 100_000
+    
+    def __init__(self):
+        pass
+    
+    def _head(self, source, size=65536):
+        """Return the first bytes of a path or file-like source without consuming it"""
+        
+        if isinstance(source, (str, os.PathLike)):
+            with open(source, 'rb') as f:
+                return f.read(size)
+        source.seek(0)
+        head = source.read(size)
+        source.seek(0)
+        return head
+    
+    def detect_format(self, source):
+        """Detect the input format from the file name, falling back to its magic number"""
+        
+        name = source if isinstance(source, (str, os.PathLike)) else getattr(source, 'name', '')
+        extension = os.path.splitext(str(name))[1].lower()
+        if extension in self.EXTENSIONS:
+            return self.EXTENSIONS[extension]
+        
+        head = self._head(source, 8)
+        for magic, fmt in self.MAGIC_NUMBERS:
+            if head.startswith(magic):
+                return fmt
+        return 'csv'
+    
+    def read_table(self, source, fmt, columns=None, filters=None, dtypes=None):
+        """Read a non-Excel input keeping only the requested columns and rows"""
+        
+        if fmt == 'csv':
+            return self.read_csv(source, columns, filters, dtypes)
+        if fmt == 'parquet':
+            return self.read_parquet(source, columns, filters)
+        if fmt == 'feather':
+            return self.read_feather(source, columns, filters)
+        raise ValueError(f"Formato de arquivo não suportado: {fmt}")
+    
+    def _sniff_csv(self, source):
+        """Guess the delimiter and encoding of a CSV (INEP microdata is ';' and latin-1)"""
+        
+        head = self._head(source)
+        try:
+            # Incremental, so a multibyte character cut at the end of the head is not an error
+            text = codecs.getincrementaldecoder('utf-8')().decode(head, final=False)
+            encoding = 'utf-8'
+        except UnicodeDecodeError:
+            text = head.decode('latin-1')
+            encoding = 'latin-1'
+        
+        first_line = text.splitlines()[0] if text else ''
+        delimiter = max([';', ',', '\t', '|'], key=first_line.count)
+        return delimiter, encoding
+    
+    def read_csv(self, source, columns=None, filters=None, dtypes=None):
+        """Read a CSV in bounded chunks, keeping only the requested columns and rows"""
+        
+        # Filtering each chunk as it arrives keeps memory bounded by the matching rows
+        kept = list(self.iter_chunks(source, 'csv', columns, filters, dtypes))
+        if not kept:
+            return pd.DataFrame(columns=list(columns or []))
+        return pd.concat(kept, ignore_index=True)
+    
+    def iter_chunks(self, source, fmt, columns=None, filters=None, dtypes=None, chunk_rows=None):
+        """Yield filtered DataFrames of at most chunk_rows rows from a CSV, Parquet or Feather input"""
+        
+        chunk_rows = chunk_rows or self.CSV_CHUNK_ROWS
+        wanted = None
+        if columns is not None:
+            wanted = list(columns) + [col for col in (filters or {}) if col not in columns]
+        
+        if fmt == 'csv':
+            delimiter, encoding = self._sniff_csv(source)
+            usecols = None
+            if wanted is not None:
+                wanted_set = set(wanted)
+                usecols = lambda col: col.strip() in wanted_set
+            
+            read = 0
+            try:
+                for chunk in self._csv_chunks(source, delimiter, encoding, usecols, dtypes, chunk_rows):
+                    read += 1
+                    yield self._apply_filters(chunk, filters)
+            except UnicodeDecodeError:
+                if encoding != 'utf-8':
+                    raise
+                # Only the head was sniffed: a latin-1 file can be plain ASCII for its first
+                # 64KB, so it is read again as latin-1 past the chunks already handed out
+                if hasattr(source, 'seek'):
+                    source.seek(0)
+                chunks = self._csv_chunks(source, delimiter, 'latin-1', usecols, dtypes, chunk_rows)
+                for index, chunk in enumerate(chunks):
+                    if index >= read:
+                        yield self._apply_filters(chunk, filters)
+        
+        elif fmt == 'parquet':
+            parquet_file = pq.ParquetFile(source)
+            available = parquet_file.schema_arrow.names
+            selected = None if wanted is None else [col for col in wanted if col in available]
+            for batch in parquet_file.iter_batches(batch_size=chunk_rows, columns=selected):
+                yield self._apply_filters(batch.to_pandas(), filters)
+        
+        elif fmt == 'feather':
+            table = feather.read_table(source, columns=self._feather_columns(source, wanted))
+            for batch in table.to_batches(max_chunksize=chunk_rows):
+                yield self._apply_filters(batch.to_pandas(), filters)
+        
+        else:
+            raise ValueError(f"Formato de arquivo não suportado: {fmt}")
+    
+    def _csv_chunks(self, source, delimiter, encoding, usecols, dtypes, chunk_rows):
+        """Yield the raw chunks of a CSV with stripped column names"""
+        
+        reader = pd.read_csv(
+            source,
+            sep=delimiter,
+            encoding=encoding,
+            usecols=usecols,
+            dtype=dtypes,
+            chunksize=chunk_rows,
+            low_memory=False
+        )
+        for chunk in reader:
+            chunk.columns = [col.strip() for col in chunk.columns]
+            yield chunk
+    
+    def read_parquet(self, source, columns=None, filters=None):
+        """Read a Parquet file, pushing column and row selection into pyarrow"""
+        
+        parquet_file = pq.ParquetFile(source)
+        available = parquet_file.schema_arrow.names
+        if hasattr(source, 'seek'):
+            source.seek(0)
+        
+        selected = None
+        if columns is not None:
+            wanted = list(columns) + [col for col in (filters or {}) if col not in columns]
+            selected = [col for col in wanted if col in available]
+        
+        row_filters = [
+            (col, 'in', list(accepted))
+            for col, accepted in (filters or {}).items()
+            if col in available
+        ]
+        return pd.read_parquet(source, columns=selected, filters=row_filters or None)
+    
+    def read_feather(self, source, columns=None, filters=None):
+        """Read a Feather (Arrow IPC) file keeping only the requested columns and rows"""
+        
+        wanted = None
+        if columns is not None:
+            wanted = list(columns) + [col for col in (filters or {}) if col not in columns]
+        
+        # Feather v2 reads only the selected columns from disk
+        table = feather.read_table(source, columns=self._feather_columns(source, wanted))
+        return self._apply_filters(table.to_pandas(), filters)
+    
+    def _feather_columns(self, source, wanted):
+        """Restrict wanted columns to those present in a Feather file's schema"""
+        
+        if wanted is None:
+            return None
+        handle = pa.memory_map(str(source)) if isinstance(source, (str, os.PathLike)) else source
+        available = pa.ipc.open_file(handle).schema.names
+        if hasattr(source, 'seek'):
+            source.seek(0)
+        return [col for col in wanted if col in available]
+    
+    def _apply_filters(self, df, filters):
+        """Keep the rows whose values are accepted by every filter"""
+        
+        if not filters:
+            return df
+        mask = pd.Series(True, index=df.index)
+        for col, accepted in filters.items():
+            if col in df.columns:
+                mask &= df[col].isin(accepted)
+        return df[mask]
@@ -0,0 +1,115 @@
+import numpy as np
+import pandas as pd
+
+# How repeated keys in an input table are resolved before joining
+DUPLICATE_POLICIES = ('first', 'mean', 'fail')
+
+def normalize_codes(df, key):
+    """Return df with key as int64, without rows whose code is missing or fractional, sorted by key"""
+    
+    codes = df[key]
+    if codes.dtype != np.int64:
+        # Censo codes arrive as int, IDEB ones as float or text depending on the reader
+        codes = pd.to_numeric(codes, errors='coerce')
+        valid = codes.notna() & (codes % 1 == 0)
+        if not valid.all():
+            df = df[valid]
+            codes = codes[valid]
+        df = df.assign(**{key: codes.astype(np.int64)})
+    
+    # Sources are usually already ordered by code, which makes this check the whole cost
+    if not df[key].is_monotonic_increasing:
+        df = df.sort_values(key, kind='stable')
+    return df
+
+def duplicate_diagnostics(df, key, table):
+    """Describe the repeated keys of one input table as a diagnostics row"""
+    
+    codes = pd.to_numeric(df[key], errors='coerce').dropna()
+    extra = codes.duplicated()
+    repeated = codes[extra].unique()
+    return {
+        'Tabela': table,
+        'Linhas': len(df),
+        'Códigos repetidos': len(repeated),
+        'Linhas excedentes': int(extra.sum()),
+        'Exemplos': ', '.join(str(int(code)) for code in repeated[:5]),
+    }
+
+def resolve_duplicates(df, key, policy, table):
+    """Return df with one row per key: the first one, the mean of the numeric columns, or an error"""
+    
+    if policy not in DUPLICATE_POLICIES:
+        raise ValueError(f"Política de duplicatas inválida: {policy}. Use uma de {list(DUPLICATE_POLICIES)}")
+    
+    extra = df[key].duplicated()
+    if not extra.any():
+        return df
+    
+    if policy == 'fail':
+        repeated = df.loc[extra, key].unique()
+        raise ValueError(
+            f"{table}: {len(repeated)} códigos de escola repetidos "
+            f"(ex.: {', '.join(str(code) for code in repeated[:5])})"
+        )
+    if policy == 'first':
+        return df[~extra]
+    
+    # mean: numeric columns are averaged per code, the others keep the first value
+    aggregations = {
+        col: 'mean' if pd.api.types.is_numeric_dtype(df[col]) else 'first'
+        for col in df.columns if col != key
+    }
+    return df.groupby(key, sort=False, as_index=False).agg(aggregations)
+
+class SortedKeyJoin:
+    """Left joins on an int64 key between tables sorted by that key"""
+    
+    def __init__(self, key):
+        self.key = key
+        # join name -> {'esquerda': codes without a match on the right, 'direita': the reverse}
+        self.unmatched = {}
+    
+    def left_join(self, left, right, name, columns):
+        """Add the right table's columns (as {column: new name}) to left, aligned on the key"""
+        
+        left = normalize_codes(left, self.key)
+        right = normalize_codes(right, self.key)
+        left_codes = left[self.key].to_numpy()
+        right_codes = right[self.key].to_numpy()
+        
+        # Position of each left code in the right table; side='left' picks the first of repeated codes
+        positions = np.searchsorted(right_codes, left_codes)
+        found = positions < len(right_codes)
+        found[found] = right_codes[positions[found]] == left_codes[found]
+        positions = np.where(found, positions, -1)
+        
+        joined = {
+            new_name: pd.api.extensions.take(right[column].array, positions, allow_fill=True)
+            for column, new_name in columns.items()
+        }
+        
+        # Both sides are sorted, so membership of the right codes is one more searchsorted
+        back = np.searchsorted(left_codes, right_codes)
+        in_left = back < len(left_codes)
+        in_left[in_left] = left_codes[back[in_left]] == right_codes[in_left]
+        self.unmatched[name] = {
+            'esquerda': np.unique(left_codes[~found]),
+            'direita': np.unique(right_codes[~in_left]),
+        }
+        
+        return left.assign(**joined)
+    
+    def report(self):
+        """Return the number of unmatched codes per join and side, with a few examples"""
+        
+        rows = []
+        for name, sides in self.unmatched.items():
+            for side, codes in sides.items():
+                rows.append({
+                    'Junção': name,
+                    'Lado': side,
+                    'Códigos sem par': len(codes),
+                    'Exemplos': ', '.join(str(code) for code in codes[:5]),
+                })
+        return pd.DataFrame(rows, columns=['Junção', 'Lado', 'Códigos sem par', 'Exemplos'])
@@ -0,0 +1,73 @@
+import resource
+import sys
+import pandas as pd
+
+# Copy-free mode: working frames are lazy copy-on-write copies instead of deep copies
+_copy_free = True
+
+def peak_rss_mb():
+    """Return the peak resident set size of the current process in MB (since the last reset)"""
+    
+    # VmHWM honours reset_peak_rss; ru_maxrss covers the whole life of the process
+    try:
+        with open('/proc/self/status') as f:
+            for line in f:
+                if line.startswith('VmHWM:'):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is reported in bytes on macOS and in kilobytes elsewhere
+    if sys.platform == 'darwin':
+        return peak / (1024 * 1024)
+    return peak / 1024
+
+def current_rss_mb():
+    """Return the current resident set size of the current process in MB"""
+    
+    try:
+        with open('/proc/self/statm') as f:
+            resident_pages = int(f.read().split()[1])
+        return resident_pages * resource.getpagesize() / (1024 * 1024)
+    except OSError:
+        # No procfs (e.g. macOS): the peak is the best available approximation
+        return peak_rss_mb()
+
+def reset_peak_rss():
+    """Restart peak RSS tracking from the current RSS, so phases can be measured separately.
+    
+    Only possible on Linux; returns whether the reset happened"""
+    
+    try:
+        with open('/proc/self/clear_refs', 'w') as f:
+            f.write('5')
+        return True
+    except OSError:
+        return False
+
+def copy_on_write_enabled():
+    """Whether pandas defers copies until a shared buffer is written (always the case from pandas 3)"""
+    
+    if int(pd.__version__.split('.')[0]) >= 3:
+        return True
+    return pd.get_option('mode.copy_on_write') is True
+
+def enable_copy_on_write():
+    """Turn copy-on-write on under pandas 2.x; pandas 3 has no other mode"""
+    
+    if not copy_on_write_enabled():
+        pd.set_option('mode.copy_on_write', True)
+
+def set_copy_free(enabled):
+    """Switch copy-free mode on or off (off restores the defensive deep copies)"""
+    
+    global _copy_free
+    _copy_free = enabled
+
+def working_copy(df):
+    """Return a copy of df that can be modified freely: lazy in copy-free mode, deep otherwise"""
+    
+    # With copy-on-write a shallow copy is already isolated: adding or overwriting columns
+    # never reaches df, and shared buffers are only copied if someone writes into them
+    return df.copy(deep=not (_copy_free and copy_on_write_enabled()))
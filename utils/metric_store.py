@@ -0,0 +1,127 @@
+import numpy as np
+import pandas as pd
+from utils.ingest import WorkbookReader
+
+class MetricStore:
+    """Compact float32 store of every IDEB indicator, indexed by school code"""
+    
+    STAGES = ['iniciais', 'finais']
+    CODE_COLUMN = 'Código da Escola'
+    # Identifier columns that are numeric but are not indicators
+    ID_COLUMNS = {'Código da Escola', 'Código do Município'}
+    
+    def __init__(self, codes, values, registry):
+        # codes: sorted unique int64 school codes (one row of values per code)
+        self.codes = codes
+        # values: float32 matrix, one column-major block so each metric is contiguous
+        self.values = values
+        # registry: (stage, indicator) -> column index in values
+        self.registry = registry
+    
+    @classmethod
+    def from_ideb(cls, frames):
+        """Build the store from raw IDEB frames, as {stage: DataFrame}"""
+        
+        registry = {}
+        stage_frames = {}
+        for stage, df in frames.items():
+            codes = pd.to_numeric(df[cls.CODE_COLUMN], errors='coerce')
+            valid = codes.notna().to_numpy()
+            stage_codes = codes.to_numpy()[valid].astype(np.int64)
+            
+            # The first row of a repeated code wins, as in the merge of the main table
+            stage_codes, first = np.unique(stage_codes, return_index=True)
+            indicators = {}
+            for col in df.columns:
+                if col not in cls.ID_COLUMNS:
+                    numbers = cls._numeric(df[col])
+                    if numbers is not None:
+                        indicators[col] = numbers
+            stage_frames[stage] = (stage_codes, first, valid, df, indicators)
+        
+        all_codes = np.unique(np.concatenate(
+            [entry[0] for entry in stage_frames.values()] or [np.empty(0, np.int64)]
+        ))
+        n_metrics = sum(len(entry[4]) for entry in stage_frames.values())
+        values = np.full((len(all_codes), n_metrics), np.nan, dtype=np.float32, order='F')
+        
+        column = 0
+        for stage, (stage_codes, first, valid, df, indicators) in stage_frames.items():
+            rows = np.searchsorted(all_codes, stage_codes)
+            for indicator, numbers in indicators.items():
+                series = numbers.to_numpy(dtype=np.float64, na_value=np.nan)[valid][first]
+                values[rows, column] = series
+                registry[(stage, indicator)] = column
+                column += 1
+        
+        return cls(all_codes, values, registry)
+    
+    @staticmethod
+    def _numeric(series):
+        """An indicator column as numbers, or None for a text column"""
+        
+        if pd.api.types.is_numeric_dtype(series):
+            return series
+        
+        # CSV and .xls sheets keep INEP's '-'/'ND' placeholders (and decimal commas) as text;
+        # a column is an indicator when everything but the placeholders is a number
+        text = series.astype('string').str.strip()
+        missing = text.isna() | text.str.upper().isin(WorkbookReader.MISSING_MARKERS)
+        numbers = pd.to_numeric(
+            text.mask(missing).str.replace(',', '.', regex=False), errors='coerce'
+        )
+        if numbers.notna().sum() == 0 or (numbers.isna() & ~missing).any():
+            return None
+        return numbers
+    
+    def indicators(self):
+        """Return the indicator names available in at least one stage, in registry order"""
+        
+        names = []
+        for _, indicator in self.registry:
+            if indicator not in names:
+                names.append(indicator)
+        return names
+    
+    def lookup(self, codes, stage, indicator):
+        """Return the indicator for the given school codes (NaN where unavailable)"""
+        
+        codes = np.asarray(codes, dtype=np.int64)
+        result = np.full(len(codes), np.nan, dtype=np.float32)
+        column = self.registry.get((stage, indicator))
+        if column is None or len(self.codes) == 0:
+            return result
+        
+        positions = np.searchsorted(self.codes, codes)
+        positions = np.minimum(positions, len(self.codes) - 1)
+        found = self.codes[positions] == codes
+        result[found] = self.values[positions[found], column]
+        return result
+    
+    def metric(self, stage, indicator):
+        """Return one indicator as a Series indexed by school code"""
+        
+        column = self.registry[(stage, indicator)]
+        return pd.Series(self.values[:, column], index=self.codes, name=indicator)
+    
+    def to_frame(self):
+        """Flatten the store to a DataFrame (e.g. for snapshots)"""
+        
+        data = {self.CODE_COLUMN: self.codes}
+        for (stage, indicator), column in self.registry.items():
+            data[f'{stage}|{indicator}'] = self.values[:, column]
+        return pd.DataFrame(data)
+    
+    @classmethod
+    def from_frame(cls, df):
+        """Rebuild a store saved with to_frame"""
+        
+        metric_columns = [col for col in df.columns if col != cls.CODE_COLUMN]
+        values = np.asfortranarray(df[metric_columns].to_numpy(dtype=np.float32))
+        registry = {tuple(col.split('|', 1)): i for i, col in enumerate(metric_columns)}
+        return cls(df[cls.CODE_COLUMN].to_numpy(dtype=np.int64), values, registry)
+    
+    def nbytes(self):
+        """Memory held by the codes and values arrays"""
+        
+        return self.codes.nbytes + self.values.nbytes
@@ -0,0 +1,124 @@
+import io
+import multiprocessing
+import os
+import tempfile
+import threading
+import pyarrow as pa
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+def available_cpus():
+    """Return the number of CPUs this process may run on"""
+    
+    if hasattr(os, 'sched_getaffinity'):
+        return len(os.sched_getaffinity(0))
+    return os.cpu_count() or 1
+
+def pool_size():
+    """Workers of the shared pool: every available CPU, capped by PARALLEL_LOADER_MAX_WORKERS when set"""
+    
+    cpus = available_cpus()
+    cap = int(os.environ.get('PARALLEL_LOADER_MAX_WORKERS', 0))
+    return min(cpus, cap) if cap > 0 else cpus
+
+def _read_job(options, kind, source):
+    """Worker: read one input file and spool the frame to an Arrow IPC file, returning its path"""
+    
+    # Imported here so the worker does not need the parent's module state
+    from utils.data_processor import DataProcessor
+    
+    if isinstance(source, bytes):
+        source = io.BytesIO(source)
+    df = DataProcessor(**options)._read_source(kind, source)
+    
+    # The columns are written once to a file the parent memory-maps, so they never go
+    # through the executor's result pipe (which pickles results in-band)
+    try:
+        table = pa.Table.from_pandas(df)
+    except (pa.ArrowInvalid, pa.ArrowTypeError):
+        # Whole-sheet reads can hold mixed-type object columns Arrow has no type for
+        return df
+    fd, path = tempfile.mkstemp(prefix='leitura-', suffix='.arrow')
+    try:
+        with os.fdopen(fd, 'wb') as f, pa.ipc.new_file(f, table.schema) as writer:
+            writer.write_table(table)
+    except Exception:
+        os.remove(path)
+        raise
+    return path
+
+def _load_spooled(result):
+    """Frame returned by _read_job: rebuilt from the memory-mapped Arrow file, which is then removed"""
+    
+    if not isinstance(result, str):
+        return result
+    try:
+        # Removing the file leaves the mapping valid, so zero-copy columns stay readable
+        return pa.ipc.open_file(pa.memory_map(result)).read_all().to_pandas()
+    finally:
+        os.remove(result)
+
+def _discard_spooled(future):
+    """Done callback removing the Arrow file of a job whose frame is not needed"""
+    
+    if not future.cancelled() and future.exception() is None and isinstance(future.result(), str):
+        os.remove(future.result())
+
+class ParallelLoader:
+    """Class for reading the input files concurrently in a process pool"""
+    
+    _executor = None
+    _lock = threading.Lock()
+    
+    def __init__(self, options):
+        # Keyword arguments used to build the DataProcessor inside each worker
+        self.options = options
+    
+    @classmethod
+    def _get_executor(cls):
+        # One pool per server process, reused so workers only pay the import cost once.
+        # spawn is used because Streamlit runs scripts on threads, which fork does not mix well with.
+        # It is sized for the machine rather than the first call's job count, since it serves every
+        # later call too; spawn pools only start workers as jobs need them
+        with cls._lock:
+            if cls._executor is None:
+                cls._executor = ProcessPoolExecutor(
+                    max_workers=pool_size(),
+                    mp_context=multiprocessing.get_context('spawn')
+                )
+            return cls._executor
+    
+    def read_all(self, jobs):
+        """Read (kind, source) jobs in parallel and return the frames in order"""
+        
+        executor = self._get_executor()
+        futures = [
+            executor.submit(_read_job, self.options, kind, self._portable(source))
+            for kind, source in jobs
+        ]
+        
+        frames = []
+        try:
+            for future in futures:
+                frames.append(_load_spooled(future.result()))
+        except BrokenProcessPool:
+            # A dead worker poisons the whole pool; drop it so the next call starts fresh
+            with self._lock:
+                if ParallelLoader._executor is executor:
+                    ParallelLoader._executor = None
+            raise
+        finally:
+            # Files spooled by the jobs after a failed one are never read; remove them as they land
+            for future in futures[len(frames) + 1:]:
+                future.add_done_callback(_discard_spooled)
+        return frames
+    
+    def _portable(self, source):
+        """Turn uploaded file objects into bytes that can cross the process boundary"""
+        
+        if hasattr(source, 'getvalue'):
+            return source.getvalue()
+        if hasattr(source, 'read'):
+            source.seek(0)
+            return source.read()
+        return source
@@ -0,0 +1,133 @@
+import json
+import os
+import shutil
+import tempfile
+import pandas as pd
+
+class PartitionStore:
+    """Directory of cleaned data holding one Parquet file per municipality"""
+    
+    PARTITION_COLUMN = 'Código do Município'
+    NAME_COLUMN = 'Nome do Município'
+    MANIFEST = 'manifest.json'
+    
+    def __init__(self, root):
+        self.root = root
+        self._manifest = None
+    
+    def exists(self):
+        """Return whether a complete store has been written at root"""
+        
+        return os.path.exists(os.path.join(self.root, self.MANIFEST))
+    
+    def _partition_path(self, root, code, table=None):
+        # The main table of a partition, plus optional side tables next to it
+        suffix = f'.{table}' if table else ''
+        return os.path.join(root, f'municipio={int(code)}{suffix}.parquet')
+    
+    def version(self):
+        """Fingerprint of the stored data, which changes whenever the store is rewritten"""
+        
+        return os.stat(os.path.join(self.root, self.MANIFEST)).st_mtime_ns
+    
+    def write(self, df):
+        """Replace the store with df split by municipality code"""
+        
+        if self.PARTITION_COLUMN not in df.columns:
+            raise ValueError(f"Coluna '{self.PARTITION_COLUMN}' necessária para particionar os dados")
+        
+        return self.write_partitions(
+            (code, {None: partition}) for code, partition in df.groupby(self.PARTITION_COLUMN, sort=True)
+        )
+    
+    def write_chunks(self, frames, assemble=None):
+        """Replace the store with DataFrames split by municipality code as they arrive"""
+        
+        # Each frame's partitions are spooled to disk right away, then every municipality is
+        # put back together (and passed through assemble) on its own, so only one frame and
+        # one partition are ever held in memory
+        parent = os.path.dirname(os.path.abspath(self.root))
+        os.makedirs(parent, exist_ok=True)
+        spool = tempfile.mkdtemp(dir=parent, prefix='.chunks-')
+        try:
+            parts = {}
+            for frame in frames:
+                if self.PARTITION_COLUMN not in frame.columns:
+                    raise ValueError(f"Coluna '{self.PARTITION_COLUMN}' necessária para particionar os dados")
+                for code, partition in frame.groupby(self.PARTITION_COLUMN, sort=False):
+                    paths = parts.setdefault(int(code), [])
+                    paths.append(os.path.join(spool, f'municipio={int(code)}.{len(paths)}.parquet'))
+                    partition.to_parquet(paths[-1], index=False)
+            
+            def assembled():
+                for code in sorted(parts):
+                    partition = pd.concat([pd.read_parquet(path) for path in parts[code]], ignore_index=True)
+                    for path in parts[code]:
+                        os.remove(path)
+                    yield code, {None: assemble(partition) if assemble else partition}
+            
+            return self.write_partitions(assembled())
+        finally:
+            shutil.rmtree(spool, ignore_errors=True)
+    
+    def write_partitions(self, partitions):
+        """Replace the store with (code, {table: DataFrame}) pairs, written one at a time"""
+        
+        # The None table is the partition's main table; any other name is a side table
+        # (e.g. indicators) read back with load(codes, table=name)
+        parent = os.path.dirname(os.path.abspath(self.root))
+        os.makedirs(parent, exist_ok=True)
+        
+        # Build the new store next to the old one, then swap it in with renames
+        staging = tempfile.mkdtemp(dir=parent, prefix='.partitions-')
+        try:
+            manifest = {}
+            for code, tables in partitions:
+                for table, frame in tables.items():
+                    frame.reset_index(drop=True).to_parquet(
+                        self._partition_path(staging, code, table), index=False
+                    )
+                partition = tables[None]
+                name = None
+                if self.NAME_COLUMN in partition.columns:
+                    name = str(partition[self.NAME_COLUMN].iloc[0])
+                manifest[str(int(code))] = {'nome': name, 'escolas': len(partition)}
+            
+            with open(os.path.join(staging, self.MANIFEST), 'w', encoding='utf-8') as f:
+                json.dump(manifest, f, ensure_ascii=False, indent=1)
+            
+            backup = None
+            if os.path.exists(self.root):
+                backup = f'{self.root}.old'
+                shutil.rmtree(backup, ignore_errors=True)
+                os.replace(self.root, backup)
+            os.replace(staging, self.root)
+            if backup:
+                shutil.rmtree(backup, ignore_errors=True)
+        except Exception:
+            shutil.rmtree(staging, ignore_errors=True)
+            raise
+        
+        self._manifest = None
+        return manifest
+    
+    def municipios(self):
+        """Return {municipality code: {'nome', 'escolas'}} for every partition"""
+        
+        if self._manifest is None:
+            with open(os.path.join(self.root, self.MANIFEST), encoding='utf-8') as f:
+                self._manifest = {int(code): info for code, info in json.load(f).items()}
+        return self._manifest
+    
+    def load(self, codes, table=None):
+        """Read only the partitions of the given municipality codes"""
+        
+        available = self.municipios()
+        missing = [code for code in codes if int(code) not in available]
+        if missing:
+            raise ValueError(f"Municípios não encontrados nos dados particionados: {missing}")
+        
+        frames = [pd.read_parquet(self._partition_path(self.root, code, table)) for code in codes]
+        if len(frames) == 1:
+            return frames[0]
+        return pd.concat(frames, ignore_index=True)
@@ -0,0 +1,144 @@
+import hashlib
+import os
+import threading
+import time
+from collections import OrderedDict
+import pandas as pd
+
+def source_digest(source):
+    """Return the SHA-256 of an input file, given as a path or an uploaded file object"""
+    
+    sha = hashlib.sha256()
+    if isinstance(source, (str, os.PathLike)):
+        with open(source, 'rb') as f:
+            for chunk in iter(lambda: f.read(1 << 20), b''):
+                sha.update(chunk)
+    elif hasattr(source, 'getvalue'):
+        sha.update(source.getvalue())
+    else:
+        source.seek(0)
+        sha.update(source.read())
+        source.seek(0)
+    return sha.hexdigest()
+
+def value_nbytes(value):
+    """Bytes held by a stage output: frames, objects with an nbytes() method and tuples of them"""
+    
+    if isinstance(value, pd.DataFrame):
+        return int(value.memory_usage(deep=True).sum())
+    if isinstance(value, (tuple, list)):
+        return sum(value_nbytes(item) for item in value)
+    nbytes = getattr(value, 'nbytes', None)
+    return int(nbytes()) if callable(nbytes) else 0
+
+class StageCache:
+    """Process-wide memo of pipeline stage outputs keyed by their input fingerprints"""
+    
+    def __init__(self, max_bytes=256 * 1024 * 1024):
+        # Outputs sharing buffers with their inputs are counted in full, so this is an upper bound
+        self.max_bytes = max_bytes
+        self.current_bytes = 0
+        # stage key -> (output, size in bytes), least recently used first
+        self._entries = OrderedDict()
+        # path -> ((size, mtime_ns), sha256) so unchanged files are not re-hashed
+        self._digests = {}
+        self._lock = threading.Lock()
+    
+    def digest(self, source):
+        """Fingerprint an input file, memoizing paths on (size, mtime)"""
+        
+        if not isinstance(source, (str, os.PathLike)):
+            return source_digest(source)
+        
+        stat = os.stat(source)
+        signature = (stat.st_size, stat.st_mtime_ns)
+        with self._lock:
+            cached = self._digests.get(source)
+        if cached and cached[0] == signature:
+            return cached[1]
+        
+        digest = source_digest(source)
+        with self._lock:
+            self._digests[source] = (signature, digest)
+        return digest
+    
+    def get(self, key):
+        """Return (True, output) for a memoized stage, (False, None) otherwise"""
+        
+        with self._lock:
+            if key not in self._entries:
+                return False, None
+            self._entries.move_to_end(key)
+            return True, self._entries[key][0]
+    
+    def put(self, key, value):
+        """Memoize a stage output, evicting the least recently used ones to stay within max_bytes"""
+        
+        size = value_nbytes(value)
+        # Outputs larger than the whole budget are never memoized
+        if size > self.max_bytes:
+            return
+        
+        with self._lock:
+            if key in self._entries:
+                self.current_bytes -= self._entries.pop(key)[1]
+            
+            while self._entries and self.current_bytes + size > self.max_bytes:
+                _, (_, evicted_size) = self._entries.popitem(last=False)
+                self.current_bytes -= evicted_size
+            
+            self._entries[key] = (value, size)
+            self.current_bytes += size
+
+class Pipeline:
+    """One run of a stage DAG, memoizing each stage on the fingerprints of its inputs"""
+    
+    def __init__(self, cache=None, listener=None):
+        # Without a cache every stage runs, but the run is still reported
+        self.cache = cache
+        # Called as listener(name, hit, value, seconds) after every stage
+        self.listener = listener
+        # name -> fingerprint of every source and stage seen in this run
+        self.keys = {}
+        # name -> value of every source and stage seen in this run
+        self.values = {}
+        # stage name -> 'hit' or 'miss', in execution order
+        self.report = OrderedDict()
+    
+    def source(self, name, value, digest):
+        """Declare an input of the DAG with a fingerprint of its contents"""
+        
+        self.keys[name] = digest
+        self.values[name] = value
+    
+    def key_for(self, name, inputs=(), params=()):
+        """Fingerprint of a stage: its name, its parameters and the keys of its inputs"""
+        
+        sha = hashlib.sha256(name.encode())
+        sha.update(repr(params).encode())
+        for input_name in inputs:
+            sha.update(self.keys[input_name].encode())
+        return sha.hexdigest()
+    
+    def is_cached(self, name, inputs=(), params=()):
+        """Whether a stage would be served from the cache"""
+        
+        return self.cache is not None and self.cache.get(self.key_for(name, inputs, params))[0]
+    
+    def stage(self, name, func, inputs=(), params=()):
+        """Run func on the values of inputs, or reuse its memoized output"""
+        
+        start = time.perf_counter()
+        key = self.key_for(name, inputs, params)
+        hit, value = self.cache.get(key) if self.cache is not None else (False, None)
+        if not hit:
+            value = func(*(self.values[input_name] for input_name in inputs))
+            if self.cache is not None:
+                self.cache.put(key, value)
+        
+        self.keys[name] = key
+        self.values[name] = value
+        self.report[name] = 'hit' if hit else 'miss'
+        if self.listener is not None:
+            self.listener(name, hit, value, time.perf_counter() - start)
+        return value
@@ -0,0 +1,423 @@
+import math
+import sqlite3
+import threading
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+
+try:
+    import duckdb
+except ImportError:
+    duckdb = None
+
+# Query engines, in the order 'auto' tries them
+ENGINES = ('duckdb', 'sqlite')
+# Row position in the processed frame, so query results keep its order
+ROW_COLUMN = '_linha'
+IDEB_COLUMNS = {'iniciais': 'IDEB Iniciais', 'finais': 'IDEB Finais'}
+
+def quote(name):
+    """Quote a column name as an SQL identifier"""
+    
+    return '"' + str(name).replace('"', '""') + '"'
+
+def available_engines():
+    """Query engines usable in this environment"""
+    
+    return [engine for engine in ENGINES if engine != 'duckdb' or duckdb is not None]
+
+class QueryBackend:
+    """Embedded SQL copy of the processed table, queried with parameterized filters"""
+    
+    def __init__(self, data, metric_store=None, engine='auto', default_indicator=None):
+        if engine == 'auto':
+            engine = available_engines()[0]
+        if engine not in available_engines():
+            raise ValueError(f"Mecanismo de consulta indisponível: {engine}. Use um de {available_engines()}")
+        self.engine = engine
+        self.columns = list(data.columns)
+        # Query results are cast back to these, so both engines hand out the pandas path's dtypes
+        self.dtypes = data.dtypes.to_dict()
+        # (stage, indicator) pairs of the indicator table; no reference to the frame or the
+        # metric store is kept, so the caller can let them go once this copy holds them
+        self.registry = set(metric_store.registry) if metric_store is not None else None
+        self.indicator_names = metric_store.indicators() if metric_store is not None else []
+        self.default_indicator = default_indicator
+        # One connection shared by every session; Streamlit serves each on its own thread
+        self._lock = threading.Lock()
+        
+        table = data.assign(**{ROW_COLUMN: np.arange(len(data), dtype=np.int64)})
+        metrics = metric_store.to_frame() if metric_store is not None else None
+        if engine == 'duckdb':
+            self._conn = duckdb.connect(':memory:')
+            self._load_duckdb('escolas', table)
+            if metrics is not None:
+                self._load_duckdb('indicadores', metrics)
+        else:
+            self._conn = sqlite3.connect(':memory:', check_same_thread=False)
+            # SQLite's own lower() only folds ASCII; names carry accents
+            self._conn.create_function(
+                'lower', 1, lambda value: value.lower() if value is not None else None, deterministic=True
+            )
+            # floor() is only built in when SQLite was compiled with its math functions
+            try:
+                self._conn.execute('SELECT floor(1.5)')
+            except sqlite3.OperationalError:
+                self._conn.create_function(
+                    'floor', 1, lambda value: math.floor(value) if value is not None else None, deterministic=True
+                )
+            table.to_sql('escolas', self._conn, index=False)
+            if metrics is not None:
+                metrics.to_sql('indicadores', self._conn, index=False)
+            self._conn.execute(f'CREATE INDEX escolas_codigo ON escolas ({quote("Código da Escola")})')
+            if metrics is not None:
+                self._conn.execute(f'CREATE INDEX indicadores_codigo ON indicadores ({quote("Código da Escola")})')
+    
+    def _load_duckdb(self, name, df):
+        """Copy a frame into a DuckDB table, handing it over as Arrow"""
+        
+        self._conn.register(f'{name}_arrow', pa.Table.from_pandas(df, preserve_index=False))
+        self._conn.execute(f'CREATE TABLE {name} AS SELECT * FROM {name}_arrow')
+        self._conn.unregister(f'{name}_arrow')
+    
+    def _source(self, indicator):
+        """FROM clause of the processed table with the IDEB columns holding indicator"""
+        
+        swapped = {}
+        if indicator not in (None, self.default_indicator) and indicator in self.indicator_names:
+            # Same values as DataProcessor.with_metric, joined from the indicator table
+            for stage, column in IDEB_COLUMNS.items():
+                if (stage, indicator) in self.registry:
+                    swapped[column] = f'm.{quote(f"{stage}|{indicator}")}'
+                else:
+                    swapped[column] = 'NULL'
+        
+        select = ', '.join(
+            f'{swapped[col]} AS {quote(col)}' if col in swapped else f'e.{quote(col)}'
+            for col in self.columns + [ROW_COLUMN]
+        )
+        join = ''
+        if swapped:
+            code = quote('Código da Escola')
+            join = f' LEFT JOIN indicadores m ON m.{code} = e.{code}'
+        return f'(SELECT {select} FROM escolas e{join}) AS dados'
+    
+    def expression(self, column):
+        """SQL expression of a column as the dashboard reads it"""
+        
+        if column == 'Percentual_AC':
+            # Recomputed in double precision from the room counts like the sidebar and the
+            # charts do, instead of read from the stored float32 column (0 without rooms)
+            return f'COALESCE(({quote("Salas com Ar")} * 1.0 / {quote("Total de Salas")}) * 100, 0)'
+        return quote(column)
+    
+    def _bound(self, column, value):
+        """A filter bound as the column stores it, so comparisons match the pandas path"""
+        
+        # float32 columns compare against the bound rounded to float32 in pandas too
+        if column in self.dtypes and self.dtypes[column] == np.float32:
+            return float(np.float32(value))
+        return value
+    
+    def compile_filters(self, filters, search=None):
+        """Translate the sidebar filters (as in DataProcessor.apply_filters) to a WHERE clause and its parameters"""
+        
+        clauses = []
+        params = []
+        
+        for key, column in (('municipio', 'Nome do Município'), ('bairro', 'Bairro')):
+            if filters.get(key) and filters[key] != 'Todos':
+                clauses.append(f'{quote(column)} = ?')
+                params.append(filters[key])
+        
+        for key, column in (('ac_range', 'Percentual_AC'), ('salas_range', 'Total de Salas')):
+            if filters.get(key):
+                clauses.append(f'{quote(column)} BETWEEN ? AND ?')
+                params.extend(self._bound(column, value) for value in filters[key])
+        
+        # Schools without IDEB are kept by the IDEB ranges
+        for key, column in (('ideb_iniciais_range', 'IDEB Iniciais'), ('ideb_finais_range', 'IDEB Finais')):
+            if filters.get(key):
+                clauses.append(f'({quote(column)} BETWEEN ? AND ? OR {quote(column)} IS NULL)')
+                params.extend(self._bound(column, value) for value in filters[key])
+        
+        if search:
+            clauses.append(f'instr(lower({quote("Nome da Escola")}), ?) > 0')
+            params.append(search.lower())
+        
+        where = ' WHERE ' + ' AND '.join(clauses) if clauses else ''
+        return where, params
+    
+    def _query(self, sql, params=()):
+        """Run a query and return its result as a DataFrame"""
+        
+        with self._lock:
+            if self.engine == 'duckdb':
+                return self._conn.execute(sql, list(params)).df()
+            cursor = self._conn.execute(sql, list(params))
+            names = [description[0] for description in cursor.description]
+            return pd.DataFrame.from_records(cursor.fetchall(), columns=names)
+    
+    def _restore_dtypes(self, df):
+        """Cast query results back to the processed table's dtypes where the values allow it"""
+        
+        columns = {}
+        for col in df.columns:
+            if col in self.dtypes and df[col].dtype != self.dtypes[col]:
+                try:
+                    columns[col] = df[col].astype(self.dtypes[col])
+                except (TypeError, ValueError):
+                    # e.g. an integer column holding NULLs; its float result is kept
+                    pass
+        return df.assign(**columns) if columns else df
+    
+    def view(self, filters, indicator=None):
+        """The rows matching filters, with the IDEB columns holding indicator"""
+        
+        return FilteredView(self, filters, indicator)
+    
+    def indicators(self):
+        """IDEB indicators that can be shown in the IDEB columns, as MetricStore.indicators"""
+        
+        return list(self.indicator_names)
+    
+    def distinct(self, column, filters=None):
+        """Sorted distinct values of a column (e.g. the bairros) among the rows matching filters"""
+        
+        where, params = self.compile_filters(filters or {})
+        values = self._query(
+            f'SELECT DISTINCT {quote(column)} FROM escolas{where}', params
+        ).iloc[:, 0].dropna()
+        # Sorted in Python, as the pandas path does; SQL collations order accents differently
+        return sorted(values)
+    
+    def bounds(self, column, indicator=None):
+        """(min, max) of a column over the whole table, or (None, None) if it has no values"""
+        
+        expression = self.expression(column)
+        row = self._query(f'SELECT MIN({expression}), MAX({expression}) FROM {self._source(indicator)}').iloc[0]
+        if pd.isna(row.iloc[0]):
+            return None, None
+        return row.iloc[0], row.iloc[1]
+    
+    def nbytes(self):
+        """Memory held by the embedded database"""
+        
+        if self.engine == 'duckdb':
+            return int(self._query('SELECT SUM(memory_usage_bytes) FROM duckdb_memory()').iat[0, 0] or 0)
+        page_count = self._query('PRAGMA page_count').iat[0, 0]
+        page_size = self._query('PRAGMA page_size').iat[0, 0]
+        return int(page_count * page_size)
+    
+    def row_count(self):
+        """Rows in the whole table"""
+        
+        return int(self._query('SELECT COUNT(*) FROM escolas').iat[0, 0])
+
+class FilteredView:
+    """Aggregates and pages of one filtered selection, each fetched with its own query"""
+    
+    def __init__(self, backend, filters, indicator):
+        self.backend = backend
+        self.filters = filters
+        self.source = backend._source(indicator)
+    
+    def summary(self):
+        """School and room totals and IDEB averages of the selection"""
+        
+        where, params = self.backend.compile_filters(self.filters)
+        row = self.backend._query(
+            f'SELECT COUNT(*), SUM({quote("Total de Salas")}), SUM({quote("Salas com Ar")}), '
+            f'AVG({quote("IDEB Iniciais")}), AVG({quote("IDEB Finais")}) FROM {self.source}{where}',
+            params
+        ).iloc[0]
+        return {
+            'escolas': int(row.iloc[0]),
+            'salas': int(row.iloc[1]) if pd.notna(row.iloc[1]) else 0,
+            'salas_com_ar': int(row.iloc[2]) if pd.notna(row.iloc[2]) else 0,
+            'ideb_iniciais': float(row.iloc[3]) if pd.notna(row.iloc[3]) else np.nan,
+            'ideb_finais': float(row.iloc[4]) if pd.notna(row.iloc[4]) else np.nan,
+            'total': self.backend.row_count(),
+        }
+    
+    def count(self, search=None):
+        """Rows in the selection (and matching the name search)"""
+        
+        where, params = self.backend.compile_filters(self.filters, search)
+        return int(self.backend._query(f'SELECT COUNT(*) FROM {self.source}{where}', params).iat[0, 0])
+    
+    def page(self, offset, limit, search=None):
+        """One page of rows of the selection, in the processed table's order"""
+        
+        return self._rows(search, ' LIMIT ? OFFSET ?', [int(limit), int(offset)])
+    
+    def to_frame(self, search=None):
+        """Every row of the selection"""
+        
+        return self._rows(search)
+    
+    def _rows(self, search, suffix='', extra_params=()):
+        where, params = self.backend.compile_filters(self.filters, search)
+        select = ', '.join(quote(col) for col in self.backend.columns)
+        df = self.backend._query(
+            f'SELECT {select} FROM {self.source}{where} ORDER BY {quote(ROW_COLUMN)}{suffix}',
+            params + list(extra_params)
+        )
+        return self.backend._restore_dtypes(df)
+    
+    def _select(self, columns, condition=None, condition_params=(), select_params=(), suffix=''):
+        """Run SELECT columns over the selection (narrowed by condition) and return the result"""
+        
+        where, params = self.backend.compile_filters(self.filters)
+        if condition:
+            where = f'{where} AND {condition}' if where else f' WHERE {condition}'
+        # Placeholders are bound in the order they appear: select list, filters, condition
+        return self.backend._query(
+            f'SELECT {columns} FROM {self.source}{where}{suffix}',
+            list(select_params) + params + list(condition_params)
+        )
+    
+    def _moments(self, expression):
+        """Count, mean, sample standard deviation, min and max of the non-missing values"""
+        
+        row = self._select(
+            f'COUNT({expression}), AVG({expression}), MIN({expression}), MAX({expression}), '
+            f'SUM({expression} * {expression})'
+        ).iloc[0]
+        n = int(row.iloc[0])
+        if n == 0:
+            return None
+        mean = float(row.iloc[1])
+        variance = (float(row.iloc[4]) - n * mean * mean) / (n - 1) if n > 1 else np.nan
+        return {
+            'n': n, 'mean': mean, 'std': math.sqrt(max(variance, 0.0)) if n > 1 else np.nan,
+            'min': float(row.iloc[2]), 'max': float(row.iloc[3]),
+        }
+    
+    def _quantiles(self, expression, n, probabilities):
+        """Quantiles of the n non-missing values, interpolated linearly like pandas' quantile"""
+        
+        # Only the (at most two) ranked values around each quantile leave the database
+        ranks = {}
+        for p in probabilities:
+            position = (n - 1) * p
+            lower = int(math.floor(position))
+            ranks[p] = (lower, min(lower + 1, n - 1), position - lower)
+        wanted = sorted({rank for lower, upper, _ in ranks.values() for rank in (lower, upper)})
+        
+        where, params = self.backend.compile_filters(self.filters)
+        condition = f'{expression} IS NOT NULL'
+        where = f'{where} AND {condition}' if where else f' WHERE {condition}'
+        ranked = self.backend._query(
+            f'SELECT posicao, valor FROM ('
+            f'SELECT {expression} AS valor, ROW_NUMBER() OVER (ORDER BY {expression}) - 1 AS posicao '
+            f'FROM {self.source}{where}) AS ordenados '
+            f'WHERE posicao IN ({", ".join("?" * len(wanted))})',
+            params + wanted
+        )
+        values = dict(zip(ranked['posicao'].astype(int), ranked['valor'].astype(float)))
+        return [
+            values[lower] + (values[upper] - values[lower]) * fraction
+            for lower, upper, fraction in ranks.values()
+        ]
+    
+    def describe(self, column):
+        """Descriptive statistics of a column, as StatisticalAnalysis.calculate_descriptive_stats"""
+        
+        expression = self.backend.expression(column)
+        moments = self._moments(expression)
+        if moments is None:
+            return {}
+        q1, median, q3 = self._quantiles(expression, moments['n'], [0.25, 0.5, 0.75])
+        return {
+            'Média': moments['mean'],
+            'Mediana': median,
+            'Desvio Padrão': moments['std'],
+            'Mínimo': moments['min'],
+            'Máximo': moments['max'],
+            'Q1 (25%)': q1,
+            'Q3 (75%)': q3,
+        }
+    
+    def box_stats(self, column):
+        """Quartiles and 1.5 IQR whisker ends of a column, for a box plot drawn without the rows"""
+        
+        expression = self.backend.expression(column)
+        moments = self._moments(expression)
+        if moments is None:
+            return None
+        q1, median, q3 = self._quantiles(expression, moments['n'], [0.25, 0.5, 0.75])
+        iqr = q3 - q1
+        # Whiskers end at the furthest values within 1.5 IQR of the box, as plotly draws them
+        row = self._select(
+            f'MIN(CASE WHEN {expression} >= ? THEN {expression} END), '
+            f'MAX(CASE WHEN {expression} <= ? THEN {expression} END)',
+            select_params=[q1 - 1.5 * iqr, q3 + 1.5 * iqr]
+        ).iloc[0]
+        return {
+            'q1': q1, 'median': median, 'q3': q3,
+            'lowerfence': float(row.iloc[0]), 'upperfence': float(row.iloc[1]),
+            'mean': moments['mean'],
+        }
+    
+    def bin_counts(self, column, bins, labels):
+        """Rows per bin of a column, right-closed with the first bin closed on both ends (as pd.cut)"""
+        
+        expression = self.backend.expression(column)
+        cases = ' '.join(f'WHEN {expression} <= ? THEN {i}' for i in range(len(labels)))
+        counts = self._select(
+            f'CASE {cases} END AS faixa, COUNT(*)',
+            condition=f'{expression} >= ? AND {expression} <= ?',
+            condition_params=[bins[0], bins[-1]],
+            select_params=list(bins[1:]),
+            suffix=' GROUP BY faixa'
+        )
+        result = pd.Series(0, index=pd.CategoricalIndex(labels, categories=labels, ordered=True), name='count')
+        for position, count in zip(counts.iloc[:, 0].astype(int), counts.iloc[:, 1].astype(int)):
+            result.iloc[position] = count
+        return result
+    
+    def value_counts(self, column, limit=None):
+        """Rows per value of a column, most frequent first"""
+        
+        counts = self._select(
+            f'{quote(column)}, COUNT(*) AS linhas',
+            condition=f'{quote(column)} IS NOT NULL',
+            suffix=f' GROUP BY {quote(column)} ORDER BY linhas DESC, {quote(column)}'
+            + (f' LIMIT {int(limit)}' if limit else '')
+        )
+        return pd.Series(
+            counts.iloc[:, 1].astype(int).to_numpy(), index=pd.Index(counts.iloc[:, 0], name=column), name='count'
+        )
+    
+    def histogram(self, columns, bins=20):
+        """Equal-width bins shared by several columns: (DataFrame of column, bin center and rows, bin width)"""
+        
+        extremes = self._select(', '.join(
+            f'MIN({quote(col)}), MAX({quote(col)})' for col in columns
+        )).iloc[0].to_numpy(dtype=float)
+        if np.isnan(extremes).all():
+            return pd.DataFrame(columns=['Coluna', 'Centro', 'Linhas']), 0.0
+        low, high = np.nanmin(extremes), np.nanmax(extremes)
+        width = (high - low) / bins if high > low else 1.0
+        
+        frames = []
+        for col in columns:
+            # The maximum falls in the last bin instead of opening a bin of its own
+            counts = self._select(
+                f'CASE WHEN {quote(col)} >= ? THEN {bins - 1} '
+                f'ELSE CAST(floor(({quote(col)} - ?) / ?) AS INTEGER) END AS faixa, COUNT(*)',
+                condition=f'{quote(col)} IS NOT NULL',
+                select_params=[high, low, width],
+                suffix=' GROUP BY faixa ORDER BY faixa'
+            )
+            # A value a rounding error below the maximum can still land one past the last bin
+            positions = np.minimum(counts.iloc[:, 0].astype(int).to_numpy(), bins - 1)
+            rows = np.bincount(positions, weights=counts.iloc[:, 1].to_numpy(dtype=float), minlength=bins)
+            filled = np.flatnonzero(rows)
+            frames.append(pd.DataFrame({
+                'Coluna': col,
+                'Centro': low + (filled + 0.5) * width,
+                'Linhas': rows[filled].astype(int),
+            }))
+        return pd.concat(frames, ignore_index=True), width
@@ -0,0 +1,143 @@
+import numpy as np
+import pandas as pd
+
+class ColumnIndex:
+    """Argsort index of one column: a range of values becomes a slice of row positions"""
+    
+    def __init__(self, series):
+        if isinstance(series.dtype, pd.CategoricalDtype):
+            # Equality on a category is a range [code, code] of the codes
+            keys = series.cat.codes.to_numpy()
+            self.labels = series.cat.categories
+            missing = keys < 0
+            owns_keys = False
+        elif pd.api.types.is_numeric_dtype(series) and not pd.api.types.is_bool_dtype(series):
+            keys = series.to_numpy()
+            self.labels = None
+            missing = np.isnan(keys) if keys.dtype.kind == 'f' else np.zeros(len(keys), dtype=bool)
+            owns_keys = False
+        else:
+            # Text columns are indexed through their factorized codes, like categoricals
+            keys, self.labels = pd.factorize(series)
+            missing = keys < 0
+            owns_keys = True
+        
+        self.keys = keys
+        self.n_rows = len(keys)
+        position_dtype = np.int32 if self.n_rows < 2**31 else np.int64
+        if missing.any():
+            # Missing values go after every valid one and stay out of every range
+            valid_positions = np.flatnonzero(~missing)
+            order = np.concatenate([
+                valid_positions[np.argsort(keys[valid_positions], kind='stable')],
+                np.flatnonzero(missing),
+            ])
+        else:
+            order = np.argsort(keys, kind='stable')
+        self.order = order.astype(position_dtype)
+        self.n_valid = int((~missing).sum())
+        self.sorted_keys = keys[self.order[:self.n_valid]]
+        # Numeric keys and category codes are the column's own buffer; factorized text codes are not
+        self.nbytes = self.order.nbytes + self.sorted_keys.nbytes + (keys.nbytes if owns_keys else 0)
+    
+    def _key_bounds(self, lo, hi):
+        """Bounds of a value range in key space, or None if nothing can match"""
+        
+        dtype = self.sorted_keys.dtype
+        if dtype.kind in 'iu':
+            # Whole-number keys: round the bounds inwards instead of widening the keys
+            info = np.iinfo(dtype)
+            lo, hi = np.ceil(lo), np.floor(hi)
+            if lo > info.max or hi < info.min or lo > hi:
+                return None
+            return dtype.type(max(lo, info.min)), dtype.type(min(hi, info.max))
+        # Float keys compare against the bounds rounded to their own precision, as pandas does
+        return dtype.type(lo), dtype.type(hi)
+    
+    def equal_bounds(self, value):
+        """Key range matching one value (a category or text label), or None"""
+        
+        if self.labels is None:
+            return self._key_bounds(value, value)
+        position = self.labels.get_indexer([value])[0]
+        if position < 0:
+            return None
+        return self._key_bounds(position, position)
+    
+    def range_bounds(self, lo, hi):
+        """Key range matching values in [lo, hi], or None"""
+        
+        return self._key_bounds(lo, hi)
+    
+    def slice(self, bounds):
+        """Slice of order holding the rows whose key is within bounds"""
+        
+        if bounds is None:
+            return slice(0, 0)
+        start = np.searchsorted(self.sorted_keys, bounds[0], side='left')
+        stop = np.searchsorted(self.sorted_keys, bounds[1], side='right')
+        return slice(start, max(start, stop))
+
+class FilterIndex:
+    """Argsort indexes of a frame's filterable columns, built once per column on first use"""
+    
+    def __init__(self, data):
+        self.data = data
+        self.n_rows = len(data)
+        self._columns = {}
+    
+    def column(self, name):
+        """Index of one column"""
+        
+        index = self._columns.get(name)
+        if index is None:
+            index = self._columns[name] = ColumnIndex(self.data[name])
+        return index
+    
+    def nbytes(self):
+        """Memory held by the column indexes built so far"""
+        
+        return sum(index.nbytes for index in self._columns.values())
+    
+    def select(self, conditions):
+        """Sorted positions of the rows meeting every condition, or None if none restricts anything"""
+        
+        # conditions: (column, ('eq', value) or ('range', lo, hi), keep_missing) tuples
+        candidates = []
+        for column, condition, keep_missing in conditions:
+            index = self.column(column)
+            if condition[0] == 'eq':
+                bounds = index.equal_bounds(condition[1])
+            else:
+                bounds = index.range_bounds(condition[1], condition[2])
+            rows = index.slice(bounds)
+            size = rows.stop - rows.start + (index.n_rows - index.n_valid if keep_missing else 0)
+            # A range covering every row (e.g. a slider left at its limits) restricts nothing
+            if size < self.n_rows:
+                candidates.append((size, index, bounds, rows, keep_missing))
+        
+        if not candidates:
+            return None
+        
+        # Two searchsorted calls gave the size of every position set; start from the smallest,
+        # so intersecting it with the others costs its size and not the table's
+        candidates.sort(key=lambda candidate: candidate[0])
+        _, index, _, rows, keep_missing = candidates[0]
+        positions = index.order[rows]
+        if keep_missing:
+            positions = np.concatenate([positions, index.order[index.n_valid:]])
+        positions = np.sort(positions)
+        
+        for _, index, bounds, _, keep_missing in candidates[1:]:
+            if len(positions) == 0:
+                break
+            keys = index.keys[positions]
+            if bounds is None:
+                member = np.zeros(len(positions), dtype=bool)
+            else:
+                # Codes of missing labels are -1, below any bound, and NaN fails both comparisons
+                member = (keys >= bounds[0]) & (keys <= bounds[1])
+            if keep_missing:
+                member |= np.isnan(keys) if keys.dtype.kind == 'f' else keys < 0
+            positions = positions[member]
+        return positions
@@ -0,0 +1,103 @@
+import hashlib
+import os
+import shutil
+import tempfile
+import pandas as pd
+
+class SnapshotCache:
+    """On-disk Parquet snapshots of processed data keyed by source file contents"""
+    
+    # Bump when the processing pipeline changes so stale snapshots are ignored
+    FORMAT_VERSION = 9
+    
+    def __init__(self, cache_dir='.cache/snapshots', max_snapshots=4):
+        self.cache_dir = cache_dir
+        self.max_snapshots = max_snapshots
+        # path -> ((size, mtime_ns), sha256) so unchanged files are not re-hashed
+        self._digests = {}
+    
+    def file_digest(self, path):
+        """Return the SHA-256 of a file's contents"""
+        
+        stat = os.stat(path)
+        signature = (stat.st_size, stat.st_mtime_ns)
+        cached = self._digests.get(path)
+        if cached and cached[0] == signature:
+            return cached[1]
+        
+        sha = hashlib.sha256()
+        with open(path, 'rb') as f:
+            for chunk in iter(lambda: f.read(1 << 20), b''):
+                sha.update(chunk)
+        
+        digest = sha.hexdigest()
+        self._digests[path] = (signature, digest)
+        return digest
+    
+    def key_for(self, paths, extra=None):
+        """Build the snapshot key for an ordered list of source files and the options that shaped the output"""
+        
+        sha = hashlib.sha256(f'v{self.FORMAT_VERSION}'.encode())
+        for path in paths:
+            sha.update(self.file_digest(path).encode())
+        # e.g. the processor's municipality selection: same files, different result
+        sha.update(repr(extra).encode())
+        return sha.hexdigest()
+    
+    def _snapshot_path(self, key):
+        return os.path.join(self.cache_dir, key)
+    
+    def load(self, key):
+        """Return the frames stored under key as {name: DataFrame}, or None if there are none"""
+        
+        path = self._snapshot_path(key)
+        if not os.path.isdir(path):
+            return None
+        return {
+            name[:-len('.parquet')]: pd.read_parquet(os.path.join(path, name))
+            for name in os.listdir(path)
+            if name.endswith('.parquet')
+        }
+    
+    def store(self, key, frames):
+        """Write a snapshot of {name: DataFrame} atomically and prune the oldest ones"""
+        
+        os.makedirs(self.cache_dir, exist_ok=True)
+        
+        # Write to a temp directory first so readers never see a partial snapshot
+        tmp_path = tempfile.mkdtemp(dir=self.cache_dir, suffix='.tmp')
+        try:
+            for name, df in frames.items():
+                df.to_parquet(os.path.join(tmp_path, f'{name}.parquet'), index=False)
+            
+            # An existing snapshot under the key (e.g. a partial one) is renamed aside before the
+            # new one takes its name, and only deleted afterwards: a concurrent load sees the old
+            # directory, no directory (a miss) or the new one, never files being removed
+            path = self._snapshot_path(key)
+            aside = None
+            if os.path.isdir(path):
+                aside = tempfile.mkdtemp(dir=self.cache_dir, suffix='.tmp')
+                os.replace(path, os.path.join(aside, 'anterior'))
+            os.replace(tmp_path, path)
+            if aside is not None:
+                shutil.rmtree(aside, ignore_errors=True)
+        except Exception:
+            shutil.rmtree(tmp_path, ignore_errors=True)
+            raise
+        
+        self._prune()
+    
+    def _prune(self):
+        """Keep only the most recent snapshots"""
+        
+        snapshots = [
+            os.path.join(self.cache_dir, name)
+            for name in os.listdir(self.cache_dir)
+            if not name.endswith('.tmp')
+        ]
+        snapshots.sort(key=os.path.getmtime, reverse=True)
+        for path in snapshots[self.max_snapshots:]:
+            if os.path.isdir(path):
+                shutil.rmtree(path, ignore_errors=True)
+            else:
+                os.remove(path)
@@ -0,0 +1,63 @@
+import os
+import threading
+
+class SourceWatcher:
+    """Polls a set of source files and calls on_change once a modification has settled"""
+    
+    def __init__(self, paths, on_change, interval=10.0):
+        self.paths = list(paths)
+        self.on_change = on_change
+        self.interval = interval
+        # (size, mtime_ns) of every path at the last handled change; the files as found at start count as seen
+        self._current = self.signature()
+        # A signature seen once but not yet confirmed by the next poll
+        self._pending = None
+        self._stop = threading.Event()
+        self._thread = None
+    
+    def signature(self):
+        """(size, mtime_ns) of every path, or None while one of them is missing"""
+        
+        try:
+            return tuple((stat.st_size, stat.st_mtime_ns) for stat in map(os.stat, self.paths))
+        except FileNotFoundError:
+            # A file being replaced can be briefly absent
+            return None
+    
+    def poll(self):
+        """Check the files once; return whether on_change was called"""
+        
+        signature = self.signature()
+        if signature is None or signature == self._current:
+            self._pending = None
+            return False
+        if signature != self._pending:
+            # Still being written (or just landed): wait one more interval for it to settle
+            self._pending = signature
+            return False
+        
+        # Handled even if on_change fails: a file that does not parse is retried on its next change
+        self._current = signature
+        self._pending = None
+        self.on_change()
+        return True
+    
+    def start(self):
+        """Poll in a daemon thread every interval seconds"""
+        
+        def run():
+            while not self._stop.wait(self.interval):
+                try:
+                    self.poll()
+                except Exception:
+                    # The previous version keeps being served
+                    pass
+        
+        self._thread = threading.Thread(target=run, name='source-watcher', daemon=True)
+        self._thread.start()
+        return self._thread
+    
+    def stop(self):
+        """Stop the polling thread"""
+        
+        self._stop.set()
@@ -3,6 +3,7 @@ import numpy as np
 from scipy import stats
 from scipy.stats import pearsonr, spearmanr
 import streamlit as st
+from utils.memory import working_copy
 
 class StatisticalAnalysis:
     """Class for performing statistical analysis on school data"""
@@ -36,7 +37,7 @@ class StatisticalAnalysis:
         correlations = []
         
         # Calculate AC percentage
-        data_analysis = data.copy()
+        data_analysis = working_copy(data)
         data_analysis['Percentual_AC'] = (
             data_analysis['Salas com Ar'] / data_analysis['Total de Salas'] * 100
         ).fillna(0)
@@ -149,7 +150,7 @@ class StatisticalAnalysis:
     def calculate_correlation_matrix(self, data):
         """Calculate correlation matrix for numerical variables"""
         
-        data_analysis = data.copy()
+        data_analysis = working_copy(data)
         data_analysis['Percentual_AC'] = (
             data_analysis['Salas com Ar'] / data_analysis['Total de Salas'] * 100
         ).fillna(0)
@@ -175,7 +176,7 @@ class StatisticalAnalysis:
     def perform_group_analysis(self, data, group_by='AC_Category'):
         """Perform analysis by grouping schools into categories"""
         
-        data_analysis = data.copy()
+        data_analysis = working_copy(data)
         data_analysis['Percentual_AC'] = (
             data_analysis['Salas com Ar'] / data_analysis['Total de Salas'] * 100
         ).fillna(0)
@@ -211,7 +212,7 @@ class StatisticalAnalysis:
         
         results = {}
         
-        data_analysis = data.copy()
+        data_analysis = working_copy(data)
         data_analysis['Percentual_AC'] = (
             data_analysis['Salas com Ar'] / data_analysis['Total de Salas'] * 100
         ).fillna(0)
@@ -0,0 +1,101 @@
+import hashlib
+import threading
+from collections import OrderedDict
+
+class UploadCache:
+    """Process-wide LRU of processed uploads keyed by the contents of the input files"""
+    
+    def __init__(self, max_bytes=256 * 1024 * 1024, sizer=None):
+        self.max_bytes = max_bytes
+        # Optional sizer(value) -> bytes. Values that keep growing while cached (a processor
+        # building indexes and views as sessions use it) are re-measured on every put.
+        # Without one, every put has to give the size
+        self.sizer = sizer
+        self.current_bytes = 0
+        # Every reuse of a processed upload (including those served by the dataset registry
+        # before reaching the cache, see record_hit), and every upload processed from scratch
+        self.hits = 0
+        self.misses = 0
+        # key -> (value, size in bytes), least recently used first
+        self._entries = OrderedDict()
+        # Streamlit serves each session on its own thread
+        self._lock = threading.Lock()
+    
+    def file_digest(self, uploaded_file):
+        """Return the SHA-256 of an uploaded file's contents"""
+        
+        if hasattr(uploaded_file, 'getvalue'):
+            data = uploaded_file.getvalue()
+        else:
+            uploaded_file.seek(0)
+            data = uploaded_file.read()
+            uploaded_file.seek(0)
+        return hashlib.sha256(data).hexdigest()
+    
+    def key_for(self, uploaded_files):
+        """Build the cache key for an ordered list of uploaded files"""
+        
+        return tuple(self.file_digest(f) for f in uploaded_files)
+    
+    def get(self, key):
+        """Return the cached value for key, or None on a miss"""
+        
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+    
+    def record_hit(self, key):
+        """Count a reuse of key served from elsewhere (the dataset registry), keeping its entry fresh"""
+        
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+            self.hits += 1
+    
+    def put(self, key, value, size=None):
+        """Store a value of the given size (by default, as measured by sizer), evicting least recently used entries"""
+        
+        if size is None:
+            if self.sizer is None:
+                raise ValueError("Informe o tamanho do valor: o cache foi criado sem sizer")
+            size = self.sizer(value)
+        # Entries larger than the whole budget are never cached
+        if size > self.max_bytes:
+            return
+        
+        with self._lock:
+            if key in self._entries:
+                self.current_bytes -= self._entries.pop(key)[1]
+            if self.sizer is not None:
+                self._remeasure()
+            
+            while self._entries and self.current_bytes + size > self.max_bytes:
+                _, (_, evicted_size) = self._entries.popitem(last=False)
+                self.current_bytes -= evicted_size
+            
+            self._entries[key] = (value, size)
+            self.current_bytes += size
+    
+    def _remeasure(self):
+        """Update the size of every entry to what it holds now"""
+        
+        for entry_key, (entry_value, _) in self._entries.items():
+            self._entries[entry_key] = (entry_value, self.sizer(entry_value))
+        self.current_bytes = sum(size for _, size in self._entries.values())
+    
+    def stats(self):
+        """Return the cache counters"""
+        
+        with self._lock:
+            return {
+                'entries': len(self._entries),
+                'bytes': self.current_bytes,
+                'max_bytes': self.max_bytes,
+                'hits': self.hits,
+                'misses': self.misses,
+            }
@@ -0,0 +1,54 @@
+import numpy as np
+import pandas as pd
+
+class RuleEngine:
+    """Row validity rules evaluated together as one boolean matrix, with a bitmask per rejected row"""
+    
+    def __init__(self, rules):
+        # rules: [(name, predicate)] where predicate(df) is True for the rows that pass.
+        # Rule i sets bit i of a rejected row's bitmask, so the order is part of the report format
+        self.rules = rules
+        self.bitmask_dtype = np.min_scalar_type((1 << len(rules)) - 1)
+    
+    def evaluate(self, df, scope=None, id_columns=()):
+        """Return (rows passing every rule, rejection table) for the rows inside scope"""
+        
+        failures = np.empty((len(df), len(self.rules)), dtype=bool)
+        for i, (_, predicate) in enumerate(self.rules):
+            passed = pd.Series(predicate(df), index=df.index)
+            failures[:, i] = ~passed.to_numpy(dtype=bool, na_value=False)
+        
+        weights = (1 << np.arange(len(self.rules))).astype(self.bitmask_dtype)
+        bitmask = (failures * weights).sum(axis=1, dtype=self.bitmask_dtype)
+        
+        # Rows outside the scope (e.g. private schools) are dropped without being reported
+        rejected = bitmask != 0
+        keep = ~rejected
+        if scope is not None:
+            scope = np.asarray(scope, dtype=bool)
+            rejected &= scope
+            keep &= scope
+        
+        # Rows are identified by id_columns: readers that filter while reading renumber the
+        # rows, so a position would not point back to the source file; taken from the arrays so
+        # nullable dtypes (an Int64 code column with blanks) survive
+        rejections = {col: df[col].array[rejected] for col in id_columns}
+        rejections['Regras'] = bitmask[rejected]
+        
+        # The only copy of the data is this one final take
+        clean = df if keep.all() else df[keep]
+        return clean, pd.DataFrame(rejections)
+    
+    def describe(self, bitmask):
+        """Names of the rules set in a rejection bitmask"""
+        
+        return [name for i, (name, _) in enumerate(self.rules) if int(bitmask) & (1 << i)]
+    
+    def summary(self, rejections):
+        """Number of rejected rows failing each rule"""
+        
+        bitmasks = rejections['Regras'].to_numpy()
+        return pd.DataFrame({
+            'Regra': [name for name, _ in self.rules],
+            'Linhas rejeitadas': [int(((bitmasks >> i) & 1).sum()) for i in range(len(self.rules))],
+        })
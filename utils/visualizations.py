@@ -3,10 +3,15 @@ import plotly.graph_objects as go
 from plotly.subplots import make_subplots
 import pandas as pd
 import numpy as np
+from utils.memory import working_copy
 
 class Visualizations:
     """Class for creating interactive visualizations"""
     
+    # Air conditioning levels of the climate distribution chart
+    AC_BINS = [0, 25, 50, 75, 100]
+    AC_LABELS = ['0-25%', '25-50%', '50-75%', '75-100%']
+    
     def __init__(self):
         self.color_palette = {
             'primary': '#1f77b4',
@@ -23,20 +28,25 @@ class Visualizations:
             return None
         
         # Calculate AC percentage
-        data_viz = data.copy()
+        data_viz = working_copy(data)
         data_viz['Percentual_AC'] = (data_viz['Salas com Ar'] / data_viz['Total de Salas'] * 100).fillna(0)
         
         # Create AC categories
         data_viz['AC_Category'] = pd.cut(
             data_viz['Percentual_AC'],
-            bins=[0, 25, 50, 75, 100],
-            labels=['0-25%', '25-50%', '50-75%', '75-100%'],
+            bins=self.AC_BINS,
+            labels=self.AC_LABELS,
             include_lowest=True
         )
         
         # Count schools in each category
         category_counts = data_viz['AC_Category'].value_counts().sort_index()
         
+        return self.create_climate_distribution_chart_from_counts(category_counts)
+    
+    def create_climate_distribution_chart_from_counts(self, category_counts):
+        """Create the air conditioning distribution chart from the schools per AC_LABELS level"""
+        
         fig = px.pie(
             values=category_counts.values,
             names=category_counts.index,
@@ -88,6 +98,41 @@ class Visualizations:
         
         return fig
     
+    def create_ideb_comparison_chart_from_stats(self, box_stats):
+        """Create the IDEB comparison chart from precomputed quartiles, as {level: stats or None}"""
+        
+        # box_stats values hold q1, median, q3, lowerfence, upperfence and mean (see
+        # FilteredView.box_stats); outliers are not drawn, since only the aggregates are known
+        colors = [self.color_palette['primary'], self.color_palette['secondary']]
+        fig = go.Figure()
+        for (level, level_stats), color in zip(box_stats.items(), colors):
+            if level_stats is None:
+                continue
+            fig.add_trace(go.Box(
+                name=level,
+                x=[level],
+                q1=[level_stats['q1']],
+                median=[level_stats['median']],
+                q3=[level_stats['q3']],
+                lowerfence=[level_stats['lowerfence']],
+                upperfence=[level_stats['upperfence']],
+                mean=[level_stats['mean']],
+                marker_color=color
+            ))
+        
+        if not fig.data:
+            return None
+        
+        fig.update_layout(
+            title="Distribuição das Taxas de Aprovação (IDEB)",
+            xaxis_title='Nível',
+            yaxis_title='IDEB',
+            legend_title_text='Nível',
+            height=400
+        )
+        
+        return fig
+    
     def create_school_comparison_chart(self, data):
         """Create a comprehensive comparison chart for schools"""
         
@@ -262,7 +307,7 @@ class Visualizations:
         if data.empty:
             return None
         
-        data_viz = data.copy()
+        data_viz = working_copy(data)
         data_viz['Percentual_AC'] = (data_viz['Salas com Ar'] / data_viz['Total de Salas'] * 100).fillna(0)
         
         # Create categories for analysis
@@ -328,7 +373,17 @@ class Visualizations:
             return None
         
         # Count schools by neighborhood
-        neighborhood_counts = data['Bairro'].value_counts().head(20)  # Top 20 neighborhoods
+        neighborhood_counts = data['Bairro'].value_counts()
+        # Categorical bairros also count neighborhoods filtered out of the data
+        neighborhood_counts = neighborhood_counts[neighborhood_counts > 0].head(20)  # Top 20 neighborhoods
+        
+        return self.create_neighborhood_distribution_from_counts(neighborhood_counts)
+    
+    def create_neighborhood_distribution_from_counts(self, neighborhood_counts):
+        """Create the neighborhood distribution chart from the schools per bairro (top 20)"""
+        
+        if neighborhood_counts.empty:
+            return None
         
         fig = px.bar(
             x=neighborhood_counts.index,
@@ -384,6 +439,28 @@ class Visualizations:
         
         return fig
     
+    def create_performance_histogram_from_bins(self, bins, width):
+        """Create the IDEB histogram from precomputed equal-width bins (see FilteredView.histogram)"""
+        
+        # bins: one row per non-empty bin, with its level ('Nível'), center ('IDEB') and schools
+        if bins.empty:
+            return None
+        
+        fig = px.bar(
+            bins,
+            x='IDEB',
+            y='Escolas',
+            color='Nível',
+            title="Distribuição das Taxas de Aprovação IDEB",
+            barmode='overlay',
+            opacity=0.7
+        )
+        
+        fig.update_traces(width=width)
+        fig.update_layout(height=400, bargap=0)
+        
+        return fig
+    
     def create_size_vs_performance_chart(self, data):
         """Create chart showing relationship between school size and performance"""
         